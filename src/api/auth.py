@@ -129,6 +129,42 @@ def require_consumer(current_user: User = Depends(get_current_user)) -> User:
     return current_user
 
 
+def require_self(user_id: str, current_user: User = Depends(get_current_user)) -> User:
+    """Dependency to require that the caller is the user in the `{user_id}` path.
+    
+    Args:
+        user_id: User ID from the request path
+        current_user: Current authenticated user
+        
+    Returns:
+        User object (guaranteed to match user_id)
+        
+    Raises:
+        ForbiddenError: If user acts on behalf of another user
+    """
+    if current_user.user_id != user_id:
+        raise ForbiddenError("Cannot act on behalf of another user")
+    return current_user
+
+
+def require_self_or_operator(user_id: str, current_user: User = Depends(get_current_user)) -> User:
+    """Dependency to require the `{user_id}` path user or an operator.
+    
+    Args:
+        user_id: User ID from the request path
+        current_user: Current authenticated user
+        
+    Returns:
+        User object (guaranteed to match user_id or be an operator)
+        
+    Raises:
+        ForbiddenError: If a non-operator accesses another user's data
+    """
+    if current_user.user_id != user_id and not current_user.is_operator():
+        raise ForbiddenError("Cannot access data for another user")
+    return current_user
+
+
 def optional_auth(
     credentials: Optional[HTTPAuthorizationCredentials] = Security(HTTPBearer(auto_error=False))
 ) -> Optional[User]:
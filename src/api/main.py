@@ -6,19 +6,32 @@ This module provides REST API endpoints for the SpendSense operator interface.
 import json
 import os
 import math
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, validator
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from collections import defaultdict
+from functools import lru_cache
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import uuid
 import time
 
+# Use orjson for response/chat-log serialization when available (2-5x faster
+# than stdlib json); fall back to stdlib json otherwise
+try:
+    import orjson
+    from fastapi.responses import ORJSONResponse
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None
+    ORJSONResponse = None
+    HAS_ORJSON = False
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -56,10 +69,11 @@ from src.api.exceptions import (
     RateLimitError
 )
 from src.api.validators import (
-    validate_user_id,
-    validate_time_window,
-    validate_limit,
-    validate_offset
+    check_user_id,
+    check_recommendation_id,
+    check_time_window,
+    check_limit,
+    check_offset
 )
 from src.api.error_handlers import (
     spendsense_exception_handler,
@@ -67,18 +81,22 @@ from src.api.error_handlers import (
     general_exception_handler
 )
 from src.api.rate_limit import check_rate_limit as check_rate_limit_new, RATE_LIMITS
+from src.api.single_flight import chat_single_flight, make_key as make_chat_key
 from src.api.exceptions import RateLimitError
 from src.api.auth import (
     get_current_user,
     require_operator,
     require_consumer,
+    require_self,
+    require_self_or_operator,
     create_access_token,
     User
 )
 from src.utils.logging import get_logger
 from src.recommend.content_catalog import get_content_by_id
 from src.recommend.engine import check_offer_eligibility
-from src.chat.service import generate_chat_response
+from src.chat.service import generate_chat_response, stream_chat_response
+from src.chat import service as chat_service
 from src.guardrails.guardrails_ai import get_guardrails
 from src.guardrails.data_sanitizer import get_sanitizer
 from src.utils.category_utils import normalize_category, get_primary_category
@@ -88,6 +106,21 @@ from src.utils.calculators import (
     calculate_savings_goal_timeline,
     generate_budget_breakdown
 )
+from src.analytics.aggregators import (
+    get_total_users_count,
+    get_active_users_count,
+    get_recommendation_safety_indicators,
+    get_current_persona_distribution,
+    get_persona_distribution_by_week,
+    get_success_metrics_by_persona
+)
+from src.traces.service import (
+    get_all_traces,
+    get_user_timeline as get_timeline,
+    get_trace_by_id,
+    get_trace_stats as get_stats,
+    InvalidCursorError
+)
 
 # Import Firestore functions for deployment or emulator
 # Import firestore module early so auto-detection runs
@@ -101,12 +134,32 @@ from src.database.firestore import (
     get_operator_actions as firestore_get_operator_actions,
     get_consent_status as firestore_get_consent_status,
     store_consent as firestore_store_consent,
-    revoke_consent as firestore_revoke_consent
+    revoke_consent as firestore_revoke_consent,
+    store_chat_log as firestore_store_chat_log,
+    invalidate_user_cache as firestore_invalidate_user_cache
 )
 from firebase_admin import firestore
 
+@lru_cache(maxsize=1)
+def _has_service_account_file() -> bool:
+    """Check once whether the Firebase service account file exists."""
+    return os.path.exists('firebase-service-account.json')
+
+
+# Set once a Firestore client has been obtained; the client is cached by
+# firestore_get_db(), so later checks can skip the credential probing
+_firestore_available = False
+
+
 def check_use_firestore():
-    """Check if Firestore should be used (dynamic check, not cached)."""
+    """Check if Firestore should be used.
+    
+    Re-evaluated until Firestore is found, then answered from the cached
+    result. An emulator started after import is picked up once get_db()'s
+    auto-detection sets FIRESTORE_EMULATOR_HOST; that detection re-probes a
+    closed port at most every few seconds.
+    """
+    global _firestore_available
     # If SQLite is not available (Vercel deployment), always use Firestore
     if not HAS_SQLITE:
         return True
@@ -115,21 +168,28 @@ def check_use_firestore():
     if os.getenv('USE_SQLITE', '').lower() == 'true':
         return False
     
+    if _firestore_available:
+        return True
+    
     # Check environment variables (including auto-detected FIRESTORE_EMULATOR_HOST)
     has_emulator = os.getenv('FIRESTORE_EMULATOR_HOST') is not None
     has_emulator_flag = os.getenv('USE_FIREBASE_EMULATOR', '').lower() == 'true'
     has_production_creds = os.getenv('FIREBASE_SERVICE_ACCOUNT') is not None
-    has_cred_file = os.path.exists('firebase-service-account.json')
     
-    if has_emulator or has_emulator_flag or has_production_creds or has_cred_file:
+    if has_emulator or has_emulator_flag or has_production_creds or _has_service_account_file():
         # Try to get Firestore client
-        db_client = firestore_get_db()
-        return db_client is not None
+        _firestore_available = firestore_get_db() is not None
+        return _firestore_available
     return False
 
 # Cache initial state
 USE_FIRESTORE = check_use_firestore()
 
+# Resolve consent backend functions once at import time
+backend_store_consent = firestore_store_consent if USE_FIRESTORE else sqlite_store_consent
+backend_revoke_consent = firestore_revoke_consent if USE_FIRESTORE else sqlite_revoke_consent
+backend_get_consent_status = firestore_get_consent_status if USE_FIRESTORE else sqlite_get_consent_status
+
 # Create a convenience alias for backward compatibility
 # Don't call firestore_get_db() during import - it will be called lazily when needed
 firestore_db = None
@@ -137,10 +197,32 @@ firestore_db = None
 # Initialize logger
 logger = get_logger("api")
 
+
+def dumps_json(obj: Any) -> str:
+    """Serialize obj to a JSON string, using orjson when available."""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(obj)
+
+
+if HAS_ORJSON:
+    class SpendSenseJSONResponse(ORJSONResponse):
+        """ORJSONResponse that also accepts non-string dict keys and numpy values."""
+        
+        def render(self, content: Any) -> bytes:
+            return orjson.dumps(
+                content,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            )
+else:
+    SpendSenseJSONResponse = JSONResponse
+
+
 app = FastAPI(
     title="SpendSense API",
     description="API for SpendSense financial education platform",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=SpendSenseJSONResponse
 )
 
 # Add exception handlers
@@ -180,7 +262,6 @@ app.add_middleware(
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
     """Add request ID to all requests for tracing."""
-    import uuid
     request_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
     request.state.request_id = request_id
     
@@ -193,8 +274,6 @@ async def add_request_id(request: Request, call_next):
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
     """Log all API requests and responses."""
-    import time
-    
     # Get request ID
     request_id = getattr(request.state, "request_id", "unknown")
     
@@ -235,6 +314,15 @@ rate_limit_store: Dict[str, List[datetime]] = defaultdict(list)
 RATE_LIMIT_MESSAGES = 10
 RATE_LIMIT_WINDOW = 60  # seconds
 
+# Valid filter values, with error-message lists pre-joined once at import
+_PERSONA_ORDER = ("high_utilization", "variable_income", "subscription_heavy", "savings_builder", "general_wellness")
+_VALID_PERSONAS = frozenset(_PERSONA_ORDER)
+_VALID_PERSONAS_MSG = ", ".join(_PERSONA_ORDER)
+
+_ANALYTICS_WINDOW_ORDER = ("30d", "90d", "180d")
+_VALID_ANALYTICS_WINDOWS = frozenset(_ANALYTICS_WINDOW_ORDER)
+_VALID_ANALYTICS_WINDOWS_MSG = ", ".join(_ANALYTICS_WINDOW_ORDER)
+
 
 def clean_nan_values(obj: Any) -> Any:
     """Recursively clean NaN, Infinity, and -Infinity values from a data structure.
@@ -489,25 +577,17 @@ def list_users(
     """
     try:
         # Validate pagination parameters
-        is_valid, error_msg, normalized_limit = validate_limit(limit, default=50, max_limit=100)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="limit")
-        limit = normalized_limit
+        limit = check_limit(limit, default=50, max_limit=100)
         
-        is_valid, error_msg, normalized_offset = validate_offset((page - 1) * limit if page > 0 else 0)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="page")
-        offset = normalized_offset
+        offset = check_offset((page - 1) * limit if page > 0 else 0, field="page")
         
         # Validate search string if provided
         if search:
             search = search.strip()[:100]  # Limit length
         
         # Validate persona if provided
-        if persona:
-            valid_personas = ["high_utilization", "variable_income", "subscription_heavy", "savings_builder", "general_wellness"]
-            if persona not in valid_personas:
-                raise InvalidInputError(f"Invalid persona: {persona}. Must be one of: {', '.join(valid_personas)}", field="persona")
+        if persona and persona not in _VALID_PERSONAS:
+            raise InvalidInputError(f"Invalid persona: {persona}. Must be one of: {_VALID_PERSONAS_MSG}", field="persona")
         if USE_FIRESTORE:
             if firestore_db is None:
                 raise HTTPException(status_code=500, detail="Firestore database not initialized")
@@ -1082,15 +1162,10 @@ def get_user_signals(user_id: str, time_window: str = "30d"):
     """Get user's behavioral signals"""
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Validate time_window
-        is_valid, error_msg, normalized_window = validate_time_window(time_window)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="time_window")
-        time_window = normalized_window
+        time_window = check_time_window(time_window)
         
         if USE_FIRESTORE:
             # Use Firestore - verify user exists
@@ -1166,15 +1241,10 @@ def compute_features(user_id: str, time_window: str = "30d", force_recompute: bo
     '''
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Validate time_window parameter
-        is_valid, error_msg, normalized_window = validate_time_window(time_window)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="time_window")
-        time_window = normalized_window
+        time_window = check_time_window(time_window)
         
         # Check rate limit
         is_allowed, retry_after = check_rate_limit_new(user_id, "compute_features")
@@ -1253,9 +1323,7 @@ def get_user_recommendations(user_id: str, time_window: Optional[str] = None):
     """Get user's recommendations enriched with content catalog data"""
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Verify user exists and get signals for eligibility checking
         if USE_FIRESTORE:
@@ -1414,15 +1482,10 @@ async def get_credit_offers_prequalification(user_id: str, time_window: str = "3
     """
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Validate time_window
-        is_valid, error_msg, normalized_window = validate_time_window(time_window)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="time_window")
-        time_window = normalized_window
+        time_window = check_time_window(time_window)
         
         # Verify user exists
         if USE_FIRESTORE:
@@ -1497,9 +1560,7 @@ def get_user_transactions(user_id: str, start_date: Optional[str] = None, limit:
     """Get user's transactions"""
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Check dynamically in case emulator started after module import
         use_firestore = check_use_firestore()
@@ -2500,15 +2561,10 @@ def override_recommendation(
     """Override a recommendation for a user (operator only)"""
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Validate recommendation_id format
-        from src.api.validators import validate_recommendation_id
-        is_valid, error_msg = validate_recommendation_id(request.recommendation_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="recommendation_id")
+        check_recommendation_id(request.recommendation_id)
         
         # Check rate limit
         is_allowed, retry_after = check_rate_limit_new(user_id, "override")
@@ -2544,6 +2600,7 @@ def override_recommendation(
                 'overridden_at': firestore.SERVER_TIMESTAMP,
                 'overridden_by': operator_id
             })
+            firestore_invalidate_user_cache(user_id)
             
             # Store operator action
             firestore_store_operator_action(
@@ -2587,15 +2644,17 @@ def override_recommendation(
                     update_query,
                     (request.reason, overridden_at, operator_id, request.recommendation_id, user_id)
                 )
-            
-            # Store operator action
-            sqlite_store_operator_action(
-                operator_id=operator_id,
-                user_id=user_id,
-                action_type='override',
-                reason=request.reason,
-                recommendation_id=request.recommendation_id
-            )
+                
+                # Store operator action in the same transaction, stamped with
+                # the override time
+                sqlite_store_operator_action(
+                    operator_id=operator_id,
+                    user_id=user_id,
+                    action_type='override',
+                    reason=request.reason,
+                    recommendation_id=request.recommendation_id,
+                    created_at=overridden_at
+                )
             
             return {"status": "success", "message": "Recommendation overridden"}
     except (SpendSenseException, HTTPException):
@@ -2614,9 +2673,7 @@ def flag_user(
     """Flag a user for review (operator only)"""
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Check rate limit
         is_allowed, retry_after = check_rate_limit_new(user_id, "flag")
@@ -2643,6 +2700,7 @@ def flag_user(
                 'flagged_at': firestore.SERVER_TIMESTAMP,
                 'flagged_by': operator_id
             })
+            firestore_invalidate_user_cache(user_id)
             
             # Store operator action
             firestore_store_operator_action(
@@ -2679,15 +2737,17 @@ def flag_user(
                     update_query,
                     (request.reason, flagged_at, operator_id, user_id)
                 )
-            
-            # Store operator action
-            sqlite_store_operator_action(
-                operator_id=operator_id,
-                user_id=user_id,
-                action_type='flag',
-                reason=request.reason,
-                recommendation_id=None
-            )
+                
+                # Store operator action in the same transaction, stamped with
+                # the flag time
+                sqlite_store_operator_action(
+                    operator_id=operator_id,
+                    user_id=user_id,
+                    action_type='flag',
+                    reason=request.reason,
+                    recommendation_id=None,
+                    created_at=flagged_at
+                )
             
             return {"status": "success", "message": "User flagged for review"}
     except (SpendSenseException, HTTPException):
@@ -2702,9 +2762,7 @@ def get_user_actions(user_id: str):
     """Get audit log of operator actions for a user"""
     try:
         # Validate user_id format
-        is_valid, error_msg = validate_user_id(user_id)
-        if not is_valid:
-            raise InvalidInputError(error_msg, field="user_id")
+        check_user_id(user_id)
         
         # Verify user exists and get actions
         if USE_FIRESTORE:
@@ -2731,192 +2789,340 @@ def get_user_actions(user_id: str):
         raise HTTPException(status_code=500, detail=f"Error fetching actions: {str(e)}")
 
 
+def _prepare_chat_context(request: ChatRequest) -> Dict[str, Any]:
+    """Verify the user, enforce rate limits and gather the chat context.
+    
+    Args:
+        request: Incoming chat request
+        
+    Returns:
+        Dictionary of keyword arguments for the chat service functions
+        
+    Raises:
+        HTTPException: If the user does not exist
+        RateLimitError: If the user exceeded the chat rate limit
+    """
+    user_id = request.user_id
+    transaction_window_days = request.transaction_window_days
+    
+    # Environment-based maximum limits
+    max_window = int(os.getenv('CHAT_MAX_TRANSACTION_WINDOW', '180'))
+    max_transactions = int(os.getenv('CHAT_MAX_TRANSACTIONS', '100'))
+    
+    # Validate and enforce limits
+    if transaction_window_days > max_window:
+        transaction_window_days = max_window
+        logger.warning(f"Transaction window capped at {max_window} days")
+    
+    # Calculate transaction limit: ~3 transactions per day, capped at max
+    transaction_limit = min(transaction_window_days * 3, max_transactions)
+    
+    # Verify user exists
+    if USE_FIRESTORE:
+        user = firestore_get_user(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+    else:
+        user_query = "SELECT user_id FROM users WHERE user_id = ?"
+        user_row = db.fetch_one(user_query, (user_id,))
+        if not user_row:
+            raise HTTPException(status_code=404, detail="User not found")
+    
+    # Check rate limit
+    is_allowed, retry_after = check_rate_limit_new(user_id, "chat")
+    if not is_allowed:
+        raise RateLimitError(f"Rate limit exceeded. Maximum {RATE_LIMITS['chat']['limit']} messages per {RATE_LIMITS['chat']['window']} seconds.", retry_after=retry_after)
+    
+    # Sanitize user message before processing
+    sanitizer = get_sanitizer()
+    sanitized_message, detected_pii = sanitizer.sanitize_user_message(request.message)
+    
+    if detected_pii:
+        # Log PII detection for security monitoring
+        logger.warning(
+            f"PII detected in chat message from user {user_id}",
+            extra={
+                "user_id": user_id,
+                "detected_pii": detected_pii
+            }
+        )
+    
+    # Get user data
+    user_features = get_user_features(user_id, "30d")
+    
+    # Get user accounts for account-level analysis
+    user_accounts = []
+    if USE_FIRESTORE:
+        from src.database.firestore import get_user_accounts as firestore_get_user_accounts
+        user_accounts = firestore_get_user_accounts(user_id) or []
+    else:
+        accounts_query = "SELECT * FROM accounts WHERE user_id = ?"
+        accounts_rows = db.fetch_all(accounts_query, (user_id,))
+        user_accounts = [dict(row) for row in accounts_rows]
+    
+    # Get recent transactions with configurable window
+    if USE_FIRESTORE:
+        from src.database.firestore import get_user_transactions as firestore_get_user_transactions
+        cutoff_date = (datetime.now() - timedelta(days=transaction_window_days)).strftime("%Y-%m-%d")
+        recent_transactions = firestore_get_user_transactions(user_id, cutoff_date)[:transaction_limit]
+    else:
+        cutoff_date = (datetime.now() - timedelta(days=transaction_window_days)).strftime("%Y-%m-%d")
+        txn_query = """
+            SELECT transaction_id, account_id, user_id, date, amount, 
+                   merchant_name, category, pending,
+                   location_address, location_city, location_region,
+                   location_postal_code, location_country, location_lat, location_lon,
+                   iso_currency_code, payment_channel, authorized_date
+            FROM transactions
+            WHERE user_id = ? AND date >= ?
+            ORDER BY date DESC
+            LIMIT ?
+        """
+        txn_rows = db.fetch_all(txn_query, (user_id, cutoff_date, transaction_limit))
+        recent_transactions = []
+        for row in txn_rows:
+            txn_dict = dict(row)
+            # Normalize category to array format
+            txn_dict['category'] = normalize_category(txn_dict.get('category'))
+            recent_transactions.append(txn_dict)
+    
+    # Get persona
+    persona_dict = None
+    if USE_FIRESTORE:
+        personas = firestore_get_persona_assignments(user_id)
+        # Find most recent persona for 30d window
+        for persona in personas:
+            if persona.get('time_window') == '30d':
+                persona_dict = {
+                    "persona": persona.get('primary_persona') or persona.get('persona'),
+                    "primary_persona": persona.get('primary_persona') or persona.get('persona'),
+                    "match_percentages": {
+                        "high_utilization": persona.get("match_high_utilization", 0.0) or 0.0,
+                        "variable_income": persona.get("match_variable_income", 0.0) or 0.0,
+                        "subscription_heavy": persona.get("match_subscription_heavy", 0.0) or 0.0,
+                        "savings_builder": persona.get("match_savings_builder", 0.0) or 0.0,
+                        "general_wellness": persona.get("match_general_wellness", 0.0) or 0.0
+                    }
+                }
+                break
+    else:
+        persona = get_persona_assignment(user_id, "30d")
+        if persona and isinstance(persona, dict):
+            persona_dict = {
+                "persona": persona.get("primary_persona") or persona.get("persona"),
+                "primary_persona": persona.get("primary_persona") or persona.get("persona"),
+                "match_percentages": persona.get("match_percentages", {})
+            }
+    
+    return {
+        "message": sanitized_message,  # Use sanitized message
+        "user_features": user_features,
+        "recent_transactions": recent_transactions,
+        "persona": persona_dict,
+        "transaction_window_days": transaction_window_days,
+        "user_accounts": user_accounts
+    }
+
+
+def _firestore_store_chat_log(
+    user_id: str,
+    message: str,
+    response_text: str,
+    citations: List[Dict[str, str]],
+    guardrails_passed: bool,
+    created_at: str
+) -> None:
+    """Persist a chat exchange to Firestore.
+    
+    Args:
+        user_id: User identifier
+        message: Original (unsanitized) user message, kept for the audit trail
+        response_text: Final response returned to the user
+        citations: Data citations attached to the response
+        guardrails_passed: Whether the response passed guardrails validation
+        created_at: ISO timestamp of the exchange (local time), stored as the
+            same instant in UTC
+    """
+    firestore_store_chat_log(
+        user_id,
+        message,
+        response_text,
+        citations,
+        guardrails_passed,
+        created_at=datetime.fromisoformat(created_at).astimezone(timezone.utc)
+    )
+
+
+def _sqlite_store_chat_log(
+    user_id: str,
+    message: str,
+    response_text: str,
+    citations: List[Dict[str, str]],
+    guardrails_passed: bool,
+    created_at: str
+) -> None:
+    """Persist a chat exchange to the SQLite chat_logs table.
+    
+    Args:
+        user_id: User identifier
+        message: Original (unsanitized) user message, kept for the audit trail
+        response_text: Final response returned to the user
+        citations: Data citations attached to the response
+        guardrails_passed: Whether the response passed guardrails validation
+        created_at: ISO timestamp of the exchange
+    """
+    citations_json = dumps_json(citations)
+    insert_query = """
+        INSERT INTO chat_logs (user_id, message, response, citations, guardrails_passed, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    with get_db_connection() as conn:
+        conn.execute(
+            insert_query,
+            (user_id, message, response_text, citations_json, 1 if guardrails_passed else 0, created_at)
+        )
+
+
+# Resolve the chat log backend once instead of branching on every request
+_store_chat_log = _firestore_store_chat_log if USE_FIRESTORE else _sqlite_store_chat_log
+
+
 @app.post("/api/chat")
-def chat(request: ChatRequest):
+async def chat(request: ChatRequest):
     """Chat endpoint for AI-powered financial questions with configurable transaction window"""
     try:
         user_id = request.user_id
-        transaction_window_days = request.transaction_window_days
-        
-        # Environment-based maximum limits
-        max_window = int(os.getenv('CHAT_MAX_TRANSACTION_WINDOW', '180'))
-        max_transactions = int(os.getenv('CHAT_MAX_TRANSACTIONS', '100'))
-        
-        # Validate and enforce limits
-        if transaction_window_days > max_window:
-            transaction_window_days = max_window
-            logger.warning(f"Transaction window capped at {max_window} days")
-        
-        # Calculate transaction limit: ~3 transactions per day, capped at max
-        transaction_limit = min(transaction_window_days * 3, max_transactions)
-        
-        # Verify user exists
-        if USE_FIRESTORE:
-            user = firestore_get_user(user_id)
-            if not user:
-                raise HTTPException(status_code=404, detail="User not found")
-        else:
-            user_query = "SELECT user_id FROM users WHERE user_id = ?"
-            user_row = db.fetch_one(user_query, (user_id,))
-            if not user_row:
-                raise HTTPException(status_code=404, detail="User not found")
-        
-        # Check rate limit
-        is_allowed, retry_after = check_rate_limit_new(user_id, "chat")
-        if not is_allowed:
-            raise RateLimitError(f"Rate limit exceeded. Maximum {RATE_LIMITS['chat']['limit']} messages per {RATE_LIMITS['chat']['window']} seconds.", retry_after=retry_after)
+        # Database work stays off the event loop; the OpenAI call is awaited
+        chat_context = await run_in_threadpool(_prepare_chat_context, request)
+        
+        # Identical requests arriving while this one is in flight share the
+        # generated response; each request still logs its own exchange
+        key = make_chat_key(
+            user_id,
+            chat_context["message"],
+            chat_context["transaction_window_days"]
+        )
+        response_text, citations, guardrails_passed = await chat_single_flight.do_async(
+            key,
+            lambda: _generate_chat(chat_context)
+        )
         
-        # Sanitize user message before processing
-        sanitizer = get_sanitizer()
-        sanitized_message, detected_pii = sanitizer.sanitize_user_message(request.message)
+        # Store chat log (with original message for audit, sanitized was sent to LLM)
+        now_iso = datetime.now().isoformat()
+        await run_in_threadpool(
+            _store_chat_log, user_id, request.message, response_text, citations, guardrails_passed, now_iso
+        )
         
-        if detected_pii:
-            # Log PII detection for security monitoring
-            logger.warning(
-                f"PII detected in chat message from user {user_id}",
-                extra={
-                    "user_id": user_id,
-                    "detected_pii": detected_pii
-                }
-            )
+        # Return response
+        return {
+            "data": {
+                "response": response_text,
+                "citations": citations
+            },
+            "meta": {
+                "user_id": user_id,
+                "timestamp": now_iso
+            }
+        }
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
+
+
+async def _generate_chat(chat_context: Dict[str, Any]) -> Tuple[str, List[Dict[str, str]], bool]:
+    """Generate a chat response and validate it against the guardrails.
+    
+    Args:
+        chat_context: Keyword arguments for generate_chat_response
         
-        # Get user data
-        user_features = get_user_features(user_id, "30d")
+    Returns:
+        Tuple of (response_text, citations, guardrails_passed)
+    """
+    # Generate response
+    try:
+        chat_result = await generate_chat_response(**chat_context)
         
-        # Get user accounts for account-level analysis
-        user_accounts = []
-        if USE_FIRESTORE:
-            from src.database.firestore import get_user_accounts as firestore_get_user_accounts
-            user_accounts = firestore_get_user_accounts(user_id) or []
-        else:
-            accounts_query = "SELECT * FROM accounts WHERE user_id = ?"
-            accounts_rows = db.fetch_all(accounts_query, (user_id,))
-            user_accounts = [dict(row) for row in accounts_rows]
+        response_text = chat_result["response"]
+        citations = chat_result["citations"]
         
-        # Get recent transactions with configurable window
-        if USE_FIRESTORE:
-            from src.database.firestore import get_user_transactions as firestore_get_user_transactions
-            cutoff_date = (datetime.now() - timedelta(days=transaction_window_days)).strftime("%Y-%m-%d")
-            recent_transactions = firestore_get_user_transactions(user_id, cutoff_date)[:transaction_limit]
-        else:
-            cutoff_date = (datetime.now() - timedelta(days=transaction_window_days)).strftime("%Y-%m-%d")
-            txn_query = """
-                SELECT transaction_id, account_id, user_id, date, amount, 
-                       merchant_name, category, pending,
-                       location_address, location_city, location_region,
-                       location_postal_code, location_country, location_lat, location_lon,
-                       iso_currency_code, payment_channel, authorized_date
-                FROM transactions
-                WHERE user_id = ? AND date >= ?
-                ORDER BY date DESC
-                LIMIT ?
-            """
-            txn_rows = db.fetch_all(txn_query, (user_id, cutoff_date, transaction_limit))
-            recent_transactions = []
-            for row in txn_rows:
-                txn_dict = dict(row)
-                # Normalize category to array format
-                txn_dict['category'] = normalize_category(txn_dict.get('category'))
-                recent_transactions.append(txn_dict)
-        
-        # Get persona
-        persona_dict = None
-        if USE_FIRESTORE:
-            personas = firestore_get_persona_assignments(user_id)
-            # Find most recent persona for 30d window
-            for persona in personas:
-                if persona.get('time_window') == '30d':
-                    persona_dict = {
-                        "persona": persona.get('primary_persona') or persona.get('persona'),
-                        "primary_persona": persona.get('primary_persona') or persona.get('persona'),
-                        "match_percentages": {
-                            "high_utilization": persona.get("match_high_utilization", 0.0) or 0.0,
-                            "variable_income": persona.get("match_variable_income", 0.0) or 0.0,
-                            "subscription_heavy": persona.get("match_subscription_heavy", 0.0) or 0.0,
-                            "savings_builder": persona.get("match_savings_builder", 0.0) or 0.0,
-                            "general_wellness": persona.get("match_general_wellness", 0.0) or 0.0
-                        }
-                    }
-                    break
-        else:
-            persona = get_persona_assignment(user_id, "30d")
-            if persona and isinstance(persona, dict):
-                persona_dict = {
-                    "persona": persona.get("primary_persona") or persona.get("persona"),
-                    "primary_persona": persona.get("primary_persona") or persona.get("persona"),
-                    "match_percentages": persona.get("match_percentages", {})
-                }
+        # Validate guardrails
+        guardrails = get_guardrails()
+        is_valid, _, _ = guardrails.validate(response_text)
+        return response_text, citations, is_valid
         
-        # Generate response
-        try:
-            chat_result = generate_chat_response(
-                sanitized_message,  # Use sanitized message
-                user_features,
-                recent_transactions,
-                persona_dict,
-                transaction_window_days=transaction_window_days,
-                user_accounts=user_accounts
-            )
-            
-            response_text = chat_result["response"]
-            citations = chat_result["citations"]
-            
-            # Validate guardrails
-            guardrails = get_guardrails()
-            is_valid, _, _ = guardrails.validate(response_text)
-            guardrails_passed = is_valid
-            
-            # Store chat log (with original message for audit, sanitized was sent to LLM)
-            citations_json = json.dumps(citations)
-            if USE_FIRESTORE:
-                from src.database.firestore import store_chat_log as firestore_store_chat_log
-                firestore_store_chat_log(
-                    user_id,
-                    request.message,  # Store original message for audit trail
-                    response_text,
-                    citations,
-                    guardrails_passed
-                )
-            else:
-                insert_query = """
-                    INSERT INTO chat_logs (user_id, message, response, citations, guardrails_passed, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """
-                created_at = datetime.now().isoformat()
-                with get_db_connection() as conn:
-                    conn.execute(
-                        insert_query,
-                        (user_id, request.message, response_text, citations_json, 1 if guardrails_passed else 0, created_at)
-                    )
-            
-            # Return response
-            return {
-                "data": {
-                    "response": response_text,
-                    "citations": citations
-                },
-                "meta": {
-                    "user_id": user_id,
-                    "timestamp": datetime.now().isoformat()
-                }
-            }
-            
-        except ValueError as e:
-            # OpenAI API key not configured
+    except ValueError as e:
+        # OpenAI API key not configured
+        raise HTTPException(
+            status_code=503,
+            detail="Chat service is not configured. OPENAI_API_KEY environment variable is required."
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error generating chat response: {str(e)}"
+        )
+
+
+def _format_sse(payload: Dict[str, Any]) -> str:
+    """Format a payload as a Server-Sent Events `data:` frame."""
+    return f"data: {dumps_json(payload)}\n\n"
+
+
+@app.post("/api/chat/stream")
+def chat_stream(request: ChatRequest):
+    """Streaming variant of /api/chat using Server-Sent Events.
+    
+    Emits `delta` events as tokens arrive, then a `done` event containing the
+    guardrail-validated response, citations and meta. The client should
+    replace the streamed draft with the `done` response. Errors raised after
+    the stream has started are reported as an `error` event.
+    """
+    try:
+        user_id = request.user_id
+        chat_context = _prepare_chat_context(request)
+        if chat_service.get_openai_client() is None:
             raise HTTPException(
                 status_code=503,
                 detail="Chat service is not configured. OPENAI_API_KEY environment variable is required."
             )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error generating chat response: {str(e)}"
-            )
-            
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat request: {str(e)}")
+    
+    def event_stream():
+        try:
+            for event in stream_chat_response(**chat_context):
+                if event["type"] == "done":
+                    # Store chat log (with original message for audit, sanitized was sent to LLM)
+                    now_iso = datetime.now().isoformat()
+                    _store_chat_log(
+                        user_id,
+                        request.message,
+                        event["response"],
+                        event["citations"],
+                        event["guardrails_passed"],
+                        now_iso
+                    )
+                    event = {
+                        "type": "done",
+                        "data": {
+                            "response": event["response"],
+                            "citations": event["citations"]
+                        },
+                        "meta": {
+                            "user_id": user_id,
+                            "timestamp": now_iso
+                        }
+                    }
+                yield _format_sse(event)
+        except Exception as e:
+            logger.error(f"Error streaming chat response: {str(e)}", exc_info=True)
+            yield _format_sse({"type": "error", "detail": f"Error generating chat response: {str(e)}"})
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
 
 
 # ============================================================================
@@ -2929,7 +3135,7 @@ def chat(request: ChatRequest):
 async def grant_consent(
     user_id: str,
     request: Request,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_self)
 ):
     """Grant consent for data processing.
     
@@ -2944,17 +3150,10 @@ async def grant_consent(
     Raises:
         ForbiddenError: If user tries to consent for another user
     """
-    # Verify user can only consent for themselves
-    if current_user.user_id != user_id:
-        raise ForbiddenError("Cannot consent for another user")
-    
     ip_address = request.client.host if request.client else "unknown"
     
     try:
-        if USE_FIRESTORE:
-            firestore_store_consent(user_id, granted=True, ip_address=ip_address)
-        else:
-            sqlite_store_consent(user_id, granted=True, ip_address=ip_address)
+        backend_store_consent(user_id, granted=True, ip_address=ip_address)
         
         logger.info(f"Consent granted for user {user_id} from IP {ip_address}")
         return {"success": True, "message": "Consent granted"}
@@ -2967,7 +3166,7 @@ async def grant_consent(
 @app.delete("/api/users/{user_id}/consent")
 async def revoke_consent(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_self)
 ):
     """Revoke consent for data processing.
     
@@ -2981,15 +3180,8 @@ async def revoke_consent(
     Raises:
         ForbiddenError: If user tries to revoke consent for another user
     """
-    # Verify user can only revoke their own consent
-    if current_user.user_id != user_id:
-        raise ForbiddenError("Cannot revoke consent for another user")
-    
     try:
-        if USE_FIRESTORE:
-            firestore_revoke_consent(user_id)
-        else:
-            sqlite_revoke_consent(user_id)
+        backend_revoke_consent(user_id)
         
         logger.info(f"Consent revoked for user {user_id}")
         return {"success": True, "message": "Consent revoked"}
@@ -3002,7 +3194,7 @@ async def revoke_consent(
 @app.get("/api/users/{user_id}/consent")
 async def get_consent_status_endpoint(
     user_id: str,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(require_self_or_operator)
 ):
     """Get consent status for user.
     
@@ -3016,17 +3208,8 @@ async def get_consent_status_endpoint(
     Raises:
         ForbiddenError: If non-operator tries to view another user's consent
     """
-    # Users can view their own consent, operators can view any
-    if current_user.user_id != user_id and not current_user.is_operator():
-        raise ForbiddenError("Cannot view consent for another user")
-    
     try:
-        if USE_FIRESTORE:
-            consent = firestore_get_consent_status(user_id)
-        else:
-            consent = sqlite_get_consent_status(user_id)
-        
-        return consent
+        return backend_get_consent_status(user_id)
     
     except Exception as e:
         logger.error(f"Error fetching consent status for user {user_id}: {str(e)}")
@@ -3044,7 +3227,8 @@ def get_traces(
     persona: Optional[str] = None,
     search: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """Get all traces with filtering.
     
@@ -3056,11 +3240,10 @@ def get_traces(
         - persona: Filter by persona
         - search: Search query
         - limit: Results per page (default: 50)
-        - offset: Pagination offset (default: 0)
+        - cursor: Keyset cursor from the previous page's meta.next_cursor
+        - offset: Pagination offset (deprecated, use cursor; default: 0)
     """
     try:
-        from src.traces.service import get_all_traces
-        
         # Parse trace types
         trace_types_list = None
         if trace_types:
@@ -3074,7 +3257,8 @@ def get_traces(
             persona=persona,
             search_query=search,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
         return {
@@ -3083,10 +3267,13 @@ def get_traces(
                 "total": result["total"],
                 "limit": result["limit"],
                 "offset": result["offset"],
-                "has_more": result["has_more"]
+                "has_more": result["has_more"],
+                "next_cursor": result["next_cursor"]
             }
         }
     
+    except InvalidCursorError as e:
+        raise InvalidInputError(str(e), field="cursor")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching traces: {str(e)}")
 
@@ -3098,12 +3285,11 @@ def get_user_traces(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
     limit: int = 50,
-    offset: int = 0
+    offset: int = 0,
+    cursor: Optional[str] = None
 ):
     """Get all traces for a specific user."""
     try:
-        from src.traces.service import get_all_traces
-        
         # Parse trace types
         trace_types_list = None
         if trace_types:
@@ -3115,7 +3301,8 @@ def get_user_traces(
             start_date=start_date,
             end_date=end_date,
             limit=limit,
-            offset=offset
+            offset=offset,
+            cursor=cursor
         )
         
         return {
@@ -3124,10 +3311,13 @@ def get_user_traces(
                 "total": result["total"],
                 "limit": result["limit"],
                 "offset": result["offset"],
-                "has_more": result["has_more"]
+                "has_more": result["has_more"],
+                "next_cursor": result["next_cursor"]
             }
         }
     
+    except InvalidCursorError as e:
+        raise InvalidInputError(str(e), field="cursor")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching user traces: {str(e)}")
 
@@ -3140,8 +3330,6 @@ def get_user_timeline(
 ):
     """Get chronological timeline of all events for a user."""
     try:
-        from src.traces.service import get_user_timeline as get_timeline
-        
         traces = get_timeline(
             user_id=user_id,
             start_date=start_date,
@@ -3164,8 +3352,6 @@ def get_user_timeline(
 def get_trace_detail(trace_id: str):
     """Get detailed information for a specific trace."""
     try:
-        from src.traces.service import get_trace_by_id
-        
         trace = get_trace_by_id(trace_id)
         
         if not trace:
@@ -3185,8 +3371,6 @@ def get_trace_detail(trace_id: str):
 def get_trace_stats(user_id: Optional[str] = None):
     """Get statistics about traces."""
     try:
-        from src.traces.service import get_trace_stats as get_stats
-        
         stats = get_stats(user_id=user_id)
         
         return {
@@ -3211,15 +3395,6 @@ def get_analytics_overview():
         - success_metrics: Metrics by persona
     """
     try:
-        from src.analytics.aggregators import (
-            get_total_users_count,
-            get_active_users_count,
-            get_recommendation_safety_indicators,
-            get_current_persona_distribution,
-            get_persona_distribution_by_week,
-            get_success_metrics_by_persona
-        )
-        
         # Get safety indicators (includes total recommendations)
         safety = get_recommendation_safety_indicators(use_firestore=USE_FIRESTORE)
         
@@ -3273,9 +3448,6 @@ def get_analytics_persona_trends(
         List of time-series data points with persona counts
     """
     try:
-        from src.analytics.aggregators import get_persona_distribution_by_week
-        from datetime import datetime
-        
         # Calculate weeks based on date range
         weeks = 12  # Default
         if start_date and end_date:
@@ -3320,23 +3492,17 @@ def get_analytics_success_metrics(
         - System performance (acceptance rate, override rate)
     """
     try:
-        from src.analytics.aggregators import get_success_metrics_by_persona
-        
         # Validate persona if provided
-        if persona:
-            valid_personas = ["high_utilization", "variable_income", "subscription_heavy", 
-                            "savings_builder", "general_wellness"]
-            if persona not in valid_personas:
-                raise InvalidInputError(
-                    f"Invalid persona: {persona}. Must be one of: {', '.join(valid_personas)}",
-                    field="persona"
-                )
+        if persona and persona not in _VALID_PERSONAS:
+            raise InvalidInputError(
+                f"Invalid persona: {persona}. Must be one of: {_VALID_PERSONAS_MSG}",
+                field="persona"
+            )
         
         # Validate time_window
-        valid_windows = ["30d", "90d", "180d"]
-        if time_window not in valid_windows:
+        if time_window not in _VALID_ANALYTICS_WINDOWS:
             raise InvalidInputError(
-                f"Invalid time_window: {time_window}. Must be one of: {', '.join(valid_windows)}",
+                f"Invalid time_window: {time_window}. Must be one of: {_VALID_ANALYTICS_WINDOWS_MSG}",
                 field="time_window"
             )
         
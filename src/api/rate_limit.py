@@ -106,6 +106,8 @@ class DatabaseRateLimitStorage(RateLimitStorage):
                 CREATE INDEX IF NOT EXISTS idx_rate_limits_expires_at 
                 ON rate_limits(expires_at)
             """)
+            # The primary key index already covers (user_id, endpoint, window_start)
+            conn.execute("DROP INDEX IF EXISTS idx_rate_limits_uew")
     
     def get_count(self, user_id: str, endpoint: str, window_start: datetime) -> int:
         window_start_str = window_start.isoformat()
@@ -0,0 +1,70 @@
+"""Single-flight request coalescing for SpendSense API.
+
+This module lets concurrent identical requests (e.g. a client retrying a chat
+message within milliseconds) share one in-flight computation instead of each
+triggering its own OpenAI call and chat log row.
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share the same key.
+    
+    The first caller for a key starts the work; callers arriving while it is
+    still running await the same task and receive its result (or
+    exception). Once the work finishes the key is released, so later calls
+    run fresh.
+    """
+    
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+    
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn for key, or await the in-flight call with the same key.
+        
+        The work runs as a task shared by all callers for the key. Callers are
+        awaited through a shield, so a disconnecting client does not cancel
+        the work for the others. Must be called from the event loop thread.
+        
+        Args:
+            key: Coalescing key
+            fn: Zero-argument callable returning an awaitable
+            
+        Returns:
+            Result of the awaitable (shared by all coalesced callers)
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            
+            def _release(done: asyncio.Task) -> None:
+                if self._tasks.get(key) is done:
+                    del self._tasks[key]
+            
+            task.add_done_callback(_release)
+        return await asyncio.shield(task)
+    
+    def in_flight(self, key: str) -> bool:
+        """Return True if a call for key is currently running."""
+        return key in self._tasks
+
+
+def make_key(*parts: Any) -> str:
+    """Build a compact coalescing key from request parts.
+    
+    Args:
+        *parts: Values identifying the request (e.g. user_id, message)
+        
+    Returns:
+        Hex digest of the joined parts
+    """
+    raw = "\x1f".join(str(part) for part in parts)
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Shared coalescer for chat requests
+chat_single_flight = SingleFlight()
@@ -8,12 +8,17 @@ import re
 from typing import Optional, Tuple
 from fastapi import HTTPException
 
+from src.api.exceptions import InvalidInputError
+
+
+# ID patterns are matched with fullmatch(), so the anchors are redundant but
+# kept for readability (note `$` alone would also accept a trailing newline)
 
 # User ID format: user_XXX where XXX is 3 digits
 USER_ID_PATTERN = re.compile(r'^user_\d{3}$')
 
 # Valid time windows
-VALID_TIME_WINDOWS = {'30d', '180d'}
+VALID_TIME_WINDOWS = frozenset({'30d', '180d'})
 
 # Valid recommendation ID format: rec_XXXXXXXXXXXX (12 hex chars)
 RECOMMENDATION_ID_PATTERN = re.compile(r'^rec_[a-f0-9]{12}$')
@@ -22,6 +27,26 @@ RECOMMENDATION_ID_PATTERN = re.compile(r'^rec_[a-f0-9]{12}$')
 ACCOUNT_ID_PATTERN = re.compile(r'^acc_[a-z0-9]+$')
 
 
+def _id_error(field: str, value, expected: Optional[str] = None) -> str:
+    """Build the error message for a failed ID validation (failure path only).
+    
+    Args:
+        field: Name of the validated field
+        value: Rejected value
+        expected: Human-readable expected format (optional)
+        
+    Returns:
+        Error message
+    """
+    if not value:
+        return f"{field} is required"
+    if not isinstance(value, str):
+        return f"{field} must be a string"
+    if expected:
+        return f"Invalid {field} format: {value}. Expected format: {expected}"
+    return f"Invalid {field} format: {value}"
+
+
 def validate_user_id(user_id: str) -> Tuple[bool, str]:
     """Validate user_id format.
     
@@ -31,16 +56,9 @@ def validate_user_id(user_id: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not user_id:
-        return False, "user_id is required"
-    
-    if not isinstance(user_id, str):
-        return False, "user_id must be a string"
-    
-    if not USER_ID_PATTERN.match(user_id):
-        return False, f"Invalid user_id format: {user_id}. Expected format: user_XXX (where XXX is 3 digits)"
-    
-    return True, ""
+    if isinstance(user_id, str) and USER_ID_PATTERN.fullmatch(user_id):
+        return True, ""
+    return False, _id_error("user_id", user_id, "user_XXX (where XXX is 3 digits)")
 
 
 def validate_time_window(time_window: Optional[str]) -> Tuple[bool, str, Optional[str]]:
@@ -55,6 +73,11 @@ def validate_time_window(time_window: Optional[str]) -> Tuple[bool, str, Optiona
     if time_window is None:
         return True, "", "30d"  # Default to 30d
     
+    # Common case: already a valid lowercase literal, no allocation needed.
+    # str subclasses (e.g. str enums) take the path below, which returns a plain str
+    if type(time_window) is str and time_window in VALID_TIME_WINDOWS:
+        return True, "", time_window
+    
     if not isinstance(time_window, str):
         return False, "time_window must be a string", None
     
@@ -75,16 +98,9 @@ def validate_recommendation_id(recommendation_id: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not recommendation_id:
-        return False, "recommendation_id is required"
-    
-    if not isinstance(recommendation_id, str):
-        return False, "recommendation_id must be a string"
-    
-    if not RECOMMENDATION_ID_PATTERN.match(recommendation_id):
-        return False, f"Invalid recommendation_id format: {recommendation_id}. Expected format: rec_XXXXXXXXXXXX"
-    
-    return True, ""
+    if isinstance(recommendation_id, str) and RECOMMENDATION_ID_PATTERN.fullmatch(recommendation_id):
+        return True, ""
+    return False, _id_error("recommendation_id", recommendation_id, "rec_XXXXXXXXXXXX")
 
 
 def validate_account_id(account_id: str) -> Tuple[bool, str]:
@@ -96,16 +112,9 @@ def validate_account_id(account_id: str) -> Tuple[bool, str]:
     Returns:
         Tuple of (is_valid, error_message)
     """
-    if not account_id:
-        return False, "account_id is required"
-    
-    if not isinstance(account_id, str):
-        return False, "account_id must be a string"
-    
-    if not ACCOUNT_ID_PATTERN.match(account_id):
-        return False, f"Invalid account_id format: {account_id}"
-    
-    return True, ""
+    if isinstance(account_id, str) and ACCOUNT_ID_PATTERN.fullmatch(account_id):
+        return True, ""
+    return False, _id_error("account_id", account_id)
 
 
 def validate_limit(limit: Optional[int], default: int = 50, max_limit: int = 100) -> Tuple[bool, str, int]:
@@ -156,6 +165,107 @@ def validate_offset(offset: Optional[int], default: int = 0) -> Tuple[bool, str,
     return True, "", offset
 
 
+# Exception-raising variants for route handlers. The success path returns
+# without allocating result tuples; the tuple-returning validators above are
+# only consulted to build the error message on failure.
+
+def check_user_id(user_id: str) -> None:
+    """Validate user_id format, raising on failure.
+    
+    Args:
+        user_id: User ID to validate
+        
+    Raises:
+        InvalidInputError: If user_id is missing or malformed
+    """
+    if isinstance(user_id, str) and USER_ID_PATTERN.fullmatch(user_id):
+        return
+    is_valid, error_msg = validate_user_id(user_id)
+    if not is_valid:
+        raise InvalidInputError(error_msg, field="user_id")
+
+
+def check_recommendation_id(recommendation_id: str) -> None:
+    """Validate recommendation_id format, raising on failure.
+    
+    Args:
+        recommendation_id: Recommendation ID to validate
+        
+    Raises:
+        InvalidInputError: If recommendation_id is missing or malformed
+    """
+    if isinstance(recommendation_id, str) and RECOMMENDATION_ID_PATTERN.fullmatch(recommendation_id):
+        return
+    is_valid, error_msg = validate_recommendation_id(recommendation_id)
+    if not is_valid:
+        raise InvalidInputError(error_msg, field="recommendation_id")
+
+
+def check_time_window(time_window: Optional[str]) -> str:
+    """Validate time_window parameter, raising on failure.
+    
+    Args:
+        time_window: Time window string to validate
+        
+    Returns:
+        Normalized time window (defaults to "30d")
+        
+    Raises:
+        InvalidInputError: If time_window is not a supported window
+    """
+    if type(time_window) is str and time_window in VALID_TIME_WINDOWS:
+        return time_window
+    is_valid, error_msg, normalized = validate_time_window(time_window)
+    if is_valid:
+        return normalized
+    raise InvalidInputError(error_msg, field="time_window")
+
+
+def check_limit(limit: Optional[int], default: int = 50, max_limit: int = 100, field: str = "limit") -> int:
+    """Validate pagination limit parameter, raising on failure.
+    
+    Args:
+        limit: Limit value to validate
+        default: Default limit if None
+        max_limit: Maximum allowed limit
+        field: Field name reported in the error
+        
+    Returns:
+        Normalized limit
+        
+    Raises:
+        InvalidInputError: If limit is out of range
+    """
+    if type(limit) is int and 1 <= limit <= max_limit:
+        return limit
+    is_valid, error_msg, normalized = validate_limit(limit, default=default, max_limit=max_limit)
+    if is_valid:
+        return normalized
+    raise InvalidInputError(error_msg, field=field)
+
+
+def check_offset(offset: Optional[int], default: int = 0, field: str = "offset") -> int:
+    """Validate pagination offset parameter, raising on failure.
+    
+    Args:
+        offset: Offset value to validate
+        default: Default offset if None
+        field: Field name reported in the error
+        
+    Returns:
+        Normalized offset
+        
+    Raises:
+        InvalidInputError: If offset is negative
+    """
+    if type(offset) is int and offset >= 0:
+        return offset
+    is_valid, error_msg, normalized = validate_offset(offset, default=default)
+    if is_valid:
+        return normalized
+    raise InvalidInputError(error_msg, field=field)
+
+
 def sanitize_string(value: str, max_length: Optional[int] = None) -> str:
     """Sanitize string input (strip whitespace, prevent injection).
     
@@ -169,8 +279,10 @@ def sanitize_string(value: str, max_length: Optional[int] = None) -> str:
     if not isinstance(value, str):
         return ""
     
-    # Strip whitespace
-    sanitized = value.strip()
+    # Strip whitespace (only when there is any to strip)
+    sanitized = value
+    if value and (value[0].isspace() or value[-1].isspace()):
+        sanitized = value.strip()
     
     # Limit length if specified
     if max_length is not None and len(sanitized) > max_length:
@@ -0,0 +1,156 @@
+"""Typed views over the user feature payload for chat context building.
+
+The feature payload arrives as nested dictionaries (as stored and as sent
+through the sanitizer). Chat context building and citation extraction both
+walk the same fields, so they read them once into slotted dataclasses; credit
+accounts are stored column-wise so the per-account loops zip over tuples.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+@dataclass(frozen=True, slots=True)
+class CreditAccounts:
+    """Credit accounts stored as parallel tuples (one entry per account).
+
+    Masks are None when an account has no account_mask.
+    """
+
+    masks: Tuple[Optional[str], ...] = ()
+    utilizations: Tuple[float, ...] = ()
+    balances: Tuple[float, ...] = ()
+    limits: Tuple[float, ...] = ()
+
+    @classmethod
+    def from_dict(cls, credit_utilization: Dict[str, Any]) -> "CreditAccounts":
+        """Build from a credit_utilization feature dictionary.
+
+        Args:
+            credit_utilization: Feature dictionary with an 'accounts' list
+
+        Returns:
+            CreditAccounts instance
+        """
+        accounts = credit_utilization.get('accounts') or []
+        return cls(
+            masks=tuple(acc.get('account_mask') for acc in accounts),
+            utilizations=tuple(acc.get('utilization', 0) for acc in accounts),
+            balances=tuple(acc.get('balance', 0) for acc in accounts),
+            limits=tuple(acc.get('limit', 0) for acc in accounts),
+        )
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+
+@dataclass(frozen=True, slots=True)
+class Subscriptions:
+    """Recurring subscription summary."""
+
+    monthly_recurring: float = 0
+    recurring_merchants: Tuple[Dict[str, Any], ...] = ()
+
+    @classmethod
+    def from_dict(cls, subscriptions: Dict[str, Any]) -> "Subscriptions":
+        """Build from a subscriptions feature dictionary.
+
+        Args:
+            subscriptions: Feature dictionary with monthly totals and merchants
+
+        Returns:
+            Subscriptions instance
+        """
+        return cls(
+            monthly_recurring=subscriptions.get('monthly_recurring', 0),
+            recurring_merchants=tuple(subscriptions.get('recurring_merchants', [])),
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class SavingsBehavior:
+    """Average monthly income and expenses."""
+
+    avg_monthly_income: float = 0
+    avg_monthly_expenses: float = 0
+
+    @classmethod
+    def from_dict(cls, savings_behavior: Dict[str, Any]) -> "SavingsBehavior":
+        """Build from a savings_behavior feature dictionary.
+
+        Args:
+            savings_behavior: Feature dictionary with monthly averages
+
+        Returns:
+            SavingsBehavior instance
+        """
+        return cls(
+            avg_monthly_income=savings_behavior.get('avg_monthly_income', 0),
+            avg_monthly_expenses=savings_behavior.get('avg_monthly_expenses', 0),
+        )
+
+    @property
+    def savings_rate(self) -> Optional[float]:
+        """Savings rate in percent, or None when there is no income."""
+        if self.avg_monthly_income > 0:
+            return ((self.avg_monthly_income - self.avg_monthly_expenses) / self.avg_monthly_income) * 100
+        return None
+
+
+@dataclass(frozen=True, slots=True)
+class FeatureSummary:
+    """The parts of the user feature payload used by chat.
+
+    Sections are None when the feature is missing or empty.
+    """
+
+    credit_accounts: Optional[CreditAccounts] = None
+    subscriptions: Optional[Subscriptions] = None
+    savings: Optional[SavingsBehavior] = None
+
+    @classmethod
+    def from_features(cls, user_features: Dict[str, Any]) -> "FeatureSummary":
+        """Build from a user feature dictionary.
+
+        Args:
+            user_features: User's computed (or sanitized) features
+
+        Returns:
+            FeatureSummary instance
+        """
+        credit_utilization = user_features.get('credit_utilization')
+        subscriptions = user_features.get('subscriptions')
+        savings_behavior = user_features.get('savings_behavior')
+        return cls(
+            credit_accounts=CreditAccounts.from_dict(credit_utilization) if credit_utilization else None,
+            subscriptions=Subscriptions.from_dict(subscriptions) if subscriptions else None,
+            savings=SavingsBehavior.from_dict(savings_behavior) if savings_behavior else None,
+        )
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Return the summary in the original feature dictionary layout.
+
+        Returns:
+            Dictionary with credit_utilization, subscriptions and
+            savings_behavior keys for the sections that are present
+        """
+        features = {}
+        if self.credit_accounts is not None:
+            ca = self.credit_accounts
+            features['credit_utilization'] = {
+                'accounts': [
+                    {'account_mask': mask, 'utilization': utilization, 'balance': balance, 'limit': limit}
+                    for mask, utilization, balance, limit in zip(ca.masks, ca.utilizations, ca.balances, ca.limits)
+                ]
+            }
+        if self.subscriptions is not None:
+            features['subscriptions'] = {
+                'monthly_recurring': self.subscriptions.monthly_recurring,
+                'recurring_merchants': list(self.subscriptions.recurring_merchants),
+            }
+        if self.savings is not None:
+            features['savings_behavior'] = {
+                'avg_monthly_income': self.savings.avg_monthly_income,
+                'avg_monthly_expenses': self.savings.avg_monthly_expenses,
+            }
+        return features
@@ -1,18 +1,11 @@
 """System prompts for chat functionality."""
 
+from io import StringIO
 from typing import List, Dict, Any, Optional
 
 from src.utils.category_utils import get_primary_category
-from src.chat.transaction_analysis import (
-    calculate_weekday_spending,
-    calculate_monthly_progression,
-    calculate_spending_velocity,
-    build_detailed_category_analysis,
-    analyze_merchant_patterns,
-    analyze_payment_channels,
-    analyze_by_account,
-    analyze_pending_transactions
-)
+from src.chat.features import FeatureSummary
+from src.chat.transaction_analysis import analyze_transactions
 
 SYSTEM_PROMPT = """You are a helpful financial education assistant for SpendSense. Your role is to provide educational information about users' financial data, NOT financial advice.
 
@@ -64,11 +57,13 @@ def build_user_context(
     Returns:
         Formatted context string for LLM
     """
-    context_parts = []
+    # Every line is written with a trailing newline; the last one is dropped on return
+    buf = StringIO()
+    write = buf.write
     user_accounts = user_accounts or []
     
     # Add time window context
-    context_parts.append(f"Transaction Window: Last {transaction_window_days} days ({len(recent_transactions)} transactions)")
+    write(f"Transaction Window: Last {transaction_window_days} days ({len(recent_transactions)} transactions)\n")
     
     # Add persona information if available
     if persona:
@@ -78,145 +73,154 @@ def build_user_context(
             persona_name = persona
         else:
             persona_name = 'Unknown'
-        context_parts.append(f"\nUser Persona: {persona_name}")
+        write(f"\nUser Persona: {persona_name}\n")
+    
+    # Run every transaction analysis in a single pass
+    analysis = analyze_transactions(
+        recent_transactions,
+        user_accounts,
+        window_days=transaction_window_days
+    ) if recent_transactions else None
     
     # Add temporal spending patterns
     if recent_transactions:
-        weekday_analysis = calculate_weekday_spending(recent_transactions)
+        weekday_analysis = analysis.weekday_spending
         if weekday_analysis['weekday_count'] > 0 or weekday_analysis['weekend_count'] > 0:
-            context_parts.append("\nSpending Patterns:")
+            write("\nSpending Patterns:\n")
             if weekday_analysis['weekday_count'] > 0:
-                context_parts.append(
+                write(
                     f"  - Weekday: {weekday_analysis['weekday_count']} transactions, "
-                    f"${weekday_analysis['weekday_total']:.2f} total (avg ${weekday_analysis['weekday_avg']:.2f})"
+                    f"${weekday_analysis['weekday_total']:.2f} total (avg ${weekday_analysis['weekday_avg']:.2f})\n"
                 )
             if weekday_analysis['weekend_count'] > 0:
-                context_parts.append(
+                write(
                     f"  - Weekend: {weekday_analysis['weekend_count']} transactions, "
-                    f"${weekday_analysis['weekend_total']:.2f} total (avg ${weekday_analysis['weekend_avg']:.2f})"
+                    f"${weekday_analysis['weekend_total']:.2f} total (avg ${weekday_analysis['weekend_avg']:.2f})\n"
                 )
             if weekday_analysis['highest_day'] != 'Unknown':
-                context_parts.append(
+                write(
                     f"  - Highest spending day: {weekday_analysis['highest_day']} "
-                    f"(${weekday_analysis['highest_day_total']:.2f})"
+                    f"(${weekday_analysis['highest_day_total']:.2f})\n"
                 )
         
         # Add month-to-date progression
-        mtd_analysis = calculate_monthly_progression(recent_transactions)
+        mtd_analysis = analysis.monthly_progression
         if mtd_analysis['spent_mtd'] > 0:
-            context_parts.append(f"\nMonth-to-Date ({mtd_analysis['current_month']}):")
-            context_parts.append(
+            write(f"\nMonth-to-Date ({mtd_analysis['current_month']}):\n")
+            write(
                 f"  - Spent so far: ${mtd_analysis['spent_mtd']:.2f} "
-                f"({mtd_analysis['transaction_count_mtd']} transactions)"
+                f"({mtd_analysis['transaction_count_mtd']} transactions)\n"
             )
-            context_parts.append(
+            write(
                 f"  - Daily average: ${mtd_analysis['daily_avg']:.2f} "
-                f"({mtd_analysis['days_elapsed']} days elapsed, {mtd_analysis['days_remaining']} remaining)"
+                f"({mtd_analysis['days_elapsed']} days elapsed, {mtd_analysis['days_remaining']} remaining)\n"
             )
-            context_parts.append(f"  - Projected monthly: ${mtd_analysis['projected_monthly']:.2f}")
+            write(f"  - Projected monthly: ${mtd_analysis['projected_monthly']:.2f}\n")
         
         # Add spending velocity/trend
         if transaction_window_days >= 14:  # Only show trend for longer windows
-            velocity = calculate_spending_velocity(recent_transactions, transaction_window_days)
+            velocity = analysis.spending_velocity
             if velocity['trend'] != 'stable':
-                context_parts.append(f"\nSpending Trend: {velocity['trend'].title()}")
-                context_parts.append(
+                write(f"\nSpending Trend: {velocity['trend'].title()}\n")
+                write(
                     f"  - First half: ${velocity['first_half_spending']:.2f}, "
                     f"Second half: ${velocity['second_half_spending']:.2f} "
-                    f"({velocity['change_pct']:+.1f}%)"
+                    f"({velocity['change_pct']:+.1f}%)\n"
                 )
     
     # Add feature summaries
-    if user_features.get('credit_utilization'):
-        cu = user_features['credit_utilization']
-        if cu.get('accounts'):
-            context_parts.append("\nCredit Utilization:")
-            for acc in cu['accounts']:
-                utilization_pct = round(acc.get('utilization', 0) * 100, 1)
-                context_parts.append(
-                    f"  - {acc.get('account_mask', 'Account')}: {utilization_pct}% "
-                    f"(${acc.get('balance', 0):.2f} of ${acc.get('limit', 0):.2f})"
-                )
+    summary = FeatureSummary.from_features(user_features)
     
-    if user_features.get('subscriptions'):
-        subs = user_features['subscriptions']
-        monthly_total = subs.get('monthly_recurring', 0)
-        if monthly_total > 0:
-            context_parts.append(f"\nRecurring Subscriptions: ${monthly_total:.2f}/month")
-            for merchant in subs.get('recurring_merchants', [])[:5]:
-                context_parts.append(
-                    f"  - {merchant.get('merchant', 'Unknown')}: ${merchant.get('amount', 0):.2f}/month"
-                )
+    credit_accounts = summary.credit_accounts
+    if credit_accounts:
+        write("\nCredit Utilization:\n")
+        for mask, utilization, balance, limit in zip(
+            credit_accounts.masks,
+            credit_accounts.utilizations,
+            credit_accounts.balances,
+            credit_accounts.limits
+        ):
+            utilization_pct = round(utilization * 100, 1)
+            write(
+                f"  - {mask if mask is not None else 'Account'}: {utilization_pct}% "
+                f"(${balance:.2f} of ${limit:.2f})\n"
+            )
     
-    if user_features.get('savings_behavior'):
-        sb = user_features['savings_behavior']
-        avg_income = sb.get('avg_monthly_income', 0)
-        avg_expenses = sb.get('avg_monthly_expenses', 0)
-        if avg_income > 0:
-            savings_rate = ((avg_income - avg_expenses) / avg_income) * 100
-            context_parts.append(
-                f"\nSavings Behavior: Average monthly income ${avg_income:.2f}, "
-                f"expenses ${avg_expenses:.2f} (savings rate: {savings_rate:.1f}%)"
+    subs = summary.subscriptions
+    if subs and subs.monthly_recurring > 0:
+        write(f"\nRecurring Subscriptions: ${subs.monthly_recurring:.2f}/month\n")
+        for merchant in subs.recurring_merchants[:5]:
+            write(
+                f"  - {merchant.get('merchant', 'Unknown')}: ${merchant.get('amount', 0):.2f}/month\n"
             )
     
+    savings = summary.savings
+    if savings and savings.savings_rate is not None:
+        write(
+            f"\nSavings Behavior: Average monthly income ${savings.avg_monthly_income:.2f}, "
+            f"expenses ${savings.avg_monthly_expenses:.2f} (savings rate: {savings.savings_rate:.1f}%)\n"
+        )
+    
     # Add detailed category breakdown
     if recent_transactions:
-        category_analysis = build_detailed_category_analysis(recent_transactions)
+        category_analysis = analysis.category_breakdown
         if category_analysis:
-            context_parts.append("\nSpending by Category:")
+            write("\nSpending by Category:\n")
             for cat in category_analysis[:5]:  # Top 5 categories
-                context_parts.append(
+                write(
                     f"  - {cat['category']}: ${cat['amount']:.2f} ({cat['percentage']:.1f}%) - "
-                    f"{cat['transaction_count']} transactions (avg ${cat['avg_transaction']:.2f})"
+                    f"{cat['transaction_count']} transactions (avg ${cat['avg_transaction']:.2f})\n"
                 )
         
         # Add payment channel analysis
-        channel_analysis = analyze_payment_channels(recent_transactions)
+        channel_analysis = analysis.payment_channels
         if channel_analysis:
-            context_parts.append("\nPayment Channels:")
+            write("\nPayment Channels:\n")
             for channel, data in channel_analysis.items():
                 if data['count'] > 0:
-                    context_parts.append(
+                    write(
                         f"  - {channel.replace('_', ' ').title()}: {data['count']} transactions, "
-                        f"${data['amount']:.2f}"
+                        f"${data['amount']:.2f}\n"
                     )
         
         # Add frequent merchant analysis
-        frequent_merchants = analyze_merchant_patterns(recent_transactions)
+        frequent_merchants = analysis.frequent_merchants
         if frequent_merchants:
-            context_parts.append("\nFrequent Merchants (3+ visits):")
+            write("\nFrequent Merchants (3+ visits):\n")
             for merchant, data in frequent_merchants:
                 avg_per_visit = data['total_spent'] / data['visit_count']
-                context_parts.append(
+                write(
                     f"  - {merchant}: {data['visit_count']} visits, "
-                    f"${data['total_spent']:.2f} total (avg ${avg_per_visit:.2f} per visit)"
+                    f"${data['total_spent']:.2f} total (avg ${avg_per_visit:.2f} per visit)\n"
                 )
         
         # Add pending transaction analysis
-        pending_analysis = analyze_pending_transactions(recent_transactions)
+        pending_analysis = analysis.pending
         if pending_analysis['count'] > 0:
-            context_parts.append(f"\nPending Transactions:")
-            context_parts.append(f"  - Count: {pending_analysis['count']}")
+            write(f"\nPending Transactions:\n")
+            write(f"  - Count: {pending_analysis['count']}\n")
             if pending_analysis['pending_charges'] > 0:
-                context_parts.append(f"  - Pending charges: ${pending_analysis['pending_charges']:.2f}")
+                write(f"  - Pending charges: ${pending_analysis['pending_charges']:.2f}\n")
             if pending_analysis['pending_deposits'] > 0:
-                context_parts.append(f"  - Pending deposits: ${pending_analysis['pending_deposits']:.2f}")
-            context_parts.append(f"  - Net pending: ${pending_analysis['net_pending']:.2f}")
+                write(f"  - Pending deposits: ${pending_analysis['pending_deposits']:.2f}\n")
+            write(f"  - Net pending: ${pending_analysis['net_pending']:.2f}\n")
         
         # Add account-specific activity
         if user_accounts:
-            account_activity = analyze_by_account(recent_transactions, user_accounts)
+            account_activity = analysis.account_activity
             if account_activity:
-                context_parts.append("\nAccount Activity:")
+                write("\nAccount Activity:\n")
                 for account_id, activity in account_activity.items():
                     mask_display = f"ending in {activity['mask']}" if activity['mask'] != 'Unknown' else activity['mask']
-                    context_parts.append(
+                    write(
                         f"  - {activity['subtype'].title()} {mask_display}: "
                         f"{activity['transaction_count']} transactions, "
                         f"${activity['total_spent']:.2f} spent"
                     )
                     if activity['total_income'] > 0:
-                        context_parts[-1] += f", ${activity['total_income']:.2f} deposited"
+                        write(f", ${activity['total_income']:.2f} deposited")
+                    write("\n")
     
-    return "\n".join(context_parts) if context_parts else "No financial data available."
+    context = buf.getvalue()
+    return context[:-1] if context else "No financial data available."
 
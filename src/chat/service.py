@@ -2,10 +2,13 @@
 
 import json
 import os
+import re
 from datetime import datetime
-from typing import Dict, List, Optional, Any
-from openai import OpenAI
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Any, Tuple
+from openai import AsyncOpenAI, OpenAI
 
+from src.chat.features import FeatureSummary
 from src.chat.prompts import SYSTEM_PROMPT, build_user_context
 from src.guardrails.guardrails_ai import get_guardrails
 from src.guardrails.data_sanitizer import get_sanitizer
@@ -14,48 +17,69 @@ from src.utils.logging import get_logger
 # Initialize logger
 logger = get_logger("chat")
 
-# Initialize OpenAI client
-OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-if OPENAI_API_KEY:
-    client = OpenAI(api_key=OPENAI_API_KEY)
-else:
-    client = None
-
 # Chat agent configuration from environment
 CHAT_MAX_CONTEXT_TOKENS = int(os.getenv('CHAT_MAX_CONTEXT_TOKENS', '2000'))
 CHAT_MAX_TRANSACTIONS = int(os.getenv('CHAT_MAX_TRANSACTIONS', '100'))
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4o-mini')
+
+DISCLAIMER = "This is educational content, not financial advice. Consult a licensed advisor for personalized guidance."
+# Case-insensitive presence check without lowercasing a copy of the response
+_DISCLAIMER_RE = re.compile(re.escape(DISCLAIMER), re.IGNORECASE)
+
+
+class Citation(NamedTuple):
+    """A data point from the user's context that a response refers to."""
+    data_point: str
+    value: str
+
+
+@lru_cache(maxsize=None)
+def get_openai_client() -> Optional[OpenAI]:
+    """Get or create the synchronous OpenAI client (used for streaming).
+    
+    Returns:
+        OpenAI client, or None if OPENAI_API_KEY is not set
+    """
+    api_key = os.getenv('OPENAI_API_KEY')
+    return OpenAI(api_key=api_key) if api_key else None
 
 
-def generate_chat_response(
+@lru_cache(maxsize=None)
+def get_async_openai_client() -> Optional[AsyncOpenAI]:
+    """Get or create the async OpenAI client.
+    
+    The client is created on first use and shared, so its connection pool
+    is reused across requests.
+    
+    Returns:
+        AsyncOpenAI client, or None if OPENAI_API_KEY is not set
+    """
+    api_key = os.getenv('OPENAI_API_KEY')
+    return AsyncOpenAI(api_key=api_key) if api_key else None
+
+
+def _build_chat_messages(
     message: str,
     user_features: dict,
     recent_transactions: list,
-    persona: Optional[dict] = None,
-    max_retries: int = 2,
-    transaction_window_days: int = 30,
-    user_accounts: Optional[list] = None
-) -> Dict[str, Any]:
-    """Generate chat response using OpenAI API with guardrails.
+    persona: Optional[dict],
+    transaction_window_days: int,
+    user_accounts: Optional[list]
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """Sanitize the user's context and build the OpenAI message list.
     
     Args:
         message: User's message/question
         user_features: User's computed features from get_user_features()
         recent_transactions: List of recent transactions
         persona: User's persona assignment (optional)
-        max_retries: Maximum number of retries if validation fails
         transaction_window_days: Number of days in transaction window
         user_accounts: List of user account dictionaries (optional)
         
     Returns:
-        Dictionary with 'response' and 'citations' keys
-        
-    Raises:
-        ValueError: If OpenAI API key is not configured
-        RuntimeError: If response fails validation after retries
+        Tuple of (chat messages (system prompt + user context and question),
+        sanitized context the messages were built from)
     """
-    if not client:
-        raise ValueError("OPENAI_API_KEY environment variable not set")
-    
     # Initialize sanitizer
     sanitizer = get_sanitizer()
     
@@ -86,31 +110,22 @@ def generate_chat_response(
         persona
     )
     
-    # Estimate token usage
-    estimated_tokens = sanitizer.estimate_context_tokens(
+    # Estimate token usage and reduce transaction context if over the limit
+    reduced_transactions, estimated_tokens, reduced_tokens = sanitizer.fit_context_to_budget(
         sanitized_context['user_features'],
-        sanitized_context['recent_transactions']
+        sanitized_context['recent_transactions'],
+        target_tokens=CHAT_MAX_CONTEXT_TOKENS
     )
     
     logger.info(f"Estimated context tokens: {estimated_tokens}")
     
-    # If estimated tokens exceed limit, reduce transaction context
     if estimated_tokens > CHAT_MAX_CONTEXT_TOKENS:
         logger.warning(
             f"Context tokens ({estimated_tokens}) exceed limit ({CHAT_MAX_CONTEXT_TOKENS}). "
             "Reducing transaction context."
         )
-        sanitized_context['recent_transactions'] = sanitizer.reduce_transaction_context(
-            sanitized_context['recent_transactions'],
-            target_tokens=CHAT_MAX_CONTEXT_TOKENS
-        )
-        
-        # Re-estimate after reduction
-        new_token_estimate = sanitizer.estimate_context_tokens(
-            sanitized_context['user_features'],
-            sanitized_context['recent_transactions']
-        )
-        logger.info(f"Reduced context tokens to: {new_token_estimate}")
+        sanitized_context['recent_transactions'] = reduced_transactions
+        logger.info(f"Reduced context tokens to: {reduced_tokens}")
     
     # Validate merchant names in transactions
     guardrails = get_guardrails()
@@ -151,12 +166,60 @@ Please provide an educational response that cites specific data points from the
         }
     ]
     
+    return messages, sanitized_context
+
+
+async def generate_chat_response(
+    message: str,
+    user_features: dict,
+    recent_transactions: list,
+    persona: Optional[dict] = None,
+    max_retries: int = 2,
+    transaction_window_days: int = 30,
+    user_accounts: Optional[list] = None
+) -> Dict[str, Any]:
+    """Generate chat response using OpenAI API with guardrails.
+    
+    Args:
+        message: User's message/question
+        user_features: User's computed features from get_user_features()
+        recent_transactions: List of recent transactions
+        persona: User's persona assignment (optional)
+        max_retries: Maximum number of retries if validation fails
+        transaction_window_days: Number of days in transaction window
+        user_accounts: List of user account dictionaries (optional)
+        
+    Returns:
+        Dictionary with 'response' and 'citations' keys
+        
+    Raises:
+        ValueError: If OpenAI API key is not configured
+        RuntimeError: If response fails validation after retries
+    """
+    client = get_async_openai_client()
+    if not client:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+    
+    messages, sanitized_context = _build_chat_messages(
+        message,
+        user_features,
+        recent_transactions,
+        persona,
+        transaction_window_days,
+        user_accounts
+    )
+    guardrails = get_guardrails()
+    
+    # Each attempt sends the base conversation plus at most one revision
+    # exchange, so the prompt does not grow with every retry
+    request_messages = messages
+    
     # Generate response with retries if validation fails
     for attempt in range(max_retries + 1):
         try:
-            response = client.chat.completions.create(
-                model=os.getenv('OPENAI_MODEL', 'gpt-4o-mini'),
-                messages=messages,
+            response = await client.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=request_messages,
                 temperature=0.7,
                 max_tokens=500
             )
@@ -169,37 +232,27 @@ Please provide an educational response that cites specific data points from the
             if not is_valid:
                 prohibited = guardrails.check_prohibited_phrases(response_text)
                 if attempt < max_retries:
-                    # Retry with stricter prompt
-                    messages.append({
-                        "role": "assistant",
-                        "content": response_text
-                    })
-                    messages.append({
-                        "role": "user",
-                        "content": f"Please revise your response. Avoid these phrases: {', '.join(prohibited)}. Use more neutral, educational language."
-                    })
+                    # Retry with stricter prompt, revising only the latest draft
+                    request_messages = messages + [
+                        {
+                            "role": "assistant",
+                            "content": response_text
+                        },
+                        {
+                            "role": "user",
+                            "content": f"Please revise your response. Avoid these phrases: {', '.join(prohibited)}. Use more neutral, educational language."
+                        }
+                    ]
                     continue
                 else:
                     # Filter out prohibited phrases as fallback
-                    for phrase in prohibited:
-                        response_text = response_text.replace(phrase, "")
+                    response_text = _remove_phrases(response_text, prohibited)
                     # Log warning but proceed
             
             # Use validated text if available
             response_text = validated_text if validated_text else response_text
             
-            # Ensure disclaimer is present
-            disclaimer = "This is educational content, not financial advice. Consult a licensed advisor for personalized guidance."
-            if disclaimer.lower() not in response_text.lower():
-                response_text += f"\n\n{disclaimer}"
-            
-            # Extract citations (simple pattern matching for now)
-            citations = extract_citations(response_text, user_features, recent_transactions)
-            
-            return {
-                "response": response_text,
-                "citations": citations
-            }
+            return _finalize_response(response_text, sanitized_context)
             
         except Exception as e:
             if attempt < max_retries:
@@ -209,55 +262,186 @@ Please provide an educational response that cites specific data points from the
     raise RuntimeError("Failed to generate valid response after retries")
 
 
-def extract_citations(response_text: str, user_features: dict, recent_transactions: list) -> List[Dict[str, str]]:
+def stream_chat_response(
+    message: str,
+    user_features: dict,
+    recent_transactions: list,
+    persona: Optional[dict] = None,
+    transaction_window_days: int = 30,
+    user_accounts: Optional[list] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream a chat response from OpenAI as it is generated.
+    
+    Tokens are yielded as soon as they arrive. Because a streamed answer
+    cannot be retried, guardrails run once on the assembled text and the
+    final event carries the validated response that should replace the
+    streamed draft.
+    
+    Args:
+        message: User's message/question
+        user_features: User's computed features from get_user_features()
+        recent_transactions: List of recent transactions
+        persona: User's persona assignment (optional)
+        transaction_window_days: Number of days in transaction window
+        user_accounts: List of user account dictionaries (optional)
+        
+    Yields:
+        {"type": "delta", "content": str} for each generated chunk, then
+        {"type": "done", "response": str, "citations": list,
+        "guardrails_passed": bool} once generation completes
+        
+    Raises:
+        ValueError: If OpenAI API key is not configured
+    """
+    client = get_openai_client()
+    if not client:
+        raise ValueError("OPENAI_API_KEY environment variable not set")
+    
+    messages, sanitized_context = _build_chat_messages(
+        message,
+        user_features,
+        recent_transactions,
+        persona,
+        transaction_window_days,
+        user_accounts
+    )
+    guardrails = get_guardrails()
+    
+    stream = client.chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=500,
+        stream=True
+    )
+    
+    parts = []
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        content = chunk.choices[0].delta.content
+        if content:
+            parts.append(content)
+            yield {"type": "delta", "content": content}
+    
+    response_text = "".join(parts).strip()
+    
+    # Validate the assembled text; filter prohibited phrases as fallback
+    is_valid, validated_text, errors = guardrails.validate(response_text)
+    if not is_valid:
+        response_text = _remove_phrases(response_text, guardrails.check_prohibited_phrases(response_text))
+    response_text = validated_text if validated_text else response_text
+    
+    result = _finalize_response(response_text, sanitized_context)
+    yield {"type": "done", "guardrails_passed": is_valid, **result}
+
+
+@lru_cache(maxsize=128)
+def _phrase_pattern(phrases: frozenset) -> "re.Pattern":
+    """Compile an alternation of phrases, longest first so overlaps match greedily."""
+    ordered = sorted(phrases, key=lambda phrase: (-len(phrase), phrase))
+    return re.compile("|".join(re.escape(phrase) for phrase in ordered))
+
+
+def _remove_phrases(text: str, phrases: List[str]) -> str:
+    """Remove every occurrence of the given phrases in a single pass.
+    
+    Args:
+        text: Text to filter
+        phrases: Phrases to remove
+        
+    Returns:
+        Text with the phrases removed
+    """
+    if not phrases:
+        return text
+    return _phrase_pattern(frozenset(phrases)).sub("", text)
+
+
+def _finalize_response(response_text: str, sanitized_context: Dict[str, Any]) -> Dict[str, Any]:
+    """Append the disclaimer if missing and attach citations.
+    
+    Citations are matched against the sanitized context the response was
+    generated from (e.g. account masks trimmed to their last four digits).
+    
+    Args:
+        response_text: Validated response text
+        sanitized_context: Sanitized context returned by _build_chat_messages
+        
+    Returns:
+        Dictionary with 'response' and 'citations' keys
+    """
+    # Ensure disclaimer is present
+    if not _DISCLAIMER_RE.search(response_text):
+        response_text += f"\n\n{DISCLAIMER}"
+    
+    # Extract citations (simple pattern matching for now)
+    citations = extract_citations(
+        response_text,
+        sanitized_context['user_features'],
+        sanitized_context['recent_transactions']
+    )
+    
+    # Citations leave the service as plain dicts: they are serialized to the
+    # API response, chat_logs and Firestore
+    return {
+        "response": response_text,
+        "citations": [citation._asdict() for citation in citations]
+    }
+
+
+def extract_citations(response_text: str, user_features: dict, recent_transactions: list) -> List[Citation]:
     """Extract data citations from response text.
     
+    Each candidate data point is kept if any of its string forms occurs in
+    the response; there are only a few per user, so plain substring checks
+    are the fastest test.
+    
     Args:
         response_text: Generated response text
         user_features: User's computed features
         recent_transactions: List of recent transactions
         
     Returns:
-        List of citation dictionaries with 'data_point' and 'value' keys
+        List of citations
     """
-    citations = []
-    
-    # Extract credit utilization citations
-    if user_features.get('credit_utilization'):
-        cu = user_features['credit_utilization']
-        for acc in cu.get('accounts', []):
-            account_mask = acc.get('account_mask', '')
-            utilization = acc.get('utilization', 0)
+    # (needles, citation) pairs in output order; a citation is kept if any needle occurs
+    candidates = []
+    summary = FeatureSummary.from_features(user_features)
+    
+    # Credit utilization citations
+    if summary.credit_accounts:
+        accounts = summary.credit_accounts
+        for account_mask, utilization in zip(accounts.masks, accounts.utilizations):
             if account_mask and utilization > 0:
                 utilization_pct = round(utilization * 100, 1)
-                if account_mask in response_text or str(utilization_pct) in response_text:
-                    citations.append({
-                        "data_point": f"Account ending in {account_mask[-4:]}" if len(account_mask) >= 4 else account_mask,
-                        "value": f"{utilization_pct}% utilization"
-                    })
-    
-    # Extract subscription citations
-    if user_features.get('subscriptions'):
-        subs = user_features['subscriptions']
-        monthly_total = subs.get('monthly_recurring', 0)
-        if monthly_total > 0 and str(monthly_total) in response_text:
-            citations.append({
-                "data_point": "Recurring subscriptions",
-                "value": f"${monthly_total:.2f}/month"
-            })
-    
-    # Extract savings rate citations
-    if user_features.get('savings_behavior'):
-        sb = user_features['savings_behavior']
-        avg_income = sb.get('avg_monthly_income', 0)
-        avg_expenses = sb.get('avg_monthly_expenses', 0)
-        if avg_income > 0:
-            savings_rate = ((avg_income - avg_expenses) / avg_income) * 100
-            if str(round(savings_rate, 1)) in response_text:
-                citations.append({
-                    "data_point": "Savings rate",
-                    "value": f"{savings_rate:.1f}%"
-                })
-    
-    return citations
-
+                candidates.append(((account_mask, str(utilization_pct)), Citation(
+                    data_point=f"Account ending in {account_mask[-4:]}" if len(account_mask) >= 4 else account_mask,
+                    value=f"{utilization_pct}% utilization"
+                )))
+    
+    # Subscription citations
+    if summary.subscriptions:
+        monthly_total = summary.subscriptions.monthly_recurring
+        if monthly_total > 0:
+            candidates.append(((str(monthly_total),), Citation(
+                data_point="Recurring subscriptions",
+                value=f"${monthly_total:.2f}/month"
+            )))
+    
+    # Savings rate citations
+    if summary.savings:
+        savings_rate = summary.savings.savings_rate
+        if savings_rate is not None:
+            candidates.append(((str(round(savings_rate, 1)),), Citation(
+                data_point="Savings rate",
+                value=f"{savings_rate:.1f}%"
+            )))
+    
+    if not candidates:
+        return []
+    
+    return [
+        citation for needles, citation in candidates
+        if any(needle in response_text for needle in needles)
+    ]
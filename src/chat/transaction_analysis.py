@@ -3,103 +3,372 @@
 Provides specialized analysis functions for extracting insights from
 transaction data including temporal patterns, category intelligence,
 merchant analysis, payment channels, and account activity.
+
+analyze_transactions computes every analysis in a single pass over the
+transactions; the individual functions are kept for callers that need only
+one of them.
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, List, Any, Optional
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Any, Optional
 from collections import defaultdict
-import random
+from functools import lru_cache
+import heapq
+import re
+import sys
 
 from src.utils.category_utils import get_primary_category
 
 
-def calculate_weekday_spending(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze spending patterns by weekday vs weekend.
+@lru_cache(maxsize=512)
+def _primary_category_of_str(category: str) -> str:
+    """Memoized get_primary_category for string categories.
+    
+    The result is interned so every transaction in a category yields the
+    same key object, and dict updates compare keys by identity.
+    """
+    return sys.intern(get_primary_category(category))
+
+
+def _primary_category(category: Any) -> str:
+    """Get the primary category, memoizing the common string case.
+    
+    A request usually carries only a handful of distinct category strings,
+    and parsing each one (including the JSON attempt) is the costly part.
+    Lists are unhashable and are resolved directly.
     
     Args:
-        transactions: List of transaction dictionaries
+        category: Category as string, list, or None
         
     Returns:
-        Dictionary with weekday/weekend spending analysis
+        Primary category string
     """
-    weekday_amounts = []
-    weekend_amounts = []
-    day_totals = defaultdict(float)
+    if type(category) is str:
+        return _primary_category_of_str(category)
+    return get_primary_category(category)
+
+
+# English day names indexed by date.weekday(), as strftime('%A') gives them
+_DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+
+# The forms strptime('%Y-%m-%d') accepts (its own field patterns), so dates
+# that miss the slicing fast path are matched without raising
+_YMD_PATTERN = re.compile(r'(\d\d\d\d)-(1[0-2]|0[1-9]|[1-9])-(3[01]|[12]\d|0[1-9]|[1-9]| [1-9])\Z')
+
+
+def _parse_ymd(date_str: str) -> Optional[date]:
+    """Parse a YYYY-MM-DD string, slicing the common zero-padded form.
     
-    for txn in transactions:
-        if txn.get('amount', 0) >= 0:
-            continue  # Skip income/deposits
-            
-        amount = abs(txn.get('amount', 0))
-        date_str = txn.get('date')
+    Zero-padded dates are built directly from their integer fields; other
+    shapes are matched against the forms strptime accepts, so malformed
+    strings are rejected without raising and catching an exception.
+    
+    Args:
+        date_str: Date string
         
-        if not date_str:
-            continue
-            
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            weekday = date_obj.weekday()  # 0=Monday, 6=Sunday
-            day_name = date_obj.strftime('%A')
-            
-            day_totals[day_name] += amount
-            
-            if weekday >= 5:  # Saturday or Sunday
-                weekend_amounts.append(amount)
-            else:
-                weekday_amounts.append(amount)
-        except (ValueError, TypeError):
-            continue
+    Returns:
+        Parsed date, or None if date_str is not a valid date
+    """
+    if not isinstance(date_str, str):
+        return None
+    if (
+        len(date_str) == 10 and date_str[4] == '-' and date_str[7] == '-'
+        and date_str.isascii() and date_str[:4].isdigit() and date_str[5:7].isdigit() and date_str[8:].isdigit()
+    ):
+        year, month, day = int(date_str[:4]), int(date_str[5:7]), int(date_str[8:])
+    else:
+        match = _YMD_PATTERN.match(date_str)
+        if match is None:
+            return None
+        year, month, day = int(match[1]), int(match[2]), int(match[3])
+    try:
+        return date(year, month, day)
+    except ValueError:  # Out-of-range field, e.g. February 30
+        return None
+
+
+class _SpendTotals:
+    """Running spend amount and transaction count for one group."""
     
-    weekday_avg = sum(weekday_amounts) / len(weekday_amounts) if weekday_amounts else 0
-    weekend_avg = sum(weekend_amounts) / len(weekend_amounts) if weekend_amounts else 0
+    __slots__ = ('amount', 'count')
     
-    # Find highest spending day
-    highest_day = max(day_totals.items(), key=lambda x: x[1]) if day_totals else ("Unknown", 0)
+    def __init__(self):
+        self.amount = 0
+        self.count = 0
+
+
+class _AccountTotals:
+    """Running activity for one account."""
+    
+    __slots__ = ('mask', 'type', 'subtype', 'transaction_count', 'total_spent', 'total_income')
+    
+    def __init__(self, account: Dict[str, Any]):
+        self.mask = account.get('mask', 'Unknown')
+        self.type = account.get('type', 'unknown')
+        self.subtype = account.get('subtype', 'unknown')
+        self.transaction_count = 0
+        self.total_spent = 0
+        self.total_income = 0
+
+
+@dataclass(frozen=True, slots=True)
+class AnalysisContext:
+    """Clock-derived values shared by the temporal analyses.
+    
+    Attributes:
+        now: Time the analysis runs at
+        month_start: First day of the current month
+        velocity_cutoff: Dates before this fall in the first half of the
+            velocity window (dates count as midnight)
+        days_in_month: Number of days in the current month
+    """
+    now: datetime
+    month_start: date
+    velocity_cutoff: date
+    days_in_month: int
+    
+    @classmethod
+    def create(cls, window_days: int = 30, now: Optional[datetime] = None) -> "AnalysisContext":
+        """Compute the context for a velocity window.
+        
+        Args:
+            window_days: Number of days in the transaction window
+            now: Time to analyze at (defaults to datetime.now())
+            
+        Returns:
+            AnalysisContext instance
+        """
+        if now is None:
+            now = datetime.now()
+        midpoint = now - timedelta(days=window_days // 2)
+        velocity_cutoff = midpoint.date()
+        if midpoint.time() != time():
+            velocity_cutoff += timedelta(days=1)
+        return cls(
+            now=now,
+            month_start=now.date().replace(day=1),
+            velocity_cutoff=velocity_cutoff,
+            days_in_month=calendar.monthrange(now.year, now.month)[1]
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class TransactionAnalysis:
+    """Results of every transaction analysis, computed in one pass.
     
-    return {
-        'weekday_avg': round(weekday_avg, 2),
-        'weekend_avg': round(weekend_avg, 2),
-        'weekday_total': round(sum(weekday_amounts), 2),
-        'weekend_total': round(sum(weekend_amounts), 2),
-        'weekday_count': len(weekday_amounts),
-        'weekend_count': len(weekend_amounts),
-        'highest_day': highest_day[0],
-        'highest_day_total': round(highest_day[1], 2)
-    }
+    Each field has the same shape as the return value of the matching
+    standalone function (e.g. weekday_spending is what
+    calculate_weekday_spending returns).
+    """
+    weekday_spending: Dict[str, Any]
+    monthly_progression: Dict[str, Any]
+    spending_velocity: Dict[str, Any]
+    category_breakdown: List[Dict[str, Any]]
+    frequent_merchants: List[tuple]
+    payment_channels: Dict[str, Any]
+    account_activity: Dict[str, Any]
+    pending: Dict[str, Any]
 
 
-def calculate_monthly_progression(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
-    """Analyze month-to-date spending with projections.
+def build_account_lookup(user_accounts: Optional[List[Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Index accounts by account_id.
+    
+    Callers that analyze the same accounts repeatedly can build this once
+    and pass it to analyze_transactions as account_lookup.
     
     Args:
-        transactions: List of transaction dictionaries
+        user_accounts: List of account dictionaries (optional)
         
     Returns:
-        Dictionary with MTD spending and projections
+        Dictionary mapping account_id to account dictionary
     """
-    now = datetime.now()
-    current_month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    days_in_month = (now.replace(month=now.month % 12 + 1, day=1) - timedelta(days=1)).day if now.month < 12 else 31
-    days_elapsed = now.day
+    return {acc['account_id']: acc for acc in user_accounts or []}
+
+
+def analyze_transactions(
+    transactions: Iterable[Dict[str, Any]],
+    user_accounts: Optional[List[Dict[str, Any]]] = None,
+    window_days: int = 30,
+    context: Optional[AnalysisContext] = None,
+    account_lookup: Optional[Dict[str, Dict[str, Any]]] = None
+) -> TransactionAnalysis:
+    """Run all transaction analyses in a single pass.
+    
+    Each transaction's amount is read once and its date parsed at most once,
+    and every accumulator is updated in the same loop. The transactions are
+    iterated once, so a generator (e.g. dicts built from db.stream_query
+    rows) works without materializing a list.
     
+    Args:
+        transactions: Iterable of transaction dictionaries
+        user_accounts: List of account dictionaries (optional)
+        window_days: Number of days in the transaction window (for velocity)
+        context: Precomputed clock values (optional; built from window_days
+            and the current time when omitted)
+        account_lookup: Prebuilt build_account_lookup() result (optional;
+            takes the place of user_accounts)
+        
+    Returns:
+        TransactionAnalysis with every analysis result
+    """
+    if context is None:
+        context = AnalysisContext.create(window_days)
+    month_start = context.month_start
+    velocity_cutoff = context.velocity_cutoff
+    if account_lookup is None:
+        account_lookup = build_account_lookup(user_accounts)
+    primary_category = _primary_category  # Local aliases for the hot loop
+    parse_ymd = _parse_ymd
+    
+    # Temporal accumulators
+    weekday_total = weekend_total = 0
+    weekday_count = weekend_count = 0
+    day_totals = defaultdict(float)
     mtd_spending = 0
     mtd_count = 0
+    first_half_spending = 0
+    second_half_spending = 0
+    
+    # Grouped accumulators
+    category_totals = defaultdict(_SpendTotals)
+    total_spending = 0
+    merchant_data = {}
+    channel_totals = defaultdict(_SpendTotals)
+    account_totals = {}
+    pending_count = 0
+    pending_charges = 0
+    pending_deposits = 0
     
     for txn in transactions:
-        if txn.get('amount', 0) >= 0:
-            continue  # Skip income/deposits
-            
-        date_str = txn.get('date')
+        raw_amount = txn.get('amount', 0)
+        
+        # Account activity and pending totals cover income as well as spending
+        account_id = txn.get('account_id')
+        if account_id:
+            activity = account_totals.get(account_id)
+            if activity is None:
+                activity = account_totals[account_id] = _AccountTotals(account_lookup.get(account_id, {}))
+            activity.transaction_count += 1
+            if raw_amount < 0:
+                activity.total_spent += abs(raw_amount)
+            else:
+                activity.total_income += raw_amount
+        
+        if txn.get('pending'):
+            pending_count += 1
+            if raw_amount < 0:
+                pending_charges += abs(raw_amount)
+            else:
+                pending_deposits += raw_amount
+        
+        if raw_amount >= 0:
+            continue  # Remaining analyses skip income/deposits
+        amount = abs(raw_amount)
+        
+        # Category breakdown
+        total_spending += amount
+        totals = category_totals[primary_category(txn.get('category', 'Uncategorized'))]
+        totals.amount += amount
+        totals.count += 1
+        
+        # Payment channels
+        totals = channel_totals[txn.get('payment_channel', 'other')]
+        totals.count += 1
+        totals.amount += amount
+        
+        # Merchant patterns
+        date_str = txn.get('date', '')
+        merchant = txn.get('merchant_name', 'Unknown')
+        if merchant != 'Unknown' and merchant:
+            data = merchant_data.get(merchant)
+            if data is None:
+                data = merchant_data[merchant] = {
+                    'visit_count': 0,
+                    'total_spent': 0,
+                    'last_visit': date_str,
+                    'first_visit': date_str
+                }
+            data['visit_count'] += 1
+            data['total_spent'] += amount
+            if date_str:  # ISO dates compare in date order as strings
+                if date_str > data['last_visit']:
+                    data['last_visit'] = date_str
+                if date_str < data['first_visit']:
+                    data['first_visit'] = date_str
+        
+        # Temporal analyses need a parseable date
         if not date_str:
             continue
-            
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            if date_obj >= current_month_start:
-                mtd_spending += abs(txn.get('amount', 0))
-                mtd_count += 1
-        except (ValueError, TypeError):
+        date_obj = parse_ymd(date_str)
+        if date_obj is None:
             continue
+        
+        weekday = date_obj.weekday()  # 0=Monday, 6=Sunday
+        day_totals[_DAY_NAMES[weekday]] += amount
+        if weekday >= 5:  # Saturday or Sunday
+            weekend_total += amount
+            weekend_count += 1
+        else:
+            weekday_total += amount
+            weekday_count += 1
+        
+        if date_obj >= month_start:
+            mtd_spending += amount
+            mtd_count += 1
+        
+        if date_obj < velocity_cutoff:
+            first_half_spending += amount
+        else:
+            second_half_spending += amount
+    
+    return TransactionAnalysis(
+        weekday_spending=_weekday_result(
+            weekday_total, weekday_count, weekend_total, weekend_count, day_totals
+        ),
+        monthly_progression=_monthly_result(context, mtd_spending, mtd_count),
+        spending_velocity=_velocity_result(first_half_spending, second_half_spending),
+        category_breakdown=_category_result(category_totals, total_spending),
+        frequent_merchants=_merchant_result(merchant_data),
+        payment_channels=_channel_result(channel_totals),
+        account_activity=_account_result(account_totals),
+        pending=_pending_result(pending_count, pending_charges, pending_deposits)
+    )
+
+
+def _weekday_result(
+    weekday_total: float,
+    weekday_count: int,
+    weekend_total: float,
+    weekend_count: int,
+    day_totals: Dict[str, float]
+) -> Dict[str, Any]:
+    """Build the weekday/weekend spending result from accumulated totals."""
+    weekday_avg = weekday_total / weekday_count if weekday_count else 0
+    weekend_avg = weekend_total / weekend_count if weekend_count else 0
+    
+    # Find highest spending day
+    highest_day = max(day_totals.items(), key=lambda x: x[1]) if day_totals else ("Unknown", 0)
+    
+    return {
+        'weekday_avg': round(weekday_avg, 2),
+        'weekend_avg': round(weekend_avg, 2),
+        'weekday_total': round(weekday_total, 2),
+        'weekend_total': round(weekend_total, 2),
+        'weekday_count': weekday_count,
+        'weekend_count': weekend_count,
+        'highest_day': highest_day[0],
+        'highest_day_total': round(highest_day[1], 2)
+    }
+
+
+def _monthly_result(context: AnalysisContext, mtd_spending: float, mtd_count: int) -> Dict[str, Any]:
+    """Build the month-to-date result with projections."""
+    now = context.now
+    days_in_month = context.days_in_month
+    days_elapsed = now.day
     
     daily_avg = mtd_spending / days_elapsed if days_elapsed > 0 else 0
     projected_monthly = daily_avg * days_in_month
@@ -115,41 +384,8 @@ def calculate_monthly_progression(transactions: List[Dict[str, Any]]) -> Dict[st
     }
 
 
-def calculate_spending_velocity(transactions: List[Dict[str, Any]], window_days: int = 30) -> Dict[str, Any]:
-    """Calculate spending trend (increasing/decreasing).
-    
-    Args:
-        transactions: List of transaction dictionaries
-        window_days: Number of days to analyze
-        
-    Returns:
-        Dictionary with spending velocity analysis
-    """
-    now = datetime.now()
-    midpoint = now - timedelta(days=window_days // 2)
-    
-    first_half_spending = 0
-    second_half_spending = 0
-    
-    for txn in transactions:
-        if txn.get('amount', 0) >= 0:
-            continue
-            
-        date_str = txn.get('date')
-        if not date_str:
-            continue
-            
-        try:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            amount = abs(txn.get('amount', 0))
-            
-            if date_obj < midpoint:
-                first_half_spending += amount
-            else:
-                second_half_spending += amount
-        except (ValueError, TypeError):
-            continue
-    
+def _velocity_result(first_half_spending: float, second_half_spending: float) -> Dict[str, Any]:
+    """Build the spending trend result from the two half-window totals."""
     if first_half_spending > 0:
         change_pct = ((second_half_spending - first_half_spending) / first_half_spending) * 100
     else:
@@ -169,40 +405,23 @@ def calculate_spending_velocity(transactions: List[Dict[str, Any]], window_days:
     }
 
 
-def build_detailed_category_analysis(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """Build comprehensive category spending analysis.
-    
-    Args:
-        transactions: List of transaction dictionaries
-        
-    Returns:
-        List of category analysis dictionaries, sorted by amount
-    """
-    category_data = defaultdict(lambda: {'amount': 0, 'count': 0})
-    total_spending = 0
-    
-    for txn in transactions:
-        if txn.get('amount', 0) >= 0:
-            continue  # Skip income/deposits
-            
-        amount = abs(txn.get('amount', 0))
-        total_spending += amount
-        
-        category = get_primary_category(txn.get('category', 'Uncategorized'))
-        category_data[category]['amount'] += amount
-        category_data[category]['count'] += 1
-    
-    # Build sorted list
+def _category_result(
+    category_totals: Dict[str, _SpendTotals],
+    total_spending: float
+) -> List[Dict[str, Any]]:
+    """Build the category breakdown, sorted by amount descending."""
     category_breakdown = []
-    for category, data in category_data.items():
-        percentage = (data['amount'] / total_spending * 100) if total_spending > 0 else 0
-        avg_transaction = data['amount'] / data['count'] if data['count'] > 0 else 0
+    for category, totals in category_totals.items():
+        amount = totals.amount
+        count = totals.count
+        percentage = (amount / total_spending * 100) if total_spending > 0 else 0
+        avg_transaction = amount / count if count > 0 else 0
         
         category_breakdown.append({
             'category': category,
-            'amount': round(data['amount'], 2),
+            'amount': round(amount, 2),
             'percentage': round(percentage, 1),
-            'transaction_count': data['count'],
+            'transaction_count': count,
             'avg_transaction': round(avg_transaction, 2)
         })
     
@@ -212,52 +431,115 @@ def build_detailed_category_analysis(transactions: List[Dict[str, Any]]) -> List
     return category_breakdown
 
 
-def analyze_merchant_patterns(transactions: List[Dict[str, Any]]) -> List[tuple]:
-    """Analyze merchant visit patterns.
+def _merchant_result(merchant_data: Dict[str, Dict[str, Any]]) -> List[tuple]:
+    """Select the top 5 merchants with 3+ visits, by visit count.
+    
+    heapq.nlargest keeps ties in first-seen order, like a stable sort.
+    """
+    return heapq.nlargest(
+        5,
+        ((merchant, data) for merchant, data in merchant_data.items() if data['visit_count'] >= 3),
+        key=lambda x: x[1]['visit_count']
+    )
+
+
+def _channel_result(channel_totals: Dict[str, _SpendTotals]) -> Dict[str, Any]:
+    """Build the payment channel result with rounded amounts."""
+    result = {}
+    for channel, totals in channel_totals.items():
+        result[channel] = {
+            'count': totals.count,
+            'amount': round(totals.amount, 2)
+        }
+    
+    return result
+
+
+def _account_result(account_totals: Dict[str, _AccountTotals]) -> Dict[str, Any]:
+    """Build the per-account activity result with rounded amounts."""
+    result = {}
+    for account_id, activity in account_totals.items():
+        result[account_id] = {
+            'mask': activity.mask,
+            'type': activity.type,
+            'subtype': activity.subtype,
+            'transaction_count': activity.transaction_count,
+            'total_spent': round(activity.total_spent, 2),
+            'total_income': round(activity.total_income, 2)
+        }
+    
+    return result
+
+
+def _pending_result(count: int, pending_charges: float, pending_deposits: float) -> Dict[str, Any]:
+    """Build the pending transaction result."""
+    return {
+        'count': count,
+        'pending_charges': round(pending_charges, 2),
+        'pending_deposits': round(pending_deposits, 2),
+        'net_pending': round(pending_deposits - pending_charges, 2)
+    }
+
+
+def calculate_weekday_spending(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Analyze spending patterns by weekday vs weekend.
     
     Args:
         transactions: List of transaction dictionaries
         
     Returns:
-        List of (merchant_name, data_dict) tuples for frequent merchants
+        Dictionary with weekday/weekend spending analysis
     """
-    merchant_data = {}
+    return analyze_transactions(transactions).weekday_spending
+
+
+def calculate_monthly_progression(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Analyze month-to-date spending with projections.
     
-    for txn in transactions:
-        if txn.get('amount', 0) >= 0:
-            continue  # Skip income/deposits
-            
-        merchant = txn.get('merchant_name', 'Unknown')
-        if merchant == 'Unknown' or not merchant:
-            continue
-            
-        amount = abs(txn.get('amount', 0))
-        date = txn.get('date', '')
+    Args:
+        transactions: List of transaction dictionaries
         
-        if merchant not in merchant_data:
-            merchant_data[merchant] = {
-                'visit_count': 0,
-                'total_spent': 0,
-                'last_visit': date,
-                'first_visit': date,
-                'transactions': []
-            }
+    Returns:
+        Dictionary with MTD spending and projections
+    """
+    return analyze_transactions(transactions).monthly_progression
+
+
+def calculate_spending_velocity(transactions: List[Dict[str, Any]], window_days: int = 30) -> Dict[str, Any]:
+    """Calculate spending trend (increasing/decreasing).
+    
+    Args:
+        transactions: List of transaction dictionaries
+        window_days: Number of days to analyze
         
-        merchant_data[merchant]['visit_count'] += 1
-        merchant_data[merchant]['total_spent'] += amount
-        merchant_data[merchant]['last_visit'] = max(merchant_data[merchant]['last_visit'], date) if date else merchant_data[merchant]['last_visit']
-        merchant_data[merchant]['first_visit'] = min(merchant_data[merchant]['first_visit'], date) if date else merchant_data[merchant]['first_visit']
-        merchant_data[merchant]['transactions'].append(amount)
+    Returns:
+        Dictionary with spending velocity analysis
+    """
+    return analyze_transactions(transactions, window_days=window_days).spending_velocity
+
+
+def build_detailed_category_analysis(transactions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Build comprehensive category spending analysis.
     
-    # Filter to frequent merchants (3+ visits) and sort by visit count
-    frequent_merchants = [
-        (merchant, data) 
-        for merchant, data in merchant_data.items() 
-        if data['visit_count'] >= 3
-    ]
-    frequent_merchants.sort(key=lambda x: x[1]['visit_count'], reverse=True)
+    Args:
+        transactions: List of transaction dictionaries
+        
+    Returns:
+        List of category analysis dictionaries, sorted by amount
+    """
+    return analyze_transactions(transactions).category_breakdown
+
+
+def analyze_merchant_patterns(transactions: List[Dict[str, Any]]) -> List[tuple]:
+    """Analyze merchant visit patterns.
     
-    return frequent_merchants[:5]  # Top 5 frequent merchants
+    Args:
+        transactions: List of transaction dictionaries
+        
+    Returns:
+        List of (merchant_name, data_dict) tuples for frequent merchants
+    """
+    return analyze_transactions(transactions).frequent_merchants
 
 
 def analyze_payment_channels(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -269,73 +551,25 @@ def analyze_payment_channels(transactions: List[Dict[str, Any]]) -> Dict[str, An
     Returns:
         Dictionary with payment channel analysis
     """
-    channel_data = defaultdict(lambda: {'count': 0, 'amount': 0})
-    
-    for txn in transactions:
-        if txn.get('amount', 0) >= 0:
-            continue  # Skip income/deposits
-            
-        channel = txn.get('payment_channel', 'other')
-        amount = abs(txn.get('amount', 0))
-        
-        channel_data[channel]['count'] += 1
-        channel_data[channel]['amount'] += amount
-    
-    result = {}
-    for channel, data in channel_data.items():
-        result[channel] = {
-            'count': data['count'],
-            'amount': round(data['amount'], 2)
-        }
-    
-    return result
+    return analyze_transactions(transactions).payment_channels
 
 
-def analyze_by_account(transactions: List[Dict[str, Any]], user_accounts: List[Dict[str, Any]]) -> Dict[str, Any]:
+def analyze_by_account(
+    transactions: List[Dict[str, Any]],
+    user_accounts: List[Dict[str, Any]],
+    account_lookup: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
     """Group transactions by account for account-specific insights.
     
     Args:
         transactions: List of transaction dictionaries
         user_accounts: List of account dictionaries
+        account_lookup: Prebuilt build_account_lookup() result (optional)
         
     Returns:
         Dictionary mapping account_id to activity data
     """
-    # Build account lookup
-    account_lookup = {acc['account_id']: acc for acc in user_accounts}
-    
-    account_activity = {}
-    
-    for txn in transactions:
-        account_id = txn.get('account_id')
-        if not account_id:
-            continue
-            
-        if account_id not in account_activity:
-            account = account_lookup.get(account_id, {})
-            account_activity[account_id] = {
-                'mask': account.get('mask', 'Unknown'),
-                'type': account.get('type', 'unknown'),
-                'subtype': account.get('subtype', 'unknown'),
-                'transaction_count': 0,
-                'total_spent': 0,
-                'total_income': 0
-            }
-        
-        amount = txn.get('amount', 0)
-        account_activity[account_id]['transaction_count'] += 1
-        
-        if amount < 0:
-            account_activity[account_id]['total_spent'] += abs(amount)
-        else:
-            account_activity[account_id]['total_income'] += amount
-    
-    # Round amounts
-    for account_id in account_activity:
-        account_activity[account_id]['total_spent'] = round(account_activity[account_id]['total_spent'], 2)
-        account_activity[account_id]['total_income'] = round(account_activity[account_id]['total_income'], 2)
-    
-    return account_activity
+    return analyze_transactions(transactions, user_accounts, account_lookup=account_lookup).account_activity
 
 
 def analyze_pending_transactions(transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
@@ -347,28 +581,4 @@ def analyze_pending_transactions(transactions: List[Dict[str, Any]]) -> Dict[str
     Returns:
         Dictionary with pending transaction analysis
     """
-    pending_transactions = [t for t in transactions if t.get('pending')]
-    
-    pending_charges = 0
-    pending_deposits = 0
-    
-    for txn in pending_transactions:
-        amount = txn.get('amount', 0)
-        if amount < 0:
-            pending_charges += abs(amount)
-        else:
-            pending_deposits += amount
-    
-    return {
-        'count': len(pending_transactions),
-        'pending_charges': round(pending_charges, 2),
-        'pending_deposits': round(pending_deposits, 2),
-        'net_pending': round(pending_deposits - pending_charges, 2)
-    }
-
-
-
-
-
-
-
+    return analyze_transactions(transactions).pending
@@ -4,26 +4,71 @@ This module provides database connection management and schema initialization
 for the SQLite database used by SpendSense.
 """
 
+import atexit
 import sqlite3
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Iterator, Optional, Dict, Tuple
 from datetime import datetime
 
 
 # Default database path
 DEFAULT_DB_PATH = Path(__file__).parent.parent.parent / "data" / "spendsense.db"
 
+# Per-connection PRAGMAs tuned for a web workload: WAL lets analytics reads
+# proceed while chat logs / rate limits are written, and NORMAL sync is safe
+# under WAL while avoiding an fsync on every commit.
+CONNECTION_PRAGMAS = (
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA mmap_size=268435456",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA cache_size=-65536",
+)
 
-def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
-    """Get a database connection.
+# Version recorded in the _meta table once run_migrations has completed.
+# Bump it when run_migrations gains a new step.
+SCHEMA_VERSION = 2
+
+# sqlite3 caches prepared statements per connection, keyed by SQL text.
+# Sized above the default 128 because IN (?, ?, ...) lists and the
+# f-string date windows produce many distinct query strings.
+STATEMENT_CACHE_SIZE = 256
+
+# get_db_connection keeps one open connection per thread and database path
+# instead of connecting on every call. Connections are registered so
+# close_all() can close them at shutdown; the generation is bumped on
+# close_all() so threads reopen instead of reusing a closed connection.
+_thread_local = threading.local()
+_open_connections = set()
+_open_connections_lock = threading.Lock()
+_generation = 0
+
+
+class _PooledConnection:
+    """A thread's reusable connection and its nesting depth."""
+    
+    __slots__ = ("conn", "file_id", "generation", "depth")
+    
+    def __init__(self, conn: sqlite3.Connection, file_id: Optional[Tuple[int, int]], generation: int):
+        self.conn = conn
+        self.file_id = file_id
+        self.generation = generation
+        self.depth = 0
+
+
+def _resolve_db_path(db_path: Optional[str] = None) -> str:
+    """Resolve the database path, ensuring its directory exists.
     
     Args:
         db_path: Path to SQLite database file. If None, uses default path.
         
     Returns:
-        sqlite3.Connection: Database connection object.
+        Path to connect to (":memory:" if the directory cannot be created)
     """
     if db_path is None:
         db_path = str(DEFAULT_DB_PATH)
@@ -37,15 +82,143 @@ def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
         if not os.path.exists(db_path):
             db_path = ":memory:"
     
-    conn = sqlite3.connect(db_path)
+    return db_path
+
+
+def _open_connection(db_path: str, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Open a connection with row access by name and the standard PRAGMAs."""
+    conn = sqlite3.connect(
+        db_path,
+        check_same_thread=check_same_thread,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
     conn.row_factory = sqlite3.Row  # Enable column access by name
+    _apply_pragmas(conn)
     return conn
 
 
+def _file_id(db_path: str) -> Optional[Tuple[int, int]]:
+    """Identify the database file so a deleted or replaced file is detected."""
+    if db_path == ":memory:":
+        return None
+    try:
+        stat = os.stat(db_path)
+    except OSError:
+        return None
+    return (stat.st_dev, stat.st_ino)
+
+
+def get_connection(db_path: Optional[str] = None) -> sqlite3.Connection:
+    """Get a new database connection.
+    
+    The caller owns the connection and must close it. Use get_db_connection()
+    to reuse the calling thread's connection instead.
+    
+    Args:
+        db_path: Path to SQLite database file. If None, uses default path.
+        
+    Returns:
+        sqlite3.Connection: Database connection object.
+    """
+    return _open_connection(_resolve_db_path(db_path))
+
+
+def _acquire_thread_connection(db_path: Optional[str] = None) -> _PooledConnection:
+    """Get the calling thread's connection for db_path, opening it if needed.
+    
+    An idle connection is replaced when its database file was deleted or
+    replaced (e.g. by an ETL reset) or when close_all() has run.
+    
+    Args:
+        db_path: Path to SQLite database file. If None, uses default path.
+        
+    Returns:
+        _PooledConnection for this thread and path
+    """
+    db_path = _resolve_db_path(db_path)
+    pool = getattr(_thread_local, "connections", None)
+    if pool is None:
+        pool = _thread_local.connections = {}
+    
+    pooled = pool.get(db_path)
+    if pooled is not None and pooled.depth == 0:
+        if pooled.generation != _generation or (
+            pooled.file_id is not None and _file_id(db_path) != pooled.file_id
+        ):
+            _discard(pooled)
+            pooled = None
+    
+    if pooled is None:
+        # check_same_thread=False only so close_all() can close it from
+        # another thread; it is otherwise used by this thread alone
+        conn = _open_connection(db_path, check_same_thread=False)
+        pooled = pool[db_path] = _PooledConnection(conn, _file_id(db_path), _generation)
+        with _open_connections_lock:
+            _open_connections.add(conn)
+    
+    return pooled
+
+
+def _discard(pooled: _PooledConnection) -> None:
+    """Close a pooled connection and drop it from the registry."""
+    with _open_connections_lock:
+        _open_connections.discard(pooled.conn)
+    try:
+        pooled.conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def close_all() -> None:
+    """Close every connection opened by get_db_connection (e.g. at shutdown).
+    
+    Runs PRAGMA optimize on each connection before closing it, as SQLite
+    recommends for long-lived connections. Threads open a new connection on their next get_db_connection() call.
+    """
+    global _generation
+    with _open_connections_lock:
+        connections = list(_open_connections)
+        _open_connections.clear()
+        _generation += 1
+    for conn in connections:
+        try:
+            # Refresh query planner statistics the connection found stale
+            conn.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass  # e.g. read-only database
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+
+atexit.register(close_all)
+
+
+def _apply_pragmas(conn: sqlite3.Connection) -> None:
+    """Enable WAL journaling and performance PRAGMAs on a connection.
+    
+    Args:
+        conn: Freshly opened SQLite connection.
+    """
+    try:
+        # journal_mode is persistent in the file; this is a no-op once set.
+        # It fails on read-only filesystems, where the default mode is fine.
+        conn.execute("PRAGMA journal_mode=WAL")
+    except sqlite3.OperationalError:
+        pass
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+
 @contextmanager
 def get_db_connection(db_path: Optional[str] = None):
     """Context manager for database connections.
     
+    Reuses the calling thread's connection for db_path rather than opening
+    one per call. The outermost block commits on success and rolls back on
+    error; nested blocks on the same thread share its transaction.
+    
     Usage:
         with get_db_connection() as conn:
             cursor = conn.execute("SELECT * FROM users")
@@ -57,15 +230,19 @@ def get_db_connection(db_path: Optional[str] = None):
     Yields:
         sqlite3.Connection: Database connection object.
     """
-    conn = get_connection(db_path)
+    pooled = _acquire_thread_connection(db_path)
+    conn = pooled.conn
+    pooled.depth += 1
     try:
         yield conn
-        conn.commit()
+        if pooled.depth == 1:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if pooled.depth == 1:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        pooled.depth -= 1
 
 
 def execute_query(query: str, params: tuple = (), db_path: Optional[str] = None) -> sqlite3.Cursor:
@@ -100,20 +277,65 @@ def fetch_one(query: str, params: tuple = (), db_path: Optional[str] = None) ->
         return cursor.fetchone()
 
 
-def fetch_all(query: str, params: tuple = (), db_path: Optional[str] = None) -> list[sqlite3.Row]:
+def fetch_all(
+    query: str,
+    params: tuple = (),
+    db_path: Optional[str] = None,
+    as_dicts: bool = False
+) -> list:
     """Execute a query and fetch all rows.
     
     Args:
         query: SQL query string.
         params: Parameters for the query.
         db_path: Path to SQLite database file. If None, uses default path.
+        as_dicts: Return plain dicts instead of sqlite3.Row objects. Builds
+            them from the raw tuples, which is cheaper than dict(row).
         
     Returns:
-        list[sqlite3.Row]: List of all row results.
+        list: List of all row results (sqlite3.Row, or dict if as_dicts).
     """
     with get_db_connection(db_path) as conn:
-        cursor = conn.execute(query, params)
-        return cursor.fetchall()
+        if not as_dicts:
+            return conn.execute(query, params).fetchall()
+        cursor = conn.cursor()
+        cursor.row_factory = None  # Plain tuples
+        cursor.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+
+def stream_query(query: str, params: tuple = (), db_path: Optional[str] = None) -> Iterator[sqlite3.Row]:
+    """Execute a query and yield rows one at a time.
+    
+    Unlike fetch_all, rows are read from the cursor as they are consumed, so
+    a large scan never holds every row in memory. The thread's connection
+    stays in use until the generator is exhausted or closed, and while it is
+    in use get_db_connection blocks on the thread do not commit. Consume it
+    on the thread that created it, and close it if you may stop early:
+    
+        with contextlib.closing(stream_query("SELECT ...")) as rows:
+            for row in rows:
+                ...
+    
+    Args:
+        query: SQL query string.
+        params: Parameters for the query.
+        db_path: Path to SQLite database file. If None, uses default path.
+        
+    Yields:
+        sqlite3.Row: Each row result.
+    """
+    pooled = _acquire_thread_connection(db_path)
+    pooled.depth += 1
+    try:
+        cursor = pooled.conn.execute(query, params)
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+    finally:
+        pooled.depth -= 1
 
 
 def init_schema(db_path: Optional[str] = None) -> None:
@@ -134,11 +356,28 @@ def init_schema(db_path: Optional[str] = None) -> None:
     run_migrations(db_path)
 
 
+def _schema_version(conn: sqlite3.Connection) -> int:
+    """Read the recorded schema version (0 if none has been recorded).
+    
+    Args:
+        conn: Database connection
+        
+    Returns:
+        Schema version number
+    """
+    try:
+        row = conn.execute("SELECT value FROM _meta WHERE key = 'schema_version'").fetchone()
+    except sqlite3.OperationalError:
+        return 0  # _meta table not created yet
+    return int(row[0]) if row else 0
+
+
 def run_migrations(db_path: Optional[str] = None) -> None:
     """Run database migrations to add new columns to existing tables.
     
     This function checks if columns exist before adding them, making it safe
-    to run multiple times (idempotent).
+    to run multiple times (idempotent). Once they have run, SCHEMA_VERSION is
+    recorded in the _meta table so later startups skip the catalog checks.
     
     Args:
         db_path: Path to SQLite database file. If None, uses default path.
@@ -148,6 +387,9 @@ def run_migrations(db_path: Optional[str] = None) -> None:
         return  # No migrations to run
     
     with get_db_connection(db_path) as conn:
+        if _schema_version(conn) >= SCHEMA_VERSION:
+            return  # Already migrated
+        
         cursor = conn.cursor()
         
         # Check if transactions table exists
@@ -176,23 +418,27 @@ def run_migrations(db_path: Optional[str] = None) -> None:
             ("authorized_date", "TEXT"),
         ]
         
-        # Add missing columns
-        added_iso_currency = False
-        for column_name, column_type in new_columns:
-            if column_name not in existing_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE transactions ADD COLUMN {column_name} {column_type}")
-                    print(f"Added column: {column_name}")
-                    if column_name == "iso_currency_code":
-                        added_iso_currency = True
-                except sqlite3.OperationalError as e:
-                    # Column might already exist (race condition) or other error
-                    if "duplicate column" not in str(e).lower():
-                        print(f"Warning: Could not add column {column_name}: {e}")
+        # Add missing columns in one transaction (sqlite3 autocommits DDL
+        # otherwise, paying a journal sync per ALTER); get_db_connection
+        # commits it with the version row below
+        missing_columns = [(name, type_) for name, type_ in new_columns if name not in existing_columns]
+        if not conn.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+        # ADD COLUMN ... DEFAULT 'USD' already gives existing rows 'USD'
+        for column_name, column_type in missing_columns:
+            try:
+                cursor.execute(f"ALTER TABLE transactions ADD COLUMN {column_name} {column_type}")
+                print(f"Added column: {column_name}")
+            except sqlite3.OperationalError as e:
+                # Column might already exist (race condition) or other error
+                if "duplicate column" not in str(e).lower():
+                    print(f"Warning: Could not add column {column_name}: {e}")
         
-        # Set default USD for existing rows if we just added the column
-        if added_iso_currency:
-            cursor.execute("UPDATE transactions SET iso_currency_code = 'USD' WHERE iso_currency_code IS NULL")
+        cursor.execute("CREATE TABLE IF NOT EXISTS _meta (key TEXT PRIMARY KEY, value TEXT)")
+        cursor.execute(
+            "INSERT OR REPLACE INTO _meta (key, value) VALUES ('schema_version', ?)",
+            (str(SCHEMA_VERSION),)
+        )
 
 
 def store_operator_action(
@@ -201,7 +447,8 @@ def store_operator_action(
     action_type: str,
     reason: str,
     recommendation_id: Optional[str] = None,
-    db_path: Optional[str] = None
+    db_path: Optional[str] = None,
+    created_at: Optional[str] = None
 ) -> int:
     """Store an operator action in the audit trail.
     
@@ -212,11 +459,13 @@ def store_operator_action(
         reason: Reason for the action
         recommendation_id: ID of recommendation (for override actions, None for flag)
         db_path: Path to SQLite database file. If None, uses default path.
+        created_at: ISO timestamp to record (optional; pass one timestamp to
+            give several writes from the same request the same time)
         
     Returns:
         ID of the created action record
     """
-    created_at = datetime.now().isoformat()
+    created_at = created_at or datetime.now().isoformat()
     
     query = """
         INSERT INTO operator_actions (operator_id, user_id, action_type, recommendation_id, reason, created_at)
@@ -228,11 +477,51 @@ def store_operator_action(
         return cursor.lastrowid
 
 
+@lru_cache(maxsize=64)
+def _filtered_query(
+    select_from: str,
+    conditions: Tuple[str, ...],
+    order_by: str,
+    has_limit: bool,
+    has_offset: bool
+) -> str:
+    """Build (and memoize) the SQL for a filtered, ordered, paged read.
+    
+    The audit trail getters have only a few filter combinations, so the SQL
+    text for each is built once. The stable text also keeps hitting the
+    connection's prepared-statement cache.
+    
+    Args:
+        select_from: "SELECT ... FROM table" clause
+        conditions: WHERE conditions with ? placeholders, ANDed together
+        order_by: ORDER BY expression
+        has_limit: Whether to add LIMIT ? OFFSET ?
+        has_offset: Whether to add OFFSET ? (when there is no limit)
+        
+    Returns:
+        SQL query string
+    """
+    query = select_from
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {order_by}"
+    if has_limit:
+        query += " LIMIT ? OFFSET ?"
+    elif has_offset:
+        # SQLite requires a LIMIT before OFFSET; -1 means no limit
+        query += " LIMIT -1 OFFSET ?"
+    return query
+
+
 def get_operator_actions(
     user_id: Optional[str] = None,
     action_type: Optional[str] = None,
     limit: Optional[int] = None,
     offset: int = 0,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    after_created_at: Optional[str] = None,
+    after_id: Optional[int] = None,
     db_path: Optional[str] = None
 ) -> list:
     """Get operator actions from the audit trail.
@@ -241,7 +530,13 @@ def get_operator_actions(
         user_id: Filter by user_id (optional)
         action_type: Filter by action_type (optional)
         limit: Maximum number of results (optional)
-        offset: Number of results to skip
+        offset: Number of results to skip (prefer after_created_at/after_id
+            for deep pages; OFFSET still walks every skipped row)
+        start_date: Start date filter (ISO format)
+        end_date: End date filter (ISO format)
+        after_created_at: created_at of the last row of the previous page; with
+            after_id, returns the rows after it (keyset pagination)
+        after_id: id of the last row of the previous page
         db_path: Path to SQLite database file. If None, uses default path.
         
     Returns:
@@ -258,26 +553,31 @@ def get_operator_actions(
         conditions.append("action_type = ?")
         params.append(action_type)
     
-    where_clause = ""
-    if conditions:
-        where_clause = "WHERE " + " AND ".join(conditions)
+    if start_date:
+        conditions.append("created_at >= ?")
+        params.append(start_date)
     
-    query = f"""
-        SELECT id, operator_id, user_id, action_type, recommendation_id, reason, created_at
-        FROM operator_actions
-        {where_clause}
-        ORDER BY created_at DESC
-    """
+    if end_date:
+        conditions.append("created_at <= ?")
+        params.append(end_date)
+    
+    if after_created_at is not None and after_id is not None:
+        # Seek past the previous page on the created_at index; id breaks ties
+        conditions.append("created_at <= ? AND (created_at < ? OR id < ?)")
+        params.extend([after_created_at, after_created_at, after_id])
+    
+    query = _filtered_query(
+        "SELECT id, operator_id, user_id, action_type, recommendation_id, reason, created_at "
+        "FROM operator_actions",
+        tuple(conditions), "created_at DESC, id DESC", bool(limit), bool(offset)
+    )
     
     if limit:
-        query += f" LIMIT ? OFFSET ?"
         params.extend([limit, offset])
     elif offset:
-        query += f" OFFSET ?"
         params.append(offset)
     
-    rows = fetch_all(query, tuple(params), db_path)
-    return [dict(row) for row in rows]
+    return fetch_all(query, tuple(params), db_path, as_dicts=True)
 
 
 def get_all_chat_logs(
@@ -286,6 +586,8 @@ def get_all_chat_logs(
     offset: int = 0,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    after_created_at: Optional[str] = None,
+    after_id: Optional[int] = None,
     db_path: Optional[str] = None
 ) -> list:
     """Get chat logs with optional filtering.
@@ -293,9 +595,13 @@ def get_all_chat_logs(
     Args:
         user_id: Filter by user_id (optional)
         limit: Maximum number of results (optional)
-        offset: Number of results to skip
+        offset: Number of results to skip (prefer after_created_at/after_id
+            for deep pages; OFFSET still walks every skipped row)
         start_date: Start date filter (ISO format)
         end_date: End date filter (ISO format)
+        after_created_at: created_at of the last row of the previous page; with
+            after_id, returns the rows after it (keyset pagination)
+        after_id: id of the last row of the previous page
         db_path: Path to SQLite database file. If None, uses default path.
         
     Returns:
@@ -316,26 +622,23 @@ def get_all_chat_logs(
         conditions.append("created_at <= ?")
         params.append(end_date)
     
-    where_clause = ""
-    if conditions:
-        where_clause = "WHERE " + " AND ".join(conditions)
+    if after_created_at is not None and after_id is not None:
+        # Seek past the previous page on the created_at index; id breaks ties
+        conditions.append("created_at <= ? AND (created_at < ? OR id < ?)")
+        params.extend([after_created_at, after_created_at, after_id])
     
-    query = f"""
-        SELECT id, user_id, message, response, citations, guardrails_passed, created_at
-        FROM chat_logs
-        {where_clause}
-        ORDER BY created_at DESC
-    """
+    query = _filtered_query(
+        "SELECT id, user_id, message, response, citations, guardrails_passed, created_at "
+        "FROM chat_logs",
+        tuple(conditions), "created_at DESC, id DESC", bool(limit), bool(offset)
+    )
     
     if limit:
-        query += f" LIMIT ? OFFSET ?"
         params.extend([limit, offset])
     elif offset:
-        query += f" OFFSET ?"
         params.append(offset)
     
-    rows = fetch_all(query, tuple(params), db_path)
-    return [dict(row) for row in rows]
+    return fetch_all(query, tuple(params), db_path, as_dicts=True)
 
 
 def get_recommendation_traces(
@@ -344,6 +647,8 @@ def get_recommendation_traces(
     offset: int = 0,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    after_shown_at: Optional[str] = None,
+    after_id: Optional[str] = None,
     db_path: Optional[str] = None
 ) -> list:
     """Get recommendations with optional filtering.
@@ -351,9 +656,13 @@ def get_recommendation_traces(
     Args:
         user_id: Filter by user_id (optional)
         limit: Maximum number of results (optional)
-        offset: Number of results to skip
+        offset: Number of results to skip (prefer after_shown_at/after_id
+            for deep pages; OFFSET still walks every skipped row)
         start_date: Start date filter (ISO format)
         end_date: End date filter (ISO format)
+        after_shown_at: shown_at of the last row of the previous page; with
+            after_id, returns the rows after it (keyset pagination)
+        after_id: recommendation_id of the last row of the previous page
         db_path: Path to SQLite database file. If None, uses default path.
         
     Returns:
@@ -374,28 +683,43 @@ def get_recommendation_traces(
         conditions.append("shown_at <= ?")
         params.append(end_date)
     
-    where_clause = ""
-    if conditions:
-        where_clause = "WHERE " + " AND ".join(conditions)
-    
-    query = f"""
-        SELECT recommendation_id, user_id, type, content_id, title, rationale,
-               decision_trace, shown_at, overridden, override_reason,
-               overridden_at, overridden_by
-        FROM recommendations
-        {where_clause}
-        ORDER BY shown_at DESC
-    """
+    if after_shown_at is not None and after_id is not None:
+        # Seek past the previous page on the shown_at index; recommendation_id breaks ties
+        conditions.append("shown_at <= ? AND (shown_at < ? OR recommendation_id < ?)")
+        params.extend([after_shown_at, after_shown_at, after_id])
+    
+    query = _filtered_query(
+        "SELECT recommendation_id, user_id, type, content_id, title, rationale, "
+        "decision_trace, shown_at, overridden, override_reason, overridden_at, overridden_by "
+        "FROM recommendations",
+        tuple(conditions), "shown_at DESC, recommendation_id DESC", bool(limit), bool(offset)
+    )
     
     if limit:
-        query += f" LIMIT ? OFFSET ?"
         params.extend([limit, offset])
     elif offset:
-        query += f" OFFSET ?"
         params.append(offset)
     
-    rows = fetch_all(query, tuple(params), db_path)
-    return [dict(row) for row in rows]
+    return fetch_all(query, tuple(params), db_path, as_dicts=True)
+
+
+# Worker threads for get_timeline_events, created on first use
+_timeline_executor: Optional[ThreadPoolExecutor] = None
+_timeline_executor_lock = threading.Lock()
+
+
+def _get_timeline_executor() -> ThreadPoolExecutor:
+    """Get the shared executor for timeline reads, creating it on first use.
+    
+    The executor is long-lived so its worker threads keep their pooled
+    connections between calls instead of opening new ones.
+    """
+    global _timeline_executor
+    if _timeline_executor is None:
+        with _timeline_executor_lock:
+            if _timeline_executor is None:
+                _timeline_executor = ThreadPoolExecutor(max_workers=3, thread_name_prefix="timeline")
+    return _timeline_executor
 
 
 def get_timeline_events(
@@ -415,11 +739,21 @@ def get_timeline_events(
     Returns:
         Dictionary with lists of different event types
     """
-    return {
-        "chat_logs": get_all_chat_logs(user_id, start_date=start_date, end_date=end_date, db_path=db_path),
-        "recommendations": get_recommendation_traces(user_id, start_date=start_date, end_date=end_date, db_path=db_path),
-        "operator_actions": get_operator_actions(user_id, start_date=start_date, end_date=end_date, db_path=db_path),
+    # The three tables are independent; WAL lets the reads run concurrently
+    # on each worker thread's own connection
+    executor = _get_timeline_executor()
+    futures = {
+        "chat_logs": executor.submit(
+            get_all_chat_logs, user_id, start_date=start_date, end_date=end_date, db_path=db_path
+        ),
+        "recommendations": executor.submit(
+            get_recommendation_traces, user_id, start_date=start_date, end_date=end_date, db_path=db_path
+        ),
+        "operator_actions": executor.submit(
+            get_operator_actions, user_id, start_date=start_date, end_date=end_date, db_path=db_path
+        ),
     }
+    return {name: future.result() for name, future in futures.items()}
 
 
 def get_consent_status(user_id: str, db_path: Optional[str] = None) -> Optional[dict]:
@@ -453,18 +787,22 @@ def store_consent(
     granted: bool,
     ip_address: Optional[str] = None,
     version: str = "1.0",
-    db_path: Optional[str] = None
+    db_path: Optional[str] = None,
+    created_at: Optional[str] = None
 ) -> None:
     """Store or update user consent.
     
+    The consent timestamp and its audit log row share one timestamp.
+    
     Args:
         user_id: User ID
         granted: Whether consent is granted
         ip_address: IP address of the request (optional)
         version: Consent version (default: "1.0")
         db_path: Path to SQLite database file. If None, uses default path.
+        created_at: ISO timestamp to record (optional; defaults to now)
     """
-    created_at = datetime.now().isoformat()
+    created_at = created_at or datetime.now().isoformat()
     
     query = """
         UPDATE users
@@ -486,14 +824,19 @@ def store_consent(
         conn.execute(audit_query, (user_id, action, ip_address or "unknown", created_at))
 
 
-def revoke_consent(user_id: str, db_path: Optional[str] = None) -> None:
+def revoke_consent(
+    user_id: str,
+    db_path: Optional[str] = None,
+    created_at: Optional[str] = None
+) -> None:
     """Revoke user consent.
     
     Args:
         user_id: User ID
         db_path: Path to SQLite database file. If None, uses default path.
+        created_at: ISO timestamp to record (optional; defaults to now)
     """
-    created_at = datetime.now().isoformat()
+    created_at = created_at or datetime.now().isoformat()
     
     query = """
         UPDATE users
@@ -1,20 +1,77 @@
 import firebase_admin
 from firebase_admin import credentials, firestore
+import copy
+import errno
 import os
 import json
+import select
 import socket
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache, wraps
 from typing import List, Dict, Any, Optional
+from google.cloud.firestore_v1.bulk_writer import BulkWriterOptions
+
+from src.utils.logging import get_logger
+
+logger = get_logger("database.firestore")
+
+# Sort direction for the newest-first audit and history queries
+_DESCENDING = firestore.Query.DESCENDING
+
+# Seconds to wait for a local emulator to accept a connection
+_PORT_PROBE_TIMEOUT = 0.05
+
+# Seconds before a closed port is probed again; an open port is remembered
+_PORT_PROBE_RETRY_INTERVAL = 5.0
+_closed_ports: Dict[tuple, float] = {}
+_open_ports = set()
 
 def is_port_open(host: str, port: int) -> bool:
-    """Check if a port is open (i.e., service is running)."""
+    """Check if a port is open (i.e., service is running).
+
+    An open port is remembered for the life of the process. A closed port is
+    re-probed at most every _PORT_PROBE_RETRY_INTERVAL seconds, so an emulator
+    started later is still found without probing on every call.
+    """
+    key = (host, port)
+    if key in _open_ports:
+        return True
+    now = time.monotonic()
+    if _closed_ports.get(key, 0.0) > now:
+        return False
+    if _probe_port(host, port):
+        _open_ports.add(key)
+        _closed_ports.pop(key, None)
+        return True
+    _closed_ports[key] = now + _PORT_PROBE_RETRY_INTERVAL
+    return False
+
+def _probe_port(host: str, port: int) -> bool:
+    """Try to connect to a port
+
+    Uses a non-blocking connect with a short select() wait so a closed port
+    costs milliseconds rather than a socket timeout.
+    """
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(0.1)  # Reduced from 0.5 to fail faster in serverless environments
+    except OSError:
+        return False
+    try:
+        sock.setblocking(False)
         result = sock.connect_ex((host, port))
-        sock.close()
-        return result == 0
+        if result == 0:
+            return True
+        if result not in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+            return False
+        _, writable, _ = select.select([], [sock], [], _PORT_PROBE_TIMEOUT)
+        return bool(writable) and sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0
     except Exception:
         return False
+    finally:
+        sock.close()
 
 def auto_detect_emulator():
     """Automatically detect if Firebase emulator is running and set environment variable."""
@@ -32,143 +89,158 @@ def auto_detect_emulator():
         # Check if emulator is explicitly requested
         if os.getenv('USE_FIREBASE_EMULATOR', '').lower() == 'true':
             os.environ['FIRESTORE_EMULATOR_HOST'] = '127.0.0.1:8080'
+            _firebase_config.cache_clear()
         # Auto-detect: check if port 8080 is open on localhost or 127.0.0.1
         elif is_port_open('localhost', 8080) or is_port_open('127.0.0.1', 8080):
             # Prefer 127.0.0.1 as it matches firebase.json configuration
             os.environ['FIRESTORE_EMULATOR_HOST'] = '127.0.0.1:8080'
-            # Optionally print a message (but only once)
+            _firebase_config.cache_clear()
+            # Log a message (but only once)
             if not os.getenv('_FIRESTORE_AUTO_DETECTED'):
-                print("✓ Auto-detected Firebase emulator running on 127.0.0.1:8080")
+                logger.info("Auto-detected Firebase emulator running on %s", '127.0.0.1:8080')
                 os.environ['_FIRESTORE_AUTO_DETECTED'] = 'true'
 
-# Auto-detect emulator on import
-auto_detect_emulator()
+@dataclass(frozen=True)
+class _FirebaseConfig:
+    """Firebase settings read from the environment"""
+    use_sqlite: bool
+    use_emulator: bool
+    has_env_var: bool
+    has_file: bool
+    cred_path: str
+
+
+@lru_cache(maxsize=1)
+def _firebase_config() -> _FirebaseConfig:
+    """Read the Firebase environment settings once
+
+    auto_detect_emulator() clears the cache when it sets
+    FIRESTORE_EMULATOR_HOST.
+
+    Returns:
+        _FirebaseConfig for the current environment
+    """
+    cred_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', 'firebase-service-account.json')
+    return _FirebaseConfig(
+        use_sqlite=os.getenv('USE_SQLITE', '').lower() == 'true',
+        use_emulator=os.getenv('FIRESTORE_EMULATOR_HOST') is not None or os.getenv('USE_FIREBASE_EMULATOR', '').lower() == 'true',
+        has_env_var=os.getenv('FIREBASE_SERVICE_ACCOUNT') is not None,
+        has_file=os.path.exists(cred_path),
+        cred_path=cred_path,
+    )
 
 # Initialize Firebase Admin
 # Support both local file and Vercel environment variable
 _initialized = False
+_init_lock = threading.Lock()
+
+# App options for the emulator when no usable service account file exists
+_EMULATOR_APP_OPTIONS = {'projectId': 'demo-project'}
 
 def initialize_firebase():
-    """Initialize Firebase Admin SDK with proper credentials or emulator"""
-    global _initialized
+    """Initialize Firebase Admin SDK with proper credentials or emulator
+
+    Runs once per process; later calls return before any environment or
+    credential checks.
+    """
     if _initialized:
         return
+    with _init_lock:
+        if not _initialized:
+            _initialize_firebase()
+
+def _initialize_firebase():
+    """Do the one-time initialization for initialize_firebase()"""
+    global _initialized
+    auto_detect_emulator()
+    config = _firebase_config()
     
     # Skip Firebase initialization if SQLite is explicitly requested
-    if os.getenv('USE_SQLITE', '').lower() == 'true':
+    if config.use_sqlite:
         _initialized = True
         return
     
-    # Check if Firebase emulator is enabled
-    use_emulator = os.getenv('FIRESTORE_EMULATOR_HOST') is not None or os.getenv('USE_FIREBASE_EMULATOR', '').lower() == 'true'
-    
-    if use_emulator:
+    if config.use_emulator:
         # Use Firebase emulator for local development
         emulator_host = os.getenv('FIRESTORE_EMULATOR_HOST', 'localhost:8080')
-        print("=" * 60)
-        print("🔥 INITIALIZING FIREBASE EMULATOR")
-        print("=" * 60)
-        print(f"📍 Target: {emulator_host}")
-        print("=" * 60)
+        logger.info("Initializing Firebase emulator at %s", emulator_host)
         
         # Initialize Firebase Admin for emulator
         # The emulator doesn't validate credentials, but SDK needs valid format
-        if not firebase_admin._apps:
+        if not firebase_admin._apps and config.has_file:
             # Use service account file if available (real or dummy - emulator doesn't care)
-            cred_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', 'firebase-service-account.json')
-            if os.path.exists(cred_path):
-                try:
-                    cred = credentials.Certificate(cred_path)
-                    firebase_admin.initialize_app(cred)
-                except Exception as e:
-                    print(f"Warning: Failed to load service account file: {e}")
-                    print("Trying to continue with emulator...")
-                    # If file exists but is invalid, try to initialize anyway
-                    # The emulator may still work
-                    try:
-                        firebase_admin.initialize_app(options={'projectId': 'demo-project'})
-                    except Exception:
-                        pass
-            else:
-                # No service account file - try to initialize with minimal config
-                # This may fail, but emulator should still work if FIRESTORE_EMULATOR_HOST is set
-                try:
-                    firebase_admin.initialize_app(options={'projectId': 'demo-project'})
-                except Exception:
-                    pass
+            try:
+                firebase_admin.initialize_app(credentials.Certificate(config.cred_path))
+            except Exception as e:
+                logger.warning("Failed to load service account file %s: %s; continuing with emulator",
+                               config.cred_path, e)
+        if not firebase_admin._apps:
+            # No usable service account file - try to initialize with minimal config
+            # This may fail, but emulator should still work if FIRESTORE_EMULATOR_HOST is set
+            try:
+                firebase_admin.initialize_app(options=_EMULATOR_APP_OPTIONS)
+            except Exception:
+                pass
         _initialized = True
         return
     
     # Check if Firebase credentials exist before trying to initialize
-    has_env_var = os.getenv('FIREBASE_SERVICE_ACCOUNT') is not None
-    cred_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', 'firebase-service-account.json')
-    has_file = os.path.exists(cred_path)
-    
-    if not has_env_var and not has_file:
+    if not config.has_env_var and not config.has_file:
         # No Firebase credentials - skip initialization (will use SQLite)
         _initialized = True
         return
     
     # Production Firebase - warn before initializing
-    print("=" * 60)
-    print("🔥 INITIALIZING FIREBASE PRODUCTION")
-    print("=" * 60)
-    print("⚠️  WARNING: Connecting to Firebase PRODUCTION environment")
-    if has_file:
-        print(f"📁 Using credentials file: {cred_path}")
-    if has_env_var:
-        print("📁 Using credentials from FIREBASE_SERVICE_ACCOUNT environment variable")
-    print("=" * 60)
-    
-    if os.getenv('FIREBASE_SERVICE_ACCOUNT'):
+    logger.warning("Connecting to Firebase PRODUCTION environment")
+    
+    if config.has_env_var:
         # Vercel: service account is stored as JSON string in environment variable
         try:
             service_account_json = json.loads(os.getenv('FIREBASE_SERVICE_ACCOUNT'))
             cred = credentials.Certificate(service_account_json)
-            print(f"Using Firebase service account from environment: {service_account_json.get('client_email', 'unknown')}")
+            logger.info("Using Firebase service account %s from FIREBASE_SERVICE_ACCOUNT",
+                        cred.service_account_email)
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid FIREBASE_SERVICE_ACCOUNT JSON: {e}")
         except Exception as e:
             raise ValueError(f"Failed to parse FIREBASE_SERVICE_ACCOUNT: {e}")
     else:
-        # Local: use service account file
-        cred = credentials.Certificate(cred_path)
-        with open(cred_path) as f:
-            sa_data = json.load(f)
-            print(f"Using Firebase service account from file: {sa_data.get('client_email', 'unknown')}")
+        # Local: use service account file (Certificate has already parsed it)
+        cred = credentials.Certificate(config.cred_path)
+        logger.info("Using Firebase service account %s from %s",
+                    cred.service_account_email, config.cred_path)
 
     # Only initialize if not already initialized
     if not firebase_admin._apps:
         firebase_admin.initialize_app(cred)
-        _initialized = True
+    _initialized = True
 
-# Initialize on import (will gracefully skip if no credentials)
-initialize_firebase()
-
-# Only create db client if Firebase was initialized and credentials exist
+# Firebase is initialized and the client created on the first get_db() call
 _db = None
+_db_lock = threading.Lock()
 
 def get_db():
     """Get Firestore client, initializing if needed"""
+    if _db is not None:
+        return _db
+    with _db_lock:
+        return _get_db()
+
+def _get_db():
+    """Create the Firestore client for get_db() if Firebase is available"""
     global _db
     if _db is None:
         # Skip Firebase if SQLite is explicitly requested
-        if os.getenv('USE_SQLITE', '').lower() == 'true':
+        if _firebase_config().use_sqlite:
             _db = None
             return None
         
-        # Re-check for emulator (in case it was started after module import)
+        # Re-check for emulator (a closed port is re-probed every few seconds,
+        # so one started after the first check is still found)
         auto_detect_emulator()
         
-        # Check if Firebase emulator is enabled
-        use_emulator = os.getenv('FIRESTORE_EMULATOR_HOST') is not None or os.getenv('USE_FIREBASE_EMULATOR', '').lower() == 'true'
-        
-        # Check if Firebase credentials exist
-        has_env_var = os.getenv('FIREBASE_SERVICE_ACCOUNT') is not None
-        cred_path = os.getenv('GOOGLE_APPLICATION_CREDENTIALS', 'firebase-service-account.json')
-        has_file = os.path.exists(cred_path)
-        
-        if use_emulator or has_env_var or has_file:
+        config = _firebase_config()
+        if config.use_emulator or config.has_env_var or config.has_file:
             initialize_firebase()
             _db = firestore.client()
         else:
@@ -176,7 +248,133 @@ def get_db():
             _db = None
     return _db
 
-db = None  # Will be set by get_db() if Firebase is available
+def __getattr__(name):
+    """Resolve the module-level db attribute lazily (PEP 562)
+
+    firestore.db is the client from get_db(), or None without Firebase.
+    """
+    if name == 'db':
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+@lru_cache(maxsize=10_000)
+def _user_subcol(client, user_id: str, name: str):
+    """Get a cached reference to one of a user's subcollections
+
+    Keyed on the client as well, so references never outlive the client
+    that created them.
+
+    Args:
+        client: Firestore client
+        user_id: User ID
+        name: Subcollection name (e.g. 'computed_features')
+
+    Returns:
+        CollectionReference for users/{user_id}/{name}
+    """
+    return client.collection('users').document(user_id).collection(name)
+
+# Short-lived cache for per-user reads made on every page render
+_READ_CACHE_TTL = 30.0
+_READ_CACHE_MAXSIZE = 1024
+_read_cache: Dict[tuple, tuple] = {}
+_read_cache_lock = threading.Lock()
+
+def _cache_key_part(value):
+    """Convert a cached function argument to a hashable key part
+
+    Lists and tuples become tuples and dicts become sorted item tuples, so
+    field projections and start_after values can be part of the key.
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_cache_key_part(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _cache_key_part(item)) for key, item in value.items()))
+    return value
+
+def _ttl_cached(func):
+    """Cache a per-user read for _READ_CACHE_TTL seconds
+
+    The decorated function's first argument must be the user_id. Callers get
+    a deep copy of the cached value, so mutating a result never changes the
+    cache. Calls whose arguments still cannot be hashed (e.g. a document
+    snapshot as start_after) bypass the cache.
+    """
+    @wraps(func)
+    def wrapper(user_id, *args, **kwargs):
+        key = (func.__name__, user_id, _cache_key_part(args), _cache_key_part(kwargs))
+        try:
+            hash(key)
+        except TypeError:
+            return func(user_id, *args, **kwargs)
+        now = time.monotonic()
+        with _read_cache_lock:
+            entry = _read_cache.get(key)
+        if entry is not None and entry[0] > now:
+            return copy.deepcopy(entry[1])
+        value = func(user_id, *args, **kwargs)
+        with _read_cache_lock:
+            _read_cache.pop(key, None)
+            if len(_read_cache) >= _READ_CACHE_MAXSIZE:
+                # Evict the oldest entry (dicts keep insertion order)
+                del _read_cache[next(iter(_read_cache))]
+            _read_cache[key] = (now + _READ_CACHE_TTL, value)
+        return copy.deepcopy(value)
+    return wrapper
+
+def invalidate_user_cache(*user_ids: str) -> None:
+    """Drop cached reads for users after writing to their documents
+
+    Args:
+        user_ids: User IDs
+    """
+    user_ids = set(user_ids)
+    with _read_cache_lock:
+        for key in [key for key in _read_cache if key[1] in user_ids]:
+            del _read_cache[key]
+
+def _doc_dict(doc, id_field: str) -> Dict[str, Any]:
+    """Convert a document snapshot to a dict that includes its ID
+
+    to_dict() already returns a new dict, so the ID is added in place rather
+    than merging into another dict. A stored field of the same name wins, as
+    it did with {id_field: doc.id, **doc.to_dict()}.
+
+    Args:
+        doc: DocumentSnapshot
+        id_field: Key to store the document ID under
+
+    Returns:
+        Document data with the ID added
+    """
+    data = doc.to_dict()
+    data.setdefault(id_field, doc.id)
+    return data
+
+# Field path of the document ID; projecting only this returns IDs without data
+_DOCUMENT_ID_FIELD = '__name__'
+
+def _apply_query_options(query, fields=None, limit=None, start_after=None):
+    """Apply a field projection and paging to a Firestore query
+
+    Args:
+        query: Collection reference or query
+        fields: Field paths to return (None for all fields, empty for
+            document IDs only)
+        limit: Maximum number of documents (None for no limit)
+        start_after: Values of the query's order_by fields (e.g. the last
+            document of the previous page) to resume after
+
+    Returns:
+        The query with the options applied
+    """
+    if fields is not None:
+        query = query.select(list(fields) or [_DOCUMENT_ID_FIELD])
+    if start_after is not None:
+        query = query.start_after(start_after)
+    if limit:
+        query = query.limit(limit)
+    return query
 
 def get_collection(collection_name):
     """Get Firestore collection reference"""
@@ -192,15 +390,53 @@ def store_user(user_data):
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     user_ref = client.collection('users').document(user_data['user_id'])
     user_ref.set(user_data)
+    invalidate_user_cache(user_data['user_id'])
     return user_data['user_id']
 
+def _feature_doc_id(time_window, signal_type):
+    """Document ID for a user's feature, one per (time_window, signal_type)"""
+    return f"{time_window}_{signal_type}"
+
+_EARLIEST_COMPUTED_AT = datetime.min.replace(tzinfo=timezone.utc)
+
+def _latest_features(features: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only the most recent copy of each feature
+
+    Features stored before _feature_doc_id was introduced live under
+    auto-generated document IDs, so a user can have a stale legacy copy
+    next to the current document for the same (time_window, signal_type).
+    The copy with the latest computed_at wins. Features without both key
+    fields (e.g. left out by a projection) are all kept.
+
+    Args:
+        features: Feature dicts, optionally with a user_id
+
+    Returns:
+        Features in first-seen order, one per (user_id, time_window, signal_type)
+    """
+    latest = {}
+    for index, feature in enumerate(features):
+        time_window = feature.get('time_window')
+        signal_type = feature.get('signal_type')
+        if time_window is None or signal_type is None:
+            latest[index] = feature
+            continue
+        key = (feature.get('user_id'), time_window, signal_type)
+        current = latest.get(key)
+        if current is None or (
+            (feature.get('computed_at') or _EARLIEST_COMPUTED_AT)
+            > (current.get('computed_at') or _EARLIEST_COMPUTED_AT)
+        ):
+            latest[key] = feature
+    return list(latest.values())
+
 def store_feature(user_id, signal_type, signal_data, time_window):
-    """Store computed feature"""
+    """Store computed feature, replacing the previous value for its window and type"""
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    feature_ref = client.collection('users').document(user_id)\
-                    .collection('computed_features').document()
+    feature_ref = _user_subcol(client, user_id, 'computed_features')\
+                      .document(_feature_doc_id(time_window, signal_type))
     feature_ref.set({
         'signal_type': signal_type,
         'signal_data': signal_data,
@@ -208,46 +444,51 @@ def store_feature(user_id, signal_type, signal_data, time_window):
         'computed_at': firestore.SERVER_TIMESTAMP
     })
 
-def get_user_features(user_id, time_window=None):
-    """Get user's computed features"""
+def get_user_features(user_id, time_window=None, fields=None):
+    """Get user's computed features (optionally only the given fields)"""
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    features_ref = client.collection('users').document(user_id)\
-                     .collection('computed_features')
+    features_ref = _user_subcol(client, user_id, 'computed_features')
     
     if time_window:
         features_ref = features_ref.where('time_window', '==', time_window)
     
-    return [doc.to_dict() for doc in features_ref.stream()]
+    features_ref = _apply_query_options(features_ref, fields=fields)
+    return _latest_features([doc.to_dict() for doc in features_ref.stream()])
 
 def store_persona(user_id, persona_data):
     """Store persona assignment"""
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    persona_ref = client.collection('users').document(user_id)\
-                    .collection('persona_assignments').document()
+    persona_ref = _user_subcol(client, user_id, 'persona_assignments').document()
     persona_ref.set(persona_data)
+    invalidate_user_cache(user_id)
 
 def store_recommendation(user_id, recommendation_data):
     """Store recommendation"""
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    rec_ref = client.collection('users').document(user_id)\
-                .collection('recommendations').document()
+    rec_ref = _user_subcol(client, user_id, 'recommendations').document()
     rec_ref.set(recommendation_data)
+    invalidate_user_cache(user_id)
     return rec_ref.id
 
-def get_all_users():
-    """Get all users"""
+def get_all_users(fields=None, limit=None):
+    """Get all users
+
+    Pass fields=[] when only user IDs are needed, so no document data is
+    transferred.
+    """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    users_ref = client.collection('users')
-    return [{'user_id': doc.id, **doc.to_dict()} for doc in users_ref.stream()]
+    users_ref = _apply_query_options(client.collection('users'), fields=fields, limit=limit)
+    return [_doc_dict(doc, 'user_id') for doc in users_ref.stream()]
 
+@_ttl_cached
 def get_user(user_id):
     """Get single user"""
     client = get_db()
@@ -256,202 +497,210 @@ def get_user(user_id):
     user_ref = client.collection('users').document(user_id)
     user_doc = user_ref.get()
     if user_doc.exists:
-        return {'user_id': user_id, **user_doc.to_dict()}
+        return _doc_dict(user_doc, 'user_id')
     return None
 
-def get_persona_assignments(user_id):
-    """Get all persona assignments for a user"""
-    from firebase_admin import firestore
+@_ttl_cached
+def get_persona_assignments(user_id, limit=None, start_after=None):
+    """Get persona assignments for a user, newest first
+
+    Pages with limit and start_after ({'assigned_at': <last value>}).
+    """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    personas_ref = client.collection('users').document(user_id)\
-                     .collection('persona_assignments')\
-                     .order_by('assigned_at', direction=firestore.Query.DESCENDING)
+    personas_ref = _user_subcol(client, user_id, 'persona_assignments')\
+                     .order_by('assigned_at', direction=_DESCENDING)
+    personas_ref = _apply_query_options(personas_ref, limit=limit, start_after=start_after)
     return [doc.to_dict() for doc in personas_ref.stream()]
 
-def get_recommendations(user_id):
-    """Get all recommendations for a user"""
-    from firebase_admin import firestore
+@_ttl_cached
+def get_recommendations(user_id, fields=None, limit=None, start_after=None):
+    """Get recommendations for a user, newest first
+
+    Pages with limit and start_after ({'shown_at': <last value>}).
+    """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    recs_ref = client.collection('users').document(user_id)\
-                 .collection('recommendations')\
-                 .order_by('shown_at', direction=firestore.Query.DESCENDING)
+    recs_ref = _user_subcol(client, user_id, 'recommendations')\
+                 .order_by('shown_at', direction=_DESCENDING)
+    recs_ref = _apply_query_options(recs_ref, fields=fields, limit=limit, start_after=start_after)
     return [doc.to_dict() for doc in recs_ref.stream()]
 
-def get_user_transactions(user_id, start_date=None):
-    """Get all transactions for a user, optionally filtered by date"""
+def get_user_transactions(user_id, start_date=None, fields=None):
+    """Get all transactions for a user, optionally filtered by date
+
+    With start_date, the filter runs in Firestore (newest first, matching the
+    SQLite queries) so only matching documents are transferred. A range
+    filter and order on the same field use the automatic single-field index.
+    """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    transactions_ref = client.collection('users').document(user_id)\
-                         .collection('transactions')
-    
-    # Firestore doesn't support direct date filtering without index
-    # Get all and filter in Python for now
-    all_transactions = [doc.to_dict() for doc in transactions_ref.stream()]
+    transactions_ref = _user_subcol(client, user_id, 'transactions')
     
     if start_date:
-        # Filter transactions >= start_date
-        filtered = []
-        for txn in all_transactions:
-            txn_date = txn.get('date', '')
-            if txn_date >= start_date:
-                filtered.append(txn)
-        return filtered
+        transactions_ref = transactions_ref.where('date', '>=', start_date)\
+                                           .order_by('date', direction=_DESCENDING)
     
-    return all_transactions
+    transactions_ref = _apply_query_options(transactions_ref, fields=fields)
+    return [doc.to_dict() for doc in transactions_ref.stream()]
 
 def get_user_accounts(user_id, account_type=None, subtype=None):
-    """Get accounts for a user, optionally filtered by type or subtype"""
+    """Get accounts for a user, optionally filtered by type or subtype
+
+    Equality filters run in Firestore; combining them needs no composite index.
+    """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    accounts_ref = client.collection('users').document(user_id)\
-                     .collection('accounts')
-    
-    all_accounts = [doc.to_dict() for doc in accounts_ref.stream()]
+    accounts_ref = _user_subcol(client, user_id, 'accounts')
     
     if account_type:
-        all_accounts = [acc for acc in all_accounts if acc.get('type') == account_type]
+        accounts_ref = accounts_ref.where('type', '==', account_type)
     
     if subtype:
-        all_accounts = [acc for acc in all_accounts if acc.get('subtype') == subtype]
+        accounts_ref = accounts_ref.where('subtype', '==', subtype)
     
-    return all_accounts
+    return [doc.to_dict() for doc in accounts_ref.stream()]
 
-def store_chat_log(user_id, message, response, citations, guardrails_passed):
-    """Store chat log entry"""
+def store_chat_log(user_id, message, response, citations, guardrails_passed, created_at=None):
+    """Store chat log entry (created_at defaults to the current UTC time)"""
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
-    chat_log_ref = client.collection('users').document(user_id)\
-                     .collection('chat_logs').document()
+    chat_log_ref = _user_subcol(client, user_id, 'chat_logs').document()
     chat_log_ref.set({
         'user_id': user_id,
         'message': message,
         'response': response,
         'citations': citations,
         'guardrails_passed': guardrails_passed,
-        'created_at': firestore.SERVER_TIMESTAMP
+        'created_at': created_at or datetime.now(timezone.utc)
     })
     return chat_log_ref.id
 
 
 # Batch write functions for processed data
 
-def store_feature_batch(features: List[Dict[str, Any]], batch_size: int = 500):
+# Bulk writes start at 500 ops/sec and ramp up by 50% every 5 minutes
+_BULK_WRITER_OPTIONS = BulkWriterOptions(initial_ops_per_second=500, max_ops_per_second=10000)
+
+# Attempts per write before a bulk load reports it as failed
+_MAX_WRITE_ATTEMPTS = 15
+
+def _bulk_write(client, writes) -> int:
+    """Set documents with a BulkWriter
+
+    The BulkWriter batches, commits in parallel, rate-limits and retries
+    the writes itself.
+
+    Args:
+        client: Firestore client
+        writes: Iterable of (document_ref, data) pairs
+
+    Returns:
+        Number of documents written
+
+    Raises:
+        RuntimeError: If any write still fails after _MAX_WRITE_ATTEMPTS
+    """
+    failures = []
+
+    def on_write_error(failure, bulk_writer) -> bool:
+        if failure.attempts < _MAX_WRITE_ATTEMPTS:
+            return True
+        failures.append(failure)
+        return False
+
+    bulk_writer = client.bulk_writer(options=_BULK_WRITER_OPTIONS)
+    bulk_writer.on_write_error(on_write_error)
+    count = 0
+    try:
+        for ref, data in writes:
+            bulk_writer.set(ref, data)
+            count += 1
+    finally:
+        bulk_writer.close()
+
+    if failures:
+        raise RuntimeError(f"{len(failures)} of {count} bulk writes failed: {failures[0].message}")
+    return count
+
+
+def store_feature_batch(features: List[Dict[str, Any]]):
     """Batch store multiple features.
     
     Args:
         features: List of feature dictionaries, each must have:
                   {'user_id': str, 'signal_type': str, 'signal_data': dict, 'time_window': str}
-        batch_size: Batch size (default: 500, max: 500).
     """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
-    batch = client.batch()
-    count = 0
-    batches_committed = 0
-    
-    for feature in features:
-        user_id = feature['user_id']
-        feature_ref = client.collection('users').document(user_id)\
-                          .collection('computed_features').document()
-        batch.set(feature_ref, {
-            'signal_type': feature['signal_type'],
-            'signal_data': feature['signal_data'],
-            'time_window': feature['time_window'],
-            'computed_at': firestore.SERVER_TIMESTAMP
-        })
-        count += 1
-        
-        if count % batch_size == 0:
-            batch.commit()
-            batch = client.batch()
-            batches_committed += 1
-    
-    # Commit remaining
-    if count % batch_size != 0:
-        batch.commit()
-        batches_committed += 1
-    
-    return count
+    # One client-side timestamp for the whole load; no server transform per write
+    computed_at = datetime.now(timezone.utc)
+    writes = (
+        (
+            _user_subcol(client, feature['user_id'], 'computed_features')
+                .document(_feature_doc_id(feature['time_window'], feature['signal_type'])),
+            {
+                'signal_type': feature['signal_type'],
+                'signal_data': feature['signal_data'],
+                'time_window': feature['time_window'],
+                'computed_at': computed_at
+            },
+        )
+        for feature in features
+    )
+    return _bulk_write(client, writes)
 
 
-def store_persona_batch(personas: List[Dict[str, Any]], batch_size: int = 500):
+def store_persona_batch(personas: List[Dict[str, Any]]):
     """Batch store multiple persona assignments.
     
     Args:
         personas: List of persona dictionaries, each must have:
                   {'user_id': str, 'time_window': str, 'persona': str, ...}
-        batch_size: Batch size (default: 500, max: 500).
     """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
-    batch = client.batch()
-    count = 0
-    batches_committed = 0
-    
-    for persona in personas:
-        user_id = persona['user_id']
-        persona_ref = client.collection('users').document(user_id)\
-                          .collection('persona_assignments').document()
-        batch.set(persona_ref, persona)
-        count += 1
-        
-        if count % batch_size == 0:
-            batch.commit()
-            batch = client.batch()
-            batches_committed += 1
-    
-    # Commit remaining
-    if count % batch_size != 0:
-        batch.commit()
-        batches_committed += 1
-    
+    writes = (
+        (
+            _user_subcol(client, persona['user_id'], 'persona_assignments').document(),
+            persona,
+        )
+        for persona in personas
+    )
+    count = _bulk_write(client, writes)
+    invalidate_user_cache(*(persona['user_id'] for persona in personas))
     return count
 
 
-def store_recommendation_batch(recommendations: List[Dict[str, Any]], batch_size: int = 500):
+def store_recommendation_batch(recommendations: List[Dict[str, Any]]):
     """Batch store multiple recommendations.
     
     Args:
         recommendations: List of recommendation dictionaries, each must have:
                          {'user_id': str, 'type': str, ...}
-        batch_size: Batch size (default: 500, max: 500).
     """
     client = get_db()
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
-    batch = client.batch()
-    count = 0
-    batches_committed = 0
-    
-    for rec in recommendations:
-        user_id = rec['user_id']
-        rec_ref = client.collection('users').document(user_id)\
-                      .collection('recommendations').document()
-        batch.set(rec_ref, rec)
-        count += 1
-        
-        if count % batch_size == 0:
-            batch.commit()
-            batch = client.batch()
-            batches_committed += 1
-    
-    # Commit remaining
-    if count % batch_size != 0:
-        batch.commit()
-        batches_committed += 1
-    
+    writes = (
+        (
+            _user_subcol(client, rec['user_id'], 'recommendations').document(),
+            rec,
+        )
+        for rec in recommendations
+    )
+    count = _bulk_write(client, writes)
+    invalidate_user_cache(*(rec['user_id'] for rec in recommendations))
     return count
 
 
@@ -471,21 +720,18 @@ def get_all_features(time_window: Optional[str] = None) -> List[Dict[str, Any]]:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
     all_features = []
-    users_ref = client.collection('users')
+    # One query across every user's computed_features subcollection
+    features_ref = client.collection_group('computed_features')
     
-    for user_doc in users_ref.stream():
-        user_id = user_doc.id
-        features_ref = user_doc.reference.collection('computed_features')
-        
-        if time_window:
-            features_ref = features_ref.where('time_window', '==', time_window)
-        
-        for feature_doc in features_ref.stream():
-            feature_data = feature_doc.to_dict()
-            feature_data['user_id'] = user_id  # Add user_id for SQLite loading
-            all_features.append(feature_data)
+    if time_window:
+        features_ref = features_ref.where('time_window', '==', time_window)
     
-    return all_features
+    for feature_doc in features_ref.stream():
+        feature_data = feature_doc.to_dict()
+        feature_data['user_id'] = feature_doc.reference.parent.parent.id  # Add user_id for SQLite loading
+        all_features.append(feature_data)
+    
+    return _latest_features(all_features)
 
 
 def get_all_personas(time_window: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -502,19 +748,16 @@ def get_all_personas(time_window: Optional[str] = None) -> List[Dict[str, Any]]:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
     all_personas = []
-    users_ref = client.collection('users')
+    # One query across every user's persona_assignments subcollection
+    personas_ref = client.collection_group('persona_assignments')
     
-    for user_doc in users_ref.stream():
-        user_id = user_doc.id
-        personas_ref = user_doc.reference.collection('persona_assignments')
-        
-        if time_window:
-            personas_ref = personas_ref.where('time_window', '==', time_window)
-        
-        for persona_doc in personas_ref.stream():
-            persona_data = persona_doc.to_dict()
-            persona_data['user_id'] = user_id  # Add user_id for SQLite loading
-            all_personas.append(persona_data)
+    if time_window:
+        personas_ref = personas_ref.where('time_window', '==', time_window)
+    
+    for persona_doc in personas_ref.stream():
+        persona_data = persona_doc.to_dict()
+        persona_data['user_id'] = persona_doc.reference.parent.parent.id  # Add user_id for SQLite loading
+        all_personas.append(persona_data)
     
     return all_personas
 
@@ -530,17 +773,14 @@ def get_all_recommendations() -> List[Dict[str, Any]]:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
     all_recommendations = []
-    users_ref = client.collection('users')
+    # One query across every user's recommendations subcollection
+    recs_ref = client.collection_group('recommendations')
     
-    for user_doc in users_ref.stream():
-        user_id = user_doc.id
-        recs_ref = user_doc.reference.collection('recommendations')
-        
-        for rec_doc in recs_ref.stream():
-            rec_data = rec_doc.to_dict()
-            rec_data['user_id'] = user_id  # Add user_id for SQLite loading
-            rec_data['recommendation_id'] = rec_doc.id  # Add recommendation_id
-            all_recommendations.append(rec_data)
+    for rec_doc in recs_ref.stream():
+        rec_data = rec_doc.to_dict()
+        rec_data['user_id'] = rec_doc.reference.parent.parent.id  # Add user_id for SQLite loading
+        rec_data['recommendation_id'] = rec_doc.id  # Add recommendation_id
+        all_recommendations.append(rec_data)
     
     return all_recommendations
 
@@ -568,8 +808,7 @@ def store_operator_action(
     if client is None:
         raise RuntimeError("Firebase not initialized. Ensure FIREBASE_SERVICE_ACCOUNT is set or firebase-service-account.json exists.")
     
-    action_ref = client.collection('users').document(user_id)\
-                       .collection('operator_actions').document()
+    action_ref = _user_subcol(client, user_id, 'operator_actions').document()
     
     action_data = {
         'operator_id': operator_id,
@@ -610,14 +849,13 @@ def get_operator_actions(
     if not user_id:
         return []
     
-    actions_ref = client.collection('users').document(user_id)\
-                        .collection('operator_actions')
+    actions_ref = _user_subcol(client, user_id, 'operator_actions')
     
     if action_type:
         actions_ref = actions_ref.where('action_type', '==', action_type)
     
     # Order by created_at descending
-    actions_ref = actions_ref.order_by('created_at', direction=firestore.Query.DESCENDING)
+    actions_ref = actions_ref.order_by('created_at', direction=_DESCENDING)
     
     # Apply pagination
     if offset > 0:
@@ -699,6 +937,7 @@ def store_consent(
         update_data['consent_timestamp'] = None
     
     user_ref.update(update_data)
+    invalidate_user_cache(user_id)
     
     # Log consent action to audit trail
     audit_ref = client.collection('consent_audit_log').document()
@@ -744,7 +983,7 @@ def get_all_chat_logs_firestore(
     
     if user_id:
         # Query specific user's chat logs
-        query = client.collection('users').document(user_id).collection('chat_logs')
+        query = _user_subcol(client, user_id, 'chat_logs')
     else:
         # Query all chat logs across users
         query = client.collection_group('chat_logs')
@@ -754,7 +993,7 @@ def get_all_chat_logs_firestore(
     if end_date:
         query = query.where('created_at', '<=', end_date)
     
-    query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+    query = query.order_by('created_at', direction=_DESCENDING)
     
     if limit:
         query = query.limit(limit)
@@ -762,7 +1001,7 @@ def get_all_chat_logs_firestore(
         query = query.offset(offset)
     
     docs = query.stream()
-    return [{'id': doc.id, **doc.to_dict()} for doc in docs]
+    return [_doc_dict(doc, 'id') for doc in docs]
 
 
 def get_recommendation_traces_firestore(
@@ -789,7 +1028,7 @@ def get_recommendation_traces_firestore(
         raise RuntimeError("Firebase not initialized")
     
     if user_id:
-        query = client.collection('users').document(user_id).collection('recommendations')
+        query = _user_subcol(client, user_id, 'recommendations')
     else:
         query = client.collection_group('recommendations')
     
@@ -798,7 +1037,7 @@ def get_recommendation_traces_firestore(
     if end_date:
         query = query.where('shown_at', '<=', end_date)
     
-    query = query.order_by('shown_at', direction=firestore.Query.DESCENDING)
+    query = query.order_by('shown_at', direction=_DESCENDING)
     
     if limit:
         query = query.limit(limit)
@@ -806,7 +1045,7 @@ def get_recommendation_traces_firestore(
         query = query.offset(offset)
     
     docs = query.stream()
-    return [{'recommendation_id': doc.id, **doc.to_dict()} for doc in docs]
+    return [_doc_dict(doc, 'recommendation_id') for doc in docs]
 
 
 def get_timeline_events_firestore(
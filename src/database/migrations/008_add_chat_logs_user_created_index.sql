@@ -0,0 +1,7 @@
+-- Migration: Add composite index for per-user chat log reads
+-- Audit/trace reads filter chat_logs by user_id and order by created_at DESC;
+-- the composite index serves both the filter and the ordering.
+
+CREATE INDEX IF NOT EXISTS idx_chat_logs_user_created ON chat_logs(user_id, created_at DESC);
+
+-- Migration complete
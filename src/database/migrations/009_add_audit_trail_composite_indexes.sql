@@ -0,0 +1,10 @@
+-- Migration: Add composite indexes for filtered audit trail reads
+-- get_operator_actions filters by user_id or action_type and
+-- get_recommendation_traces filters by user_id, both ordering by time DESC;
+-- each composite index serves the filter and the ordering without a sort.
+
+CREATE INDEX IF NOT EXISTS idx_operator_actions_user_created ON operator_actions(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_operator_actions_type_created ON operator_actions(action_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_recommendations_user_shown ON recommendations(user_id, shown_at DESC);
+
+-- Migration complete
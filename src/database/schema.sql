@@ -178,9 +178,13 @@ CREATE INDEX IF NOT EXISTS idx_persona_assignments_user_id ON persona_assignment
 CREATE INDEX IF NOT EXISTS idx_recommendations_user_id ON recommendations(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_logs_user_id ON chat_logs(user_id);
 CREATE INDEX IF NOT EXISTS idx_chat_logs_created_at ON chat_logs(created_at);
+CREATE INDEX IF NOT EXISTS idx_chat_logs_user_created ON chat_logs(user_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_operator_actions_user_id ON operator_actions(user_id);
 CREATE INDEX IF NOT EXISTS idx_operator_actions_created_at ON operator_actions(created_at);
 CREATE INDEX IF NOT EXISTS idx_operator_actions_action_type ON operator_actions(action_type);
+CREATE INDEX IF NOT EXISTS idx_operator_actions_user_created ON operator_actions(user_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_operator_actions_type_created ON operator_actions(action_type, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_recommendations_user_shown ON recommendations(user_id, shown_at DESC);
 CREATE INDEX IF NOT EXISTS idx_users_consent_status ON users(consent_status);
 CREATE INDEX IF NOT EXISTS idx_users_flagged ON users(flagged);
 CREATE INDEX IF NOT EXISTS idx_recommendations_overridden ON recommendations(overridden);
@@ -120,7 +120,7 @@ def compute_all_users(force_recompute: bool = False, use_sqlite: bool = False,
     # Get all users
     if use_firestore:
         print("Using Firestore database...")
-        users = get_all_users()
+        users = get_all_users(fields=[])  # IDs only
         # Convert to list of dicts with user_id key
         users = [{"user_id": user["user_id"]} for user in users]
     else:
@@ -42,16 +42,39 @@ SSN_PATTERN = re.compile(r'\b\d{3}-\d{2}-\d{4}\b|\b\d{9}\b')  # SSN formats
 EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')
 PHONE_PATTERN = re.compile(r'\b\d{3}-\d{3}-\d{4}\b|\b\(\d{3}\)\s?\d{3}-\d{4}\b|\b\d{10}\b')
 
-# Sensitive patterns in merchant names
+# PII patterns applied to user messages, in order
+_USER_MESSAGE_PII_PATTERNS = [
+    (ACCOUNT_NUMBER_PATTERN, "[ACCOUNT_NUMBER]", "account_number"),
+    (ROUTING_NUMBER_PATTERN, "[ROUTING_NUMBER]", "routing_number"),
+    (SSN_PATTERN, "[SSN]", "ssn"),
+    (EMAIL_PATTERN, "[EMAIL]", "email"),
+    (PHONE_PATTERN, "[PHONE]", "phone"),
+]
+
+# Sensitive patterns in merchant names (compiled once; applied to every transaction)
 SENSITIVE_MERCHANT_PATTERNS = [
-    (r'@', '[REDACTED]'),  # Email addresses
-    (r'\d{3}-\d{3}-\d{4}', '[PHONE]'),  # Phone numbers
-    (r'ATM \d+', 'ATM'),  # Specific ATM IDs
-    (r'CHECK \d+', 'CHECK'),  # Check numbers
-    (r'WIRE \d+', 'WIRE'),  # Wire transfer IDs
+    (re.compile(r'@', re.IGNORECASE), '[REDACTED]'),  # Email addresses
+    (re.compile(r'\d{3}-\d{3}-\d{4}', re.IGNORECASE), '[PHONE]'),  # Phone numbers
+    (re.compile(r'ATM \d+', re.IGNORECASE), 'ATM'),  # Specific ATM IDs
+    (re.compile(r'CHECK \d+', re.IGNORECASE), 'CHECK'),  # Check numbers
+    (re.compile(r'WIRE \d+', re.IGNORECASE), 'WIRE'),  # Wire transfer IDs
 ]
 
 
+def _json_list_chars(item_chars) -> int:
+    """Length of a JSON array given the serialized lengths of its items.
+    
+    Matches json.dumps output with default separators: brackets plus ", "
+    between items.
+    """
+    count = 0
+    total = 0
+    for chars in item_chars:
+        count += 1
+        total += chars
+    return 2 + total + 2 * max(count - 1, 0)
+
+
 class DataSanitizer:
     """Sanitizes financial data and user inputs before sending to LLM."""
     
@@ -97,26 +120,11 @@ class DataSanitizer:
         detected_pii = []
         sanitized = message
         
-        # Check for PII patterns
-        if ACCOUNT_NUMBER_PATTERN.search(sanitized):
-            detected_pii.append("account_number")
-            sanitized = ACCOUNT_NUMBER_PATTERN.sub("[ACCOUNT_NUMBER]", sanitized)
-        
-        if ROUTING_NUMBER_PATTERN.search(sanitized):
-            detected_pii.append("routing_number")
-            sanitized = ROUTING_NUMBER_PATTERN.sub("[ROUTING_NUMBER]", sanitized)
-        
-        if SSN_PATTERN.search(sanitized):
-            detected_pii.append("ssn")
-            sanitized = SSN_PATTERN.sub("[SSN]", sanitized)
-        
-        if EMAIL_PATTERN.search(sanitized):
-            detected_pii.append("email")
-            sanitized = EMAIL_PATTERN.sub("[EMAIL]", sanitized)
-        
-        if PHONE_PATTERN.search(sanitized):
-            detected_pii.append("phone")
-            sanitized = PHONE_PATTERN.sub("[PHONE]", sanitized)
+        # Check for PII patterns (subn detects and replaces in a single scan)
+        for pattern, replacement, pii_type in _USER_MESSAGE_PII_PATTERNS:
+            sanitized, count = pattern.subn(replacement, sanitized)
+            if count:
+                detected_pii.append(pii_type)
         
         # Use Guardrails PII detector if available
         if self.pii_detector:
@@ -266,7 +274,7 @@ class DataSanitizer:
         
         # Apply all sensitive merchant patterns
         for pattern, replacement in SENSITIVE_MERCHANT_PATTERNS:
-            sanitized = re.sub(pattern, replacement, sanitized, flags=re.IGNORECASE)
+            sanitized = pattern.sub(replacement, sanitized)
         
         return sanitized
     
@@ -365,16 +373,65 @@ class DataSanitizer:
             # Conservative estimate if JSON serialization fails
             return 3000
     
-    def reduce_transaction_context(
+    def fit_context_to_budget(
         self,
+        user_features: Dict[str, Any],
         transactions: List[Dict[str, Any]],
         target_tokens: int = 2000
+    ) -> Tuple[List[Dict[str, Any]], int, int]:
+        """Estimate context tokens and reduce transactions to fit the budget.
+        
+        Each transaction is serialized once and its size cached, so the
+        estimates before and after reduction are derived from those sizes
+        instead of re-serializing the whole context.
+        
+        Args:
+            user_features: User's computed features
+            transactions: List of transactions
+            target_tokens: Target token count
+            
+        Returns:
+            Tuple of (transactions to send, estimated tokens before reduction,
+            estimated tokens after reduction)
+        """
+        try:
+            features_chars = len(json.dumps(user_features))
+            txn_chars = {id(txn): len(json.dumps(txn)) for txn in transactions}
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Error estimating context tokens: {e}")
+            # Conservative estimate if JSON serialization fails
+            if 3000 <= target_tokens:
+                return transactions, 3000, 3000
+            reduced = self.reduce_transaction_context(transactions, target_tokens)
+            return reduced, 3000, self.estimate_context_tokens(user_features, reduced)
+        
+        transactions_chars = _json_list_chars(txn_chars[id(txn)] for txn in transactions)
+        estimated_tokens = (features_chars + transactions_chars) // 4
+        if estimated_tokens <= target_tokens:
+            return transactions, estimated_tokens, estimated_tokens
+        
+        # Same estimate as estimate_context_tokens({}, transactions)
+        reduced = self.reduce_transaction_context(
+            transactions,
+            target_tokens,
+            current_tokens=(len("{}") + transactions_chars) // 4
+        )
+        reduced_chars = _json_list_chars(txn_chars[id(txn)] for txn in reduced)
+        return reduced, estimated_tokens, (features_chars + reduced_chars) // 4
+    
+    def reduce_transaction_context(
+        self,
+        transactions: List[Dict[str, Any]],
+        target_tokens: int = 2000,
+        current_tokens: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """Intelligently reduce transactions to fit token budget.
         
         Args:
             transactions: List of transaction dictionaries
             target_tokens: Target token count
+            current_tokens: Precomputed token estimate for the transactions
+                (estimated here if not provided)
             
         Returns:
             Reduced list of transactions
@@ -383,7 +440,8 @@ class DataSanitizer:
             return transactions
         
         # Start with all transactions
-        current_tokens = self.estimate_context_tokens({}, transactions)
+        if current_tokens is None:
+            current_tokens = self.estimate_context_tokens({}, transactions)
         
         if current_tokens <= target_tokens:
             return transactions
@@ -114,6 +114,10 @@ class MerchantNameValidator(Validator if HAS_GUARDRAILS else object):
         if HAS_GUARDRAILS:
             super().__init__(on_fail=on_fail, **kwargs)
         self.patterns = patterns or MERCHANT_PII_PATTERNS
+        # Compile once per validator rather than on every validate() call
+        self._compiled_patterns = [
+            (re.compile(pattern), description) for pattern, description in self.patterns
+        ]
     
     def validate(self, value: str, metadata: dict = None) -> str:
         """Validate that merchant name does not contain PII patterns.
@@ -133,8 +137,8 @@ class MerchantNameValidator(Validator if HAS_GUARDRAILS else object):
         
         found_patterns = []
         
-        for pattern, description in self.patterns:
-            if re.search(pattern, value):
+        for pattern, description in self._compiled_patterns:
+            if pattern.search(value):
                 found_patterns.append(description)
         
         if found_patterns:
@@ -155,6 +159,9 @@ class ChatGuardrails:
     
     def __init__(self):
         """Initialize guardrails with validators."""
+        # Reused by validate_merchant_names on every chat request
+        self.merchant_validator = MerchantNameValidator(patterns=MERCHANT_PII_PATTERNS)
+        
         if not HAS_GUARDRAILS:
             # Fallback: use simple validation without guardrails library
             self.guard = None
@@ -252,7 +259,7 @@ class ChatGuardrails:
             - all_valid: True if all merchant names are valid
             - invalid_merchants: List of invalid merchant names
         """
-        validator = MerchantNameValidator(patterns=MERCHANT_PII_PATTERNS)
+        validator = self.merchant_validator
         invalid_merchants = []
         
         for merchant_name in merchant_names:
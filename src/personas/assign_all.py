@@ -36,7 +36,7 @@ def assign_all_users():
     
     # Get all users
     if USE_FIRESTORE:
-        users = get_all_users()
+        users = get_all_users(fields=[])  # IDs only
         # Convert to list of dicts with user_id key
         users = [{"user_id": user["user_id"]} for user in users]
     else:
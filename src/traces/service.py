@@ -1,5 +1,6 @@
 """Trace service for aggregating data from multiple tables into unified trace objects."""
 
+import base64
 import json
 from datetime import datetime
 from typing import Dict, List, Optional, Any
@@ -188,6 +189,190 @@ def _format_feature_trace(row: tuple, columns: List[str]) -> Dict[str, Any]:
     }
 
 
+# Per-source trace metadata: trace_id prefix -> (table, key column, timestamp column, formatter)
+_TRACE_SOURCES = {
+    "chat": ("chat_logs", "id", "created_at", _format_chat_trace),
+    "rec": ("recommendations", "recommendation_id", "shown_at", _format_recommendation_trace),
+    "action": ("operator_actions", "id", "created_at", _format_operator_action_trace),
+    "persona": ("persona_assignments", "id", "assigned_at", _format_persona_trace),
+    "feature": ("computed_features", "id", "computed_at", _format_feature_trace),
+}
+
+
+def _build_trace_index_query(
+    user_id: Optional[str],
+    trace_types: List[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    persona: Optional[str],
+    search_query: Optional[str]
+) -> tuple:
+    """Build a UNION ALL query over all trace sources yielding lightweight index rows.
+    
+    Each row carries (source, source_key, trace_id, ts) so that sorting and
+    pagination happen in SQLite; only the rows on the requested page are
+    hydrated afterwards.
+    
+    Args:
+        user_id: Filter by user ID
+        trace_types: List of trace types to include
+        start_date: Start date for filtering (ISO format)
+        end_date: End date for filtering (ISO format)
+        persona: Filter by persona
+        search_query: Search in trace content
+        
+    Returns:
+        Tuple of (union_sql, params); union_sql is None if no source is selected
+    """
+    parts = []
+    params = []
+    
+    def add_part(source: str, conditions: List[str], condition_params: List[Any]) -> None:
+        table, key, ts, _ = _TRACE_SOURCES[source]
+        if user_id:
+            conditions.insert(0, "user_id = ?")
+            condition_params.insert(0, user_id)
+        if start_date:
+            conditions.append(f"{ts} >= ?")
+            condition_params.append(start_date)
+        if end_date:
+            conditions.append(f"{ts} <= ?")
+            condition_params.append(end_date)
+        where_clause = " AND ".join(conditions) if conditions else "1=1"
+        parts.append(
+            f"SELECT '{source}' AS source, CAST({key} AS TEXT) AS source_key, "
+            f"'{source}_' || {key} AS trace_id, {ts} AS ts "
+            f"FROM {table} WHERE {where_clause}"
+        )
+        params.extend(condition_params)
+    
+    like = f"%{search_query}%" if search_query else None
+    
+    # Chat logs
+    if TRACE_TYPE_CHAT in trace_types:
+        conditions, condition_params = [], []
+        if search_query:
+            conditions.append("(message LIKE ? OR response LIKE ?)")
+            condition_params.extend([like, like])
+        add_part("chat", conditions, condition_params)
+    
+    # Recommendations (persona comes from decision_trace.persona_match)
+    if TRACE_TYPE_RECOMMENDATION in trace_types:
+        conditions, condition_params = [], []
+        if search_query:
+            conditions.append("(title LIKE ? OR rationale LIKE ?)")
+            condition_params.extend([like, like])
+        if persona:
+            conditions.append(
+                "(CASE WHEN json_valid(decision_trace) "
+                "THEN json_extract(decision_trace, '$.persona_match') END) = ?"
+            )
+            condition_params.append(persona)
+        add_part("rec", conditions, condition_params)
+    
+    # Operator actions
+    action_types = []
+    if TRACE_TYPE_OVERRIDE in trace_types:
+        action_types.append("override")
+    if TRACE_TYPE_FLAG in trace_types:
+        action_types.append("flag")
+    if action_types:
+        conditions, condition_params = [], []
+        if search_query:
+            conditions.append("reason LIKE ?")
+            condition_params.append(like)
+        placeholders = ",".join(["?" for _ in action_types])
+        conditions.append(f"action_type IN ({placeholders})")
+        condition_params.extend(action_types)
+        add_part("action", conditions, condition_params)
+    
+    # Persona assignments
+    if TRACE_TYPE_PERSONA in trace_types:
+        conditions, condition_params = [], []
+        if persona:
+            conditions.append("(persona = ? OR primary_persona = ?)")
+            condition_params.extend([persona, persona])
+        add_part("persona", conditions, condition_params)
+    
+    # Computed features
+    if TRACE_TYPE_FEATURES in trace_types:
+        conditions, condition_params = [], []
+        if search_query:
+            conditions.append("signal_type LIKE ?")
+            condition_params.append(like)
+        add_part("feature", conditions, condition_params)
+    
+    if not parts:
+        return None, []
+    return " UNION ALL ".join(parts), params
+
+
+def _hydrate_traces(conn, index_rows: List[Any]) -> List[Dict[str, Any]]:
+    """Load full rows for a page of index rows and format them, preserving order.
+    
+    Args:
+        conn: Open database connection
+        index_rows: Rows of (source, source_key, ...) in page order
+        
+    Returns:
+        List of formatted trace objects
+    """
+    keys_by_source: Dict[str, List[str]] = {}
+    for row in index_rows:
+        keys_by_source.setdefault(row[0], []).append(row[1])
+    
+    formatted = {}
+    for source, keys in keys_by_source.items():
+        table, key, _, formatter = _TRACE_SOURCES[source]
+        placeholders = ",".join(["?" for _ in keys])
+        cursor = conn.execute(f"SELECT * FROM {table} WHERE {key} IN ({placeholders})", keys)
+        columns = [desc[0] for desc in cursor.description]
+        key_index = columns.index(key)
+        for row in cursor.fetchall():
+            formatted[(source, str(row[key_index]))] = formatter(row, columns)
+    
+    return [formatted[(row[0], row[1])] for row in index_rows if (row[0], row[1]) in formatted]
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a trace pagination cursor cannot be decoded."""
+
+
+def encode_trace_cursor(sort_ts: str, trace_id: str) -> str:
+    """Encode a keyset pagination cursor for get_all_traces.
+    
+    Args:
+        sort_ts: Timestamp of the last trace on the page ('' if missing)
+        trace_id: Trace ID of the last trace on the page
+        
+    Returns:
+        Opaque URL-safe cursor string
+    """
+    raw = json.dumps([sort_ts, trace_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_trace_cursor(cursor: str) -> tuple:
+    """Decode a cursor produced by encode_trace_cursor.
+    
+    Args:
+        cursor: Opaque cursor string
+        
+    Returns:
+        Tuple of (sort_ts, trace_id)
+        
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    try:
+        sort_ts, trace_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if not isinstance(sort_ts, str) or not isinstance(trace_id, str):
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return sort_ts, trace_id
+
+
 def get_all_traces(
     user_id: Optional[str] = None,
     trace_types: Optional[List[str]] = None,
@@ -197,10 +382,19 @@ def get_all_traces(
     search_query: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-    db_path: Optional[str] = None
+    db_path: Optional[str] = None,
+    cursor: Optional[str] = None
 ) -> Dict[str, Any]:
     """Get all traces with filtering.
     
+    Sorting, pagination and the total count are computed in a single query
+    (COUNT(*) OVER () on the unioned trace index); only the returned page is
+    then loaded from the source tables.
+    
+    Pass the previous page's `next_cursor` as `cursor` for keyset pagination,
+    which costs O(limit) per page regardless of depth. `offset` is kept as a
+    deprecated fallback and is ignored when a cursor is given.
+    
     Args:
         user_id: Filter by user ID
         trace_types: List of trace types to include
@@ -209,166 +403,77 @@ def get_all_traces(
         persona: Filter by persona
         search_query: Search in trace content
         limit: Maximum number of traces to return
-        offset: Offset for pagination
+        offset: Offset for pagination (deprecated, use cursor)
         db_path: Path to SQLite database
+        cursor: Keyset cursor from a previous page's next_cursor
         
     Returns:
         Dictionary with traces and metadata
+        
+    Raises:
+        InvalidCursorError: If cursor is malformed
     """
     if trace_types is None:
         trace_types = ALL_TRACE_TYPES
     
+    keyset = decode_trace_cursor(cursor) if cursor else None
+    if keyset:
+        offset = 0
+    
     traces = []
+    total = 0
+    has_more = False
+    next_cursor = None
     
-    try:
-        with get_db_connection(db_path) as conn:
-            # Get chat logs
-            if TRACE_TYPE_CHAT in trace_types:
-                chat_query = "SELECT * FROM chat_logs WHERE 1=1"
-                params = []
-                
-                if user_id:
-                    chat_query += " AND user_id = ?"
-                    params.append(user_id)
-                if start_date:
-                    chat_query += " AND created_at >= ?"
-                    params.append(start_date)
-                if end_date:
-                    chat_query += " AND created_at <= ?"
-                    params.append(end_date)
-                if search_query:
-                    chat_query += " AND (message LIKE ? OR response LIKE ?)"
-                    params.extend([f"%{search_query}%", f"%{search_query}%"])
-                
-                cursor = conn.execute(chat_query, params)
-                columns = [desc[0] for desc in cursor.description]
-                for row in cursor.fetchall():
-                    traces.append(_format_chat_trace(row, columns))
-            
-            # Get recommendations
-            if TRACE_TYPE_RECOMMENDATION in trace_types:
-                rec_query = "SELECT * FROM recommendations WHERE 1=1"
-                params = []
-                
-                if user_id:
-                    rec_query += " AND user_id = ?"
-                    params.append(user_id)
-                if start_date:
-                    rec_query += " AND shown_at >= ?"
-                    params.append(start_date)
-                if end_date:
-                    rec_query += " AND shown_at <= ?"
-                    params.append(end_date)
-                if search_query:
-                    rec_query += " AND (title LIKE ? OR rationale LIKE ?)"
-                    params.extend([f"%{search_query}%", f"%{search_query}%"])
-                
-                cursor = conn.execute(rec_query, params)
-                columns = [desc[0] for desc in cursor.description]
-                for row in cursor.fetchall():
-                    trace = _format_recommendation_trace(row, columns)
-                    if persona and trace["persona"] != persona:
-                        continue
-                    traces.append(trace)
-            
-            # Get operator actions
-            if TRACE_TYPE_OVERRIDE in trace_types or TRACE_TYPE_FLAG in trace_types:
-                action_query = "SELECT * FROM operator_actions WHERE 1=1"
-                params = []
-                
-                if user_id:
-                    action_query += " AND user_id = ?"
-                    params.append(user_id)
-                if start_date:
-                    action_query += " AND created_at >= ?"
-                    params.append(start_date)
-                if end_date:
-                    action_query += " AND created_at <= ?"
-                    params.append(end_date)
-                if search_query:
-                    action_query += " AND reason LIKE ?"
-                    params.append(f"%{search_query}%")
-                
-                # Filter by action type
-                action_types = []
-                if TRACE_TYPE_OVERRIDE in trace_types:
-                    action_types.append("override")
-                if TRACE_TYPE_FLAG in trace_types:
-                    action_types.append("flag")
-                
-                if action_types:
-                    placeholders = ",".join(["?" for _ in action_types])
-                    action_query += f" AND action_type IN ({placeholders})"
-                    params.extend(action_types)
-                
-                cursor = conn.execute(action_query, params)
-                columns = [desc[0] for desc in cursor.description]
-                for row in cursor.fetchall():
-                    traces.append(_format_operator_action_trace(row, columns))
-            
-            # Get persona assignments
-            if TRACE_TYPE_PERSONA in trace_types:
-                persona_query = "SELECT * FROM persona_assignments WHERE 1=1"
-                params = []
+    union_sql, params = _build_trace_index_query(
+        user_id, trace_types, start_date, end_date, persona, search_query
+    )
+    
+    if union_sql:
+        try:
+            with get_db_connection(db_path) as conn:
+                # Total is counted over the full filtered set before the keyset
+                # predicate is applied; one extra row is fetched for has_more
+                keyset_clause = "WHERE (sort_ts, trace_id) < (?, ?)" if keyset else ""
+                page_query = f"""
+                    SELECT source, source_key, trace_id, sort_ts, _total
+                    FROM (
+                        SELECT source, source_key, trace_id, COALESCE(ts, '') AS sort_ts,
+                               COUNT(*) OVER () AS _total
+                        FROM ({union_sql})
+                    )
+                    {keyset_clause}
+                    ORDER BY sort_ts DESC, trace_id DESC
+                    LIMIT ? OFFSET ?
+                """
+                page_params = params + (list(keyset) if keyset else []) + [limit + 1, offset]
+                index_rows = conn.execute(page_query, page_params).fetchall()
                 
-                if user_id:
-                    persona_query += " AND user_id = ?"
-                    params.append(user_id)
-                if start_date:
-                    persona_query += " AND assigned_at >= ?"
-                    params.append(start_date)
-                if end_date:
-                    persona_query += " AND assigned_at <= ?"
-                    params.append(end_date)
-                if persona:
-                    persona_query += " AND (persona = ? OR primary_persona = ?)"
-                    params.extend([persona, persona])
+                if index_rows:
+                    total = index_rows[0][4]
+                elif offset > 0 or keyset:
+                    # Page is past the end; the window count is unavailable
+                    total = conn.execute(f"SELECT COUNT(*) FROM ({union_sql})", params).fetchone()[0]
                 
-                cursor = conn.execute(persona_query, params)
-                columns = [desc[0] for desc in cursor.description]
-                for row in cursor.fetchall():
-                    traces.append(_format_persona_trace(row, columns))
-            
-            # Get computed features
-            if TRACE_TYPE_FEATURES in trace_types:
-                feature_query = "SELECT * FROM computed_features WHERE 1=1"
-                params = []
+                has_more = len(index_rows) > limit
+                index_rows = index_rows[:limit]
+                if has_more:
+                    last = index_rows[-1]
+                    next_cursor = encode_trace_cursor(last[3], last[2])
                 
-                if user_id:
-                    feature_query += " AND user_id = ?"
-                    params.append(user_id)
-                if start_date:
-                    feature_query += " AND computed_at >= ?"
-                    params.append(start_date)
-                if end_date:
-                    feature_query += " AND computed_at <= ?"
-                    params.append(end_date)
-                if search_query:
-                    feature_query += " AND signal_type LIKE ?"
-                    params.append(f"%{search_query}%")
-                
-                cursor = conn.execute(feature_query, params)
-                columns = [desc[0] for desc in cursor.description]
-                for row in cursor.fetchall():
-                    traces.append(_format_feature_trace(row, columns))
-    
-    except Exception as e:
-        logger.error(f"Error fetching traces: {e}")
-        raise
-    
-    # Sort by timestamp (most recent first)
-    traces.sort(key=lambda x: x["timestamp"] or "", reverse=True)
-    
-    # Apply pagination
-    total = len(traces)
-    traces = traces[offset:offset + limit]
+                traces = _hydrate_traces(conn, index_rows)
+        
+        except Exception as e:
+            logger.error(f"Error fetching traces: {e}")
+            raise
     
     return {
         "traces": traces,
         "total": total,
         "limit": limit,
         "offset": offset,
-        "has_more": offset + len(traces) < total
+        "has_more": has_more,
+        "next_cursor": next_cursor
     }
 
 
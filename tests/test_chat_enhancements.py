@@ -5,6 +5,8 @@ from datetime import datetime, timedelta
 from unittest.mock import Mock, patch, MagicMock
 
 from src.chat.transaction_analysis import (
+    AnalysisContext,
+    analyze_transactions,
     calculate_weekday_spending,
     calculate_monthly_progression,
     calculate_spending_velocity,
@@ -12,7 +14,8 @@ from src.chat.transaction_analysis import (
     analyze_merchant_patterns,
     analyze_payment_channels,
     analyze_by_account,
-    analyze_pending_transactions
+    analyze_pending_transactions,
+    build_account_lookup
 )
 from src.guardrails.data_sanitizer import DataSanitizer
 from src.guardrails.guardrails_ai import MerchantNameValidator, ChatGuardrails
@@ -260,6 +263,97 @@ class TestPendingTransactions:
         assert result['pending_deposits'] == 0
 
 
+class TestFusedAnalysis:
+    """Tests for the single-pass transaction analysis."""
+    
+    def test_expected_results(self):
+        """Test every analysis in the fused pass against hand-checked values."""
+        transactions = [
+            {'account_id': 'acc_001', 'date': '2024-12-16', 'amount': -50.0, 'merchant_name': 'Amazon',
+             'category': ['Shopping', 'Online'], 'pending': False, 'payment_channel': 'online'},
+            {'account_id': 'acc_001', 'date': '2024-12-14', 'amount': -25.0, 'merchant_name': 'Starbucks',
+             'category': ['Food and Drink', 'Cafe'], 'pending': False, 'payment_channel': 'in store'},
+            {'account_id': 'acc_002', 'date': '2024-12-03', 'amount': -100.0, 'merchant_name': 'Target',
+             'category': ['Shopping', 'General'], 'pending': True, 'payment_channel': 'in store'},
+            {'account_id': 'acc_001', 'date': '2024-12-01', 'amount': 1000.0, 'merchant_name': 'Payroll',
+             'category': ['Transfer', 'Deposit'], 'pending': False, 'payment_channel': 'other'},
+        ]
+        context = AnalysisContext.create(window_days=30, now=datetime(2024, 12, 20, 12, 0))
+        
+        analysis = analyze_transactions(transactions, SAMPLE_ACCOUNTS, context=context)
+        
+        # Dec 16 is a Monday, Dec 14 a Saturday and Dec 3 a Tuesday
+        assert analysis.weekday_spending == {
+            'weekday_avg': 75.0, 'weekend_avg': 25.0,
+            'weekday_total': 150.0, 'weekend_total': 25.0,
+            'weekday_count': 2, 'weekend_count': 1,
+            'highest_day': 'Tuesday', 'highest_day_total': 100.0,
+        }
+        assert analysis.monthly_progression == {
+            'spent_mtd': 175.0, 'transaction_count_mtd': 3,
+            'days_elapsed': 20, 'days_remaining': 11,
+            'daily_avg': 8.75, 'projected_monthly': 271.25,
+            'current_month': 'December 2024',
+        }
+        assert analysis.spending_velocity == {
+            'first_half_spending': 100.0, 'second_half_spending': 75.0,
+            'change_pct': -25.0, 'trend': 'decreasing',
+        }
+        assert analysis.category_breakdown == [
+            {'category': 'Shopping', 'amount': 150.0, 'transaction_count': 2,
+             'avg_transaction': 75.0, 'percentage': 85.7},
+            {'category': 'Food and Drink', 'amount': 25.0, 'transaction_count': 1,
+             'avg_transaction': 25.0, 'percentage': 14.3},
+        ]
+        assert analysis.payment_channels == {
+            'in store': {'amount': 125.0, 'count': 2},
+            'online': {'amount': 50.0, 'count': 1},
+        }
+        assert analysis.account_activity == {
+            'acc_001': {'mask': '1234', 'type': 'depository', 'subtype': 'checking',
+                        'total_spent': 75.0, 'total_income': 1000.0, 'transaction_count': 3},
+            'acc_002': {'mask': '5678', 'type': 'credit', 'subtype': 'credit card',
+                        'total_spent': 100.0, 'total_income': 0, 'transaction_count': 1},
+        }
+        assert analysis.pending == {
+            'count': 1, 'pending_charges': 100.0,
+            'pending_deposits': 0, 'net_pending': -100.0,
+        }
+    
+    def test_totals(self):
+        """Test spending totals skip income and pending counts include it."""
+        analysis = analyze_transactions(SAMPLE_TRANSACTIONS, SAMPLE_ACCOUNTS)
+        
+        assert sum(c['amount'] for c in analysis.category_breakdown) == 175.0
+        assert analysis.account_activity['acc_001']['total_income'] == 1000.0
+        assert analysis.pending['count'] == 1
+    
+    def test_fixed_context(self):
+        """Test month-to-date and velocity use the supplied context."""
+        context = AnalysisContext.create(window_days=30, now=datetime(2024, 12, 20, 12, 0))
+        transactions = [
+            {'amount': -10.0, 'date': '2024-12-01'},
+            {'amount': -20.0, 'date': '2024-12-05'},
+            {'amount': -30.0, 'date': '2024-11-30'},
+        ]
+        
+        analysis = analyze_transactions(transactions, context=context)
+        
+        assert context.days_in_month == 31
+        assert context.velocity_cutoff == datetime(2024, 12, 6).date()
+        assert analysis.monthly_progression['spent_mtd'] == 30.0
+        assert analysis.monthly_progression['days_remaining'] == 11
+        assert analysis.spending_velocity['first_half_spending'] == 60.0
+    
+    def test_prebuilt_account_lookup(self):
+        """Test a prebuilt account lookup gives the same account activity."""
+        lookup = build_account_lookup(SAMPLE_ACCOUNTS)
+        
+        result = analyze_by_account(SAMPLE_TRANSACTIONS, [], account_lookup=lookup)
+        
+        assert result == analyze_by_account(SAMPLE_TRANSACTIONS, SAMPLE_ACCOUNTS)
+
+
 class TestDataSanitizer:
     """Tests for enhanced data sanitization features."""
     
@@ -327,6 +421,19 @@ class TestDataSanitizer:
         assert len(result) < len(many_transactions)
         assert len(result) >= 10  # Should keep at least 10
     
+    def test_fit_context_to_budget_matches_full_estimate(self):
+        """Test cached-size estimates match full re-serialization."""
+        user_features = {'subscriptions': {'monthly_recurring': 100.0}}
+        many_transactions = [dict(SAMPLE_TRANSACTIONS[0], transaction_id=f"txn_{i}") for i in range(100)]
+        
+        reduced, before, after = self.sanitizer.fit_context_to_budget(
+            user_features, many_transactions, target_tokens=500
+        )
+        
+        assert before == self.sanitizer.estimate_context_tokens(user_features, many_transactions)
+        assert after == self.sanitizer.estimate_context_tokens(user_features, reduced)
+        assert len(reduced) < len(many_transactions)
+    
     def test_bucket_transaction_amounts(self):
         """Test amount bucketing functionality."""
         # Test with bucketing enabled
@@ -447,6 +554,78 @@ class TestChatAPIIntegration:
         assert request.transaction_window_days == 30
 
 
+
+class TestExtractCitations:
+    """Tests for citation extraction."""
+    
+    def test_overlapping_values_are_all_cited(self):
+        """Test a value hidden inside a longer matched value is still cited."""
+        from src.chat.service import extract_citations
+        
+        user_features = {
+            'credit_utilization': {'accounts': [{'account_mask': '9999', 'utilization': 0.05}]},
+            'subscriptions': {'monthly_recurring': 15.0},
+        }
+        
+        citations = extract_citations("You spend 15.0 each month", user_features, [])
+        
+        assert [c.data_point for c in citations] == ["Account ending in 9999", "Recurring subscriptions"]
+    
+    def test_citations_use_sanitized_context(self):
+        """Test citations match the masked values the model actually saw."""
+        from src.chat.service import _finalize_response
+        from src.guardrails.data_sanitizer import get_sanitizer
+        
+        user_features = {
+            'credit_utilization': {'accounts': [{'account_mask': '4111111111114321', 'utilization': 0.42}]},
+        }
+        sanitized_context = get_sanitizer().sanitize_financial_context(user_features, [])
+        
+        result = _finalize_response("Your card ending in 4321 is well used.", sanitized_context)
+        
+        assert [c['data_point'] for c in result['citations']] == ["Account ending in 4321"]
+    
+    def test_no_matches(self):
+        """Test no citations when no values appear in the response."""
+        from src.chat.service import extract_citations
+        
+        user_features = {'subscriptions': {'monthly_recurring': 15.0}}
+        
+        assert extract_citations("Nothing relevant here", user_features, []) == []
+
+
+class TestFeatureSummary:
+    """Tests for typed feature views used by chat context building."""
+    
+    def test_from_features_round_trip(self):
+        """Test the summary reads features column-wise and converts back."""
+        from src.chat.features import FeatureSummary
+        
+        user_features = {
+            'credit_utilization': {'accounts': [
+                {'account_mask': '1234', 'utilization': 0.5, 'balance': 500.0, 'limit': 1000.0},
+                {'account_mask': '5678', 'utilization': 0.1, 'balance': 100.0, 'limit': 1000.0},
+            ]},
+            'savings_behavior': {'avg_monthly_income': 4000.0, 'avg_monthly_expenses': 3000.0},
+        }
+        
+        summary = FeatureSummary.from_features(user_features)
+        
+        assert summary.credit_accounts.masks == ('1234', '5678')
+        assert summary.credit_accounts.utilizations == (0.5, 0.1)
+        assert summary.subscriptions is None
+        assert summary.savings.savings_rate == 25.0
+        assert summary.as_dict() == user_features
+    
+    def test_no_income_has_no_savings_rate(self):
+        """Test savings rate is undefined without income."""
+        from src.chat.features import FeatureSummary
+        
+        summary = FeatureSummary.from_features({'savings_behavior': {'avg_monthly_expenses': 100.0}})
+        
+        assert summary.savings.savings_rate is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
 
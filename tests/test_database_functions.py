@@ -1,6 +1,8 @@
 """Tests for database functions: operator actions and consent tracking."""
 
 import pytest
+import sqlite3
+from contextlib import closing
 from datetime import datetime
 from unittest.mock import patch, MagicMock
 
@@ -146,3 +148,239 @@ class TestConsentTracking:
         
         mock_conn.return_value.__enter__.return_value.execute.assert_called_once()
 
+
+
+class TestConnectionReuse:
+    """Tests for per-thread connection reuse in get_db_connection."""
+    
+    def test_reuses_connection_within_thread(self, tmp_path):
+        """Test that consecutive blocks share one connection."""
+        path = str(tmp_path / "reuse.db")
+        with get_db_connection(path) as first:
+            first.execute("CREATE TABLE t (x INTEGER)")
+        with get_db_connection(path) as second:
+            second.execute("INSERT INTO t VALUES (1)")
+        
+        assert first is second
+        db.close_all()
+    
+    def test_nested_block_rolls_back_with_outer(self, tmp_path):
+        """Test that nested blocks share the outer transaction."""
+        path = str(tmp_path / "nested.db")
+        with get_db_connection(path) as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+        
+        with pytest.raises(RuntimeError):
+            with get_db_connection(path) as conn:
+                with get_db_connection(path) as inner:
+                    inner.execute("INSERT INTO t VALUES (1)")
+                raise RuntimeError("boom")
+        
+        with get_db_connection(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+        db.close_all()
+    
+    def test_reopens_after_file_replaced(self, tmp_path):
+        """Test that a deleted database file is not served from a stale connection."""
+        db_file = tmp_path / "replaced.db"
+        with get_db_connection(str(db_file)) as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+        db_file.unlink()
+        
+        with get_db_connection(str(db_file)) as conn:
+            tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
+        
+        assert tables == []
+        db.close_all()
+    
+    def test_close_all_forces_new_connection(self, tmp_path):
+        """Test that close_all closes pooled connections."""
+        path = str(tmp_path / "closed.db")
+        with get_db_connection(path) as first:
+            pass
+        db.close_all()
+        with get_db_connection(path) as second:
+            second.execute("SELECT 1")
+        
+        assert first is not second
+        db.close_all()
+
+
+class TestMigrations:
+    """Tests for schema migrations."""
+    
+    def test_adds_missing_columns_and_records_version(self, tmp_path):
+        """Test that migrations add columns to an old table and record the version."""
+        path = str(tmp_path / "old.db")
+        with get_db_connection(path) as conn:
+            conn.execute("CREATE TABLE transactions (transaction_id TEXT PRIMARY KEY, amount REAL)")
+            conn.execute("INSERT INTO transactions VALUES ('t1', -5.0)")
+        
+        db.run_migrations(path)
+        
+        with get_db_connection(path) as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+            currency = conn.execute("SELECT iso_currency_code FROM transactions").fetchone()[0]
+            version = db._schema_version(conn)
+        assert {"payment_channel", "authorized_date", "location_lat"} <= columns
+        assert currency == "USD"
+        assert version == db.SCHEMA_VERSION
+        db.close_all()
+    
+    def test_skips_when_version_current(self, tmp_path):
+        """Test that a recorded version short-circuits the column checks."""
+        path = str(tmp_path / "current.db")
+        db.init_schema(path)
+        with get_db_connection(path) as conn:
+            conn.execute("DROP TABLE transactions")
+            conn.execute("CREATE TABLE transactions (transaction_id TEXT PRIMARY KEY)")
+        
+        db.run_migrations(path)
+        
+        with get_db_connection(path) as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(transactions)")}
+        assert columns == {"transaction_id"}
+        db.close_all()
+
+
+class TestStreamQuery:
+    """Tests for streaming query results."""
+    
+    def test_yields_rows_and_releases_connection(self, tmp_path):
+        """Test rows are yielded lazily and an abandoned stream is released."""
+        path = str(tmp_path / "stream.db")
+        with get_db_connection(path) as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+        
+        assert [row["x"] for row in db.stream_query("SELECT x FROM t ORDER BY x", db_path=path)] == [0, 1, 2, 3, 4]
+        
+        stream = db.stream_query("SELECT x FROM t ORDER BY x", db_path=path)
+        assert next(stream)["x"] == 0
+        stream.close()
+        
+        with get_db_connection(path) as conn:
+            conn.execute("INSERT INTO t VALUES (5)")
+        assert db.fetch_one("SELECT COUNT(*) FROM t", db_path=path)[0] == 6
+        db.close_all()
+    
+    def test_closed_stream_lets_later_writes_commit(self, tmp_path):
+        """Test a stream closed early does not hold back later commits."""
+        path = str(tmp_path / "stream_closed.db")
+        with get_db_connection(path) as conn:
+            conn.execute("CREATE TABLE t (x INTEGER)")
+            conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(5)])
+        
+        with closing(db.stream_query("SELECT x FROM t ORDER BY x", db_path=path)) as rows:
+            for row in rows:
+                break
+        
+        with get_db_connection(path) as conn:
+            conn.execute("INSERT INTO t VALUES (5)")
+        other = sqlite3.connect(path)
+        try:
+            assert other.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 6
+        finally:
+            other.close()
+        db.close_all()
+    
+    def test_fetch_all_as_dicts_matches_rows(self, tmp_path):
+        """Test fetch_all(as_dicts=True) gives the same data as dict(row)."""
+        path = str(tmp_path / "dicts.db")
+        with get_db_connection(path) as conn:
+            conn.execute("CREATE TABLE t (x INTEGER, y TEXT)")
+            conn.executemany("INSERT INTO t VALUES (?, ?)", [(1, "a"), (2, None)])
+        
+        rows = db.fetch_all("SELECT x, y FROM t ORDER BY x", db_path=path)
+        dicts = db.fetch_all("SELECT x, y FROM t ORDER BY x", db_path=path, as_dicts=True)
+        
+        assert dicts == [dict(row) for row in rows]
+        assert isinstance(db.fetch_one("SELECT x FROM t", db_path=path), sqlite3.Row)
+        db.close_all()
+
+
+class TestAuditTrailIndexes:
+    """Tests that filtered audit trail reads use composite indexes."""
+    
+    @pytest.mark.parametrize("query, params, index", [
+        (
+            "SELECT * FROM operator_actions WHERE user_id = ? ORDER BY created_at DESC",
+            ("user_123",),
+            "idx_operator_actions_user_created",
+        ),
+        (
+            "SELECT * FROM operator_actions WHERE action_type = ? ORDER BY created_at DESC",
+            ("flag",),
+            "idx_operator_actions_type_created",
+        ),
+        (
+            "SELECT * FROM recommendations WHERE user_id = ? AND shown_at >= ? ORDER BY shown_at DESC",
+            ("user_123", "2024-01-01"),
+            "idx_recommendations_user_shown",
+        ),
+    ])
+    def test_query_plan_uses_index_without_sort(self, tmp_path, query, params, index):
+        """Test the query searches the composite index and needs no temp sort."""
+        path = str(tmp_path / "plan.db")
+        db.init_schema(path)
+        
+        with get_db_connection(path) as conn:
+            plan = " ".join(row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {query}", params))
+        
+        assert index in plan
+        assert "TEMP B-TREE" not in plan
+        db.close_all()
+
+
+class TestTimelineEvents:
+    """Tests for the combined timeline query."""
+    
+    def test_collects_each_table_with_date_filter(self, tmp_path):
+        """Test timeline events come from every table and honor the date range."""
+        path = str(tmp_path / "timeline.db")
+        db.init_schema(path)
+        with get_db_connection(path) as conn:
+            conn.execute(
+                "INSERT INTO chat_logs (user_id, message, response, created_at) VALUES (?, ?, ?, ?)",
+                ("user_123", "hi", "hello", "2024-03-01T00:00:00")
+            )
+            conn.executemany(
+                "INSERT INTO operator_actions (operator_id, user_id, action_type, created_at) VALUES (?, ?, ?, ?)",
+                [("op", "user_123", "flag", "2024-03-02T00:00:00"), ("op", "user_123", "flag", "2023-01-01T00:00:00")]
+            )
+        
+        events = db.get_timeline_events("user_123", start_date="2024-01-01", db_path=path)
+        
+        assert set(events) == {"chat_logs", "recommendations", "operator_actions"}
+        assert len(events["chat_logs"]) == 1
+        assert events["recommendations"] == []
+        assert [a["created_at"] for a in events["operator_actions"]] == ["2024-03-02T00:00:00"]
+        db.close_all()
+
+
+class TestAuditTrailPaging:
+    """Tests for keyset pagination of audit trail reads."""
+    
+    def test_keyset_pages_cover_all_rows(self, tmp_path):
+        """Test keyset pages walk every row once, including created_at ties."""
+        path = str(tmp_path / "keyset.db")
+        db.init_schema(path)
+        with get_db_connection(path) as conn:
+            conn.executemany(
+                "INSERT INTO operator_actions (operator_id, user_id, action_type, created_at) VALUES (?, ?, ?, ?)",
+                [("op", "user_123", "flag", f"2024-03-0{i // 2 + 1}T00:00:00") for i in range(7)]
+            )
+        
+        seen = []
+        page = db.get_operator_actions(user_id="user_123", limit=3, db_path=path)
+        while page:
+            seen.extend(action["id"] for action in page)
+            last = page[-1]
+            page = db.get_operator_actions(
+                user_id="user_123", limit=3,
+                after_created_at=last["created_at"], after_id=last["id"], db_path=path
+            )
+        
+        assert sorted(seen) == list(range(1, 8))
+        assert len(seen) == 7
+        db.close_all()
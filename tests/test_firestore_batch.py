@@ -0,0 +1,58 @@
+"""Tests for the Firestore batch write helpers."""
+
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.database import firestore as fs
+
+
+class FakeBulkWriter:
+    """Stand-in for a Firestore BulkWriter."""
+
+    def __init__(self, fail_refs=()):
+        self.written = []
+        self.closed = False
+        self.fail_refs = set(fail_refs)
+        self.error_callback = None
+
+    def on_write_error(self, callback):
+        self.error_callback = callback
+
+    def set(self, ref, data):
+        self.written.append((ref, data))
+        if ref in self.fail_refs:
+            failure = MagicMock(attempts=0, message='ABORTED')
+            while self.error_callback(failure, self):
+                failure.attempts += 1
+
+    def close(self):
+        self.closed = True
+
+
+class TestBatchWrites:
+    """Tests for the store_*_batch functions."""
+
+    def test_store_feature_batch_uses_bulk_writer(self):
+        bulk_writer = FakeBulkWriter()
+        client = MagicMock()
+        client.bulk_writer.return_value = bulk_writer
+        features = [
+            {'user_id': 'user_1', 'signal_type': 'credit', 'signal_data': {}, 'time_window': '30d'}
+        ] * 120
+        with patch.object(fs, 'get_db', return_value=client):
+            assert fs.store_feature_batch(features) == 120
+        assert len(bulk_writer.written) == 120
+        assert bulk_writer.written[0][1]['signal_type'] == 'credit'
+        assert bulk_writer.closed
+
+    def test_failed_writes_raise_after_retries(self):
+        client = MagicMock()
+        ref = MagicMock()
+        bulk_writer = FakeBulkWriter(fail_refs=[ref])
+        client.bulk_writer.return_value = bulk_writer
+        client.collection.return_value.document.return_value.collection.return_value.document.return_value = ref
+        with patch.object(fs, 'get_db', return_value=client):
+            with pytest.raises(RuntimeError, match='1 of 1 bulk writes failed'):
+                fs.store_persona_batch([{'user_id': 'user_1', 'persona': 'saver'}])
+        assert bulk_writer.closed
@@ -0,0 +1,132 @@
+"""Tests for Firestore reads, the read cache and the emulator port probe."""
+
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.database import firestore as fs
+
+
+@pytest.fixture
+def client():
+    """Firestore client mock whose user document exists."""
+    fs._read_cache.clear()
+    client = MagicMock()
+    user_doc = client.collection.return_value.document.return_value.get.return_value
+    user_doc.exists = True
+    user_doc.id = 'user_1'
+    user_doc.to_dict.return_value = {'name': 'Test User'}
+    with patch.object(fs, 'get_db', return_value=client):
+        yield client
+    fs._read_cache.clear()
+
+
+class TestReadCache:
+    """Tests for the TTL cache on single-user reads."""
+
+    def test_repeat_read_is_cached(self, client):
+        assert fs.get_user('user_1') == {'user_id': 'user_1', 'name': 'Test User'}
+        assert fs.get_user('user_1') == {'user_id': 'user_1', 'name': 'Test User'}
+        assert client.collection.return_value.document.return_value.get.call_count == 1
+
+    def test_result_mutation_does_not_change_cache(self, client):
+        fs.get_user('user_1')['name'] = 'Changed'
+        assert fs.get_user('user_1')['name'] == 'Test User'
+
+    def test_write_invalidates_user(self, client):
+        fs.get_user('user_1')
+        fs.store_user({'user_id': 'user_1', 'name': 'Renamed'})
+        fs.get_user('user_1')
+        assert client.collection.return_value.document.return_value.get.call_count == 2
+
+    def test_entries_expire(self, client):
+        with patch.object(fs.time, 'monotonic', return_value=0.0):
+            fs.get_user('user_1')
+        with patch.object(fs.time, 'monotonic', return_value=fs._READ_CACHE_TTL + 1):
+            fs.get_user('user_1')
+        assert client.collection.return_value.document.return_value.get.call_count == 2
+
+    def test_projection_and_paging_options_are_cached(self, client):
+        subcol = client.collection.return_value.document.return_value.collection.return_value
+        ordered = subcol.order_by.return_value
+        rec_doc = MagicMock()
+        rec_doc.to_dict.return_value = {'title': 'Build an emergency fund'}
+        ordered.select.return_value.stream.return_value = [rec_doc]
+        ordered.start_after.return_value.stream.return_value = []
+
+        assert fs.get_recommendations('user_1', fields=['title']) == [{'title': 'Build an emergency fund'}]
+        assert fs.get_recommendations('user_1', fields=['title']) == [{'title': 'Build an emergency fund'}]
+        assert ordered.select.return_value.stream.call_count == 1
+
+        assert fs.get_persona_assignments('user_1', start_after={'assigned_at': 'x'}) == []
+        assert fs.get_persona_assignments('user_1', start_after={'assigned_at': 'x'}) == []
+        assert ordered.start_after.return_value.stream.call_count == 1
+
+    def test_unhashable_arguments_bypass_cache(self, client):
+        ordered = client.collection.return_value.document.return_value.collection.return_value.order_by.return_value
+        ordered.start_after.return_value.stream.return_value = []
+        start_after = {'assigned_at': {'nested': set()}}
+        fs.get_persona_assignments('user_1', start_after=start_after)
+        fs.get_persona_assignments('user_1', start_after=start_after)
+        assert ordered.start_after.return_value.stream.call_count == 2
+
+
+class TestFeatureReads:
+    """Tests for de-duplication of legacy feature documents."""
+
+    def _feature_doc(self, user_id, signal_type, day):
+        doc = MagicMock()
+        doc.to_dict.return_value = {
+            'signal_type': signal_type,
+            'signal_data': {'day': day},
+            'time_window': '30d',
+            'computed_at': datetime(2024, 1, day, tzinfo=timezone.utc),
+        }
+        doc.reference.parent.parent.id = user_id
+        return doc
+
+    def test_user_features_keep_latest_copy(self, client):
+        subcol = client.collection.return_value.document.return_value.collection.return_value
+        subcol.where.return_value.stream.return_value = [
+            self._feature_doc('user_1', 'credit', 1),
+            self._feature_doc('user_1', 'income', 1),
+            self._feature_doc('user_1', 'credit', 2),
+        ]
+        features = fs.get_user_features('user_1', '30d')
+        assert [(f['signal_type'], f['signal_data']) for f in features] == [
+            ('credit', {'day': 2}),
+            ('income', {'day': 1}),
+        ]
+
+    def test_all_features_deduplicate_per_user(self, client):
+        client.collection_group.return_value.stream.return_value = [
+            self._feature_doc('user_1', 'credit', 3),
+            self._feature_doc('user_2', 'credit', 1),
+            self._feature_doc('user_1', 'credit', 2),
+        ]
+        features = fs.get_all_features()
+        assert [(f['user_id'], f['signal_data']) for f in features] == [
+            ('user_1', {'day': 3}),
+            ('user_2', {'day': 1}),
+        ]
+
+
+class TestPortProbe:
+    """Tests for caching of the emulator port probe."""
+
+    def test_closed_port_is_reprobed_after_interval(self):
+        fs._closed_ports.clear()
+        fs._open_ports.clear()
+        with patch.object(fs, '_probe_port', side_effect=[False, True]) as probe, \
+                patch.object(fs.time, 'monotonic', return_value=0.0):
+            assert fs.is_port_open('127.0.0.1', 8080) is False
+            assert fs.is_port_open('127.0.0.1', 8080) is False
+            assert probe.call_count == 1
+        with patch.object(fs, '_probe_port', side_effect=[True]) as probe, \
+                patch.object(fs.time, 'monotonic', return_value=fs._PORT_PROBE_RETRY_INTERVAL + 1):
+            assert fs.is_port_open('127.0.0.1', 8080) is True
+            assert fs.is_port_open('127.0.0.1', 8080) is True
+            assert probe.call_count == 1
+        fs._closed_ports.clear()
+        fs._open_ports.clear()
@@ -0,0 +1,80 @@
+"""Tests for single-flight request coalescing."""
+
+import asyncio
+
+import pytest
+
+from src.api.single_flight import SingleFlight, make_key
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight coalescer."""
+    
+    def test_returns_result(self):
+        """Test a single call returns the function result."""
+        flight = SingleFlight()
+        
+        async def work():
+            return 42
+        
+        assert asyncio.run(flight.do_async("key", work)) == 42
+        assert not flight.in_flight("key")
+    
+    def test_exception_propagates_and_releases_key(self):
+        """Test errors propagate and the key is released for later calls."""
+        flight = SingleFlight()
+        
+        async def fail():
+            raise RuntimeError("boom")
+        
+        async def ok():
+            return "ok"
+        
+        with pytest.raises(RuntimeError):
+            asyncio.run(flight.do_async("key", fail))
+        
+        assert not flight.in_flight("key")
+        assert asyncio.run(flight.do_async("key", ok)) == "ok"
+    
+    def test_sequential_calls_run_fresh(self):
+        """Test calls after completion are not coalesced."""
+        flight = SingleFlight()
+        counter = iter(range(10))
+        
+        async def work():
+            return next(counter)
+        
+        async def run():
+            return [await flight.do_async("key", work), await flight.do_async("key", work)]
+        
+        assert asyncio.run(run()) == [0, 1]
+    
+    def test_async_concurrent_calls_share_result(self):
+        """Test concurrent async calls with the same key run the work once."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "response"
+        
+        async def run():
+            return await asyncio.gather(*(flight.do_async("key", work) for _ in range(3)))
+        
+        assert asyncio.run(run()) == ["response"] * 3
+        assert len(calls) == 1
+        assert not flight.in_flight("key")
+
+
+class TestMakeKey:
+    """Tests for coalescing key construction."""
+    
+    def test_same_parts_same_key(self):
+        """Test identical parts produce identical keys."""
+        assert make_key("user_1", "hello", 30) == make_key("user_1", "hello", 30)
+    
+    def test_different_parts_different_key(self):
+        """Test parts are not ambiguous when concatenated."""
+        assert make_key("user_1", "hello") != make_key("user_1", "hello!")
+        assert make_key("ab", "c") != make_key("a", "bc")
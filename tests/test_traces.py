@@ -14,7 +14,10 @@ from src.traces.service import (
     TRACE_TYPE_OVERRIDE,
     TRACE_TYPE_FLAG,
     TRACE_TYPE_PERSONA,
-    TRACE_TYPE_FEATURES
+    TRACE_TYPE_FEATURES,
+    InvalidCursorError,
+    decode_trace_cursor,
+    encode_trace_cursor
 )
 from src.database.db import get_all_chat_logs, get_recommendation_traces, get_timeline_events
 import json
@@ -303,6 +306,16 @@ def test_trace_formatting():
         return False
 
 
+def test_invalid_cursor():
+    """Malformed cursors raise InvalidCursorError; valid ones round-trip."""
+    import pytest
+    
+    assert decode_trace_cursor(encode_trace_cursor("2024-01-01T00:00:00", "chat_1")) == ("2024-01-01T00:00:00", "chat_1")
+    for bad in ("not-a-cursor", encode_trace_cursor("x", "y")[:-4], "WzEsIDJd"):
+        with pytest.raises(InvalidCursorError):
+            decode_trace_cursor(bad)
+
+
 if __name__ == "__main__":
     print("\n" + "="*60)
     print("TRACE SYSTEM TEST SUITE")
@@ -8,8 +8,14 @@ from src.api.validators import (
     validate_account_id,
     validate_limit,
     validate_offset,
+    check_user_id,
+    check_recommendation_id,
+    check_time_window,
+    check_limit,
+    check_offset,
     sanitize_string
 )
+from src.api.exceptions import InvalidInputError
 
 
 class TestValidateUserID:
@@ -36,6 +42,7 @@ class TestValidateUserID:
             "usr_123",      # Wrong prefix
             "123",          # No prefix
             "user123",      # Missing underscore
+            "user_123\n",   # Trailing newline
         ]
         
         for invalid_id in invalid_ids:
@@ -180,8 +187,57 @@ class TestSanitizeString:
         assert sanitize_string(None) == ""
 
 
-
-
-
-
-
+class TestCheckValidators:
+    """Tests for exception-raising check_* validators."""
+    
+    def test_check_user_id(self):
+        """Test check_user_id accepts valid IDs and raises on invalid ones."""
+        assert check_user_id("user_001") is None
+        with pytest.raises(InvalidInputError) as exc_info:
+            check_user_id("usr_001")
+        assert exc_info.value.field == "user_id"
+        with pytest.raises(InvalidInputError):
+            check_user_id(123)
+    
+    def test_str_subclasses_are_accepted(self):
+        """Test str subclasses (e.g. str enums) pass like plain strings."""
+        class ID(str):
+            pass
+        
+        assert validate_user_id(ID("user_001")) == (True, "")
+        assert check_user_id(ID("user_001")) is None
+        assert validate_recommendation_id(ID("rec_123456789abc")) == (True, "")
+        assert validate_account_id(ID("acc_001"))[0] == validate_account_id("acc_001")[0]
+        assert type(check_time_window(ID("30d"))) is str
+    
+    def test_check_recommendation_id(self):
+        """Test check_recommendation_id."""
+        assert check_recommendation_id("rec_123456789abc") is None
+        with pytest.raises(InvalidInputError):
+            check_recommendation_id("rec_123")
+    
+    def test_check_time_window(self):
+        """Test check_time_window normalizes and raises on invalid windows."""
+        assert check_time_window("30d") == "30d"
+        assert check_time_window("180D") == "180d"
+        assert check_time_window(None) == "30d"
+        with pytest.raises(InvalidInputError) as exc_info:
+            check_time_window("90d")
+        assert exc_info.value.field == "time_window"
+    
+    def test_check_limit(self):
+        """Test check_limit."""
+        assert check_limit(10) == 10
+        assert check_limit(None) == 50
+        with pytest.raises(InvalidInputError):
+            check_limit(0)
+        with pytest.raises(InvalidInputError):
+            check_limit(101)
+    
+    def test_check_offset(self):
+        """Test check_offset reports the given field."""
+        assert check_offset(0) == 0
+        assert check_offset(None) == 0
+        with pytest.raises(InvalidInputError) as exc_info:
+            check_offset(-1, field="page")
+        assert exc_info.value.field == "page"